@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Processing of many patients in parallel.
+
+The groups of files of the patients (e.g. the ``groups`` of a directory
+scan) are sent to a pool of processes, so the reports and exports of a
+whole cohort scale with the number of cores. Each process opens the
+files of a patient with ``DicomInfo.from_files`` and calls a method of
+the object. Only the paths are sent to the processes and only the
+results (dataframes or paths of the files written) come back.
+
+The errors of a patient are collected instead of stopping the batch.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import hashlib
+import os
+import pathlib
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .dicom_info import DicomInfo
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Key columns added to the dataframes of the patients.
+KEYS = ["patient", "group"]
+
+# Methods that write a file and receive its path as first argument.
+WRITERS = ("mlc_to_csv", "struct_to_csv")
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def file_name(patient, group, suffix=".csv"):
+    """Name of the output file of a group of a patient.
+
+    The characters of the PatientID that are not letters, digits, dots,
+    hyphens or underscores are replaced with underscores, and the leading
+    dots are removed. The PatientIDs without letters or digits take the
+    first digits of their SHA-1 hash.
+
+    """
+    name = re.sub(r"[^\w.-]", "_", str(patient)).lstrip(".")
+    if not re.search(r"[^\W_]", name):
+        digest = hashlib.sha1(str(patient).encode("utf-8")).hexdigest()
+        name = f"patient_{digest[:12]}"
+    return f"{name}_{group}{suffix}"
+
+
+def run_group(task):
+    """Load the files of a group and call a method of the object.
+
+    Parameters
+    ----------
+    task : tuple
+        Position of the group, paths of its files, name of the method,
+        keyword arguments of the method, output directory (None to
+        return a dataframe), suffix of the output file and keyword
+        arguments of ``DicomInfo.from_files``.
+
+    Returns
+    -------
+    int
+        Position of the group.
+    pandas.DataFrame, pathlib.Path or None
+        Dataframe with the key columns, path of the file written or None
+        if there is an error.
+    str or None
+        Error of the group.
+
+    """
+    group, paths, method, kwargs, directory, suffix, options = task
+    try:
+        dicom = DicomInfo.from_files(*paths, **options)
+        if directory is not None:
+            path = pathlib.Path(directory) / file_name(
+                dicom.PatientID, group, suffix
+            )
+            getattr(dicom, method)(path, **kwargs)
+            return group, path, None
+        frame = getattr(dicom, method)(**kwargs)
+        if not isinstance(frame, pd.DataFrame):
+            raise TypeError(f"{method} does not return a dataframe")
+        frame.insert(0, "patient", str(dicom.PatientID))
+        frame.insert(1, "group", group)
+        return group, frame, None
+    except Exception as error:
+        return group, None, f"{type(error).__name__}: {error}"
+
+
+# =============================================================================
+# COHORT
+# =============================================================================
+
+
+class Cohort:
+    """Groups of files of many patients processed in parallel.
+
+    Parameters
+    ----------
+    groups : list or dicomhandler.scan.DirectoryScan
+        Paths of the files (RS, RP and RD) of each group, or a directory
+        scan (see ``DicomInfo.from_directory``).
+    workers : int, default=None
+        Number of processes. By default, the number of processors. With
+        one worker, the groups are processed in the current process.
+    chunksize : int, default=1
+        Number of groups sent at once to each process. Large values
+        reduce the overhead with many small patients.
+    defer_size : int, str or None, default="64 KB"
+        Size from which the elements are read when accessed (see
+        ``DicomInfo.from_files``).
+    force : bool, default=False
+        Read the files even without a DICOM File Meta Information header.
+
+    Attributes
+    ----------
+    groups : list
+        Paths of the files of each group.
+    errors : pandas.DataFrame
+        Group, path and error of the files of the groups that failed in
+        the last run.
+
+    Examples
+    --------
+    >>> import dicomhandler.dicom_info as dh
+    >>> from dicomhandler.cohort import Cohort
+    >>> scan = dh.DicomInfo.from_directory('archive')
+    >>> cohort = Cohort(scan, workers=8)
+    >>> summary = cohort.to_dataframe('summarize_to_dataframe', area=True)
+    >>> cohort.to_csv('mlc_to_csv', 'output')
+    >>> cohort.errors
+
+    """
+
+    def __init__(
+        self,
+        groups,
+        workers=None,
+        chunksize=1,
+        defer_size="64 KB",
+        force=False,
+    ):
+        groups = getattr(groups, "groups", groups)
+        self.groups = [list(group) for group in groups]
+        if workers is not None and workers < 1:
+            raise ValueError("The number of workers must be positive")
+        if chunksize < 1:
+            raise ValueError("The chunksize must be positive")
+        self.workers = workers
+        self.chunksize = chunksize
+        self._options = {"defer_size": defer_size, "force": force}
+        self._errors = []
+
+    def __len__(self):
+        """Return the number of groups."""
+        return len(self.groups)
+
+    @property
+    def errors(self):
+        """Group, path and error of the groups that failed."""
+        return pd.DataFrame(self._errors, columns=["group", "path", "error"])
+
+    def _run(self, method, kwargs, directory=None, suffix=None):
+        """Run a method over all the groups and return the results."""
+        if not callable(getattr(DicomInfo, method, None)):
+            raise ValueError(f"DicomInfo has no method {method}")
+        tasks = [
+            (group, paths, method, kwargs, directory, suffix, self._options)
+            for group, paths in enumerate(self.groups)
+        ]
+        self._errors = []
+        workers = min(self.workers or os.cpu_count() or 1, len(tasks))
+        if workers <= 1:
+            results = map(run_group, tasks)
+            return self._collect(results)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(run_group, tasks, chunksize=self.chunksize)
+            return self._collect(results)
+
+    def _collect(self, results):
+        """Keep the results and record the errors of the groups."""
+        outputs = []
+        for group, result, error in results:
+            if error is None:
+                outputs.append(result)
+            else:
+                self._errors += [
+                    (group, path, error) for path in self.groups[group]
+                ]
+        return outputs
+
+    def to_dataframe(self, method="summarize_to_dataframe", **kwargs):
+        """Concatenate a report of all the patients.
+
+        Parameters
+        ----------
+        method : str, default="summarize_to_dataframe"
+            Method of ``DicomInfo`` that returns a dataframe, such as
+            ``summarize_to_dataframe``, ``mlc_to_dataframe`` or
+            ``struct_to_dataframe``.
+        kwargs
+            Keyword arguments of the method.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Rows of all the groups, with the PatientID (categorical) and
+            the position of the group as first columns.
+
+        Raises
+        ------
+        ValueError
+            If ``DicomInfo`` has no such method.
+
+        """
+        frames = self._run(method, kwargs)
+        if not frames:
+            return pd.DataFrame(columns=KEYS)
+        frame = pd.concat(frames, ignore_index=True)
+        frame["patient"] = frame["patient"].astype("category")
+        return frame
+
+    def to_csv(self, method, directory, suffix=".csv", **kwargs):
+        """Write a file per group.
+
+        The files are named after the PatientID and the position of the
+        group, e.g. ``'PatientID_0.csv'``.
+
+        Parameters
+        ----------
+        method : {'mlc_to_csv', 'struct_to_csv'}
+            Method of ``DicomInfo`` that writes the files.
+        directory : str or pathlib.Path
+            Output directory. It is created if it does not exist.
+        suffix : str, default=".csv"
+            Suffix of the files, e.g. '.csv.gz' to compress them.
+        kwargs
+            Keyword arguments of the method.
+
+        Returns
+        -------
+        list
+            Paths of the files written.
+
+        Raises
+        ------
+        ValueError
+            If the method does not write files.
+
+        """
+        if method not in WRITERS:
+            raise ValueError(f"Method must be one of {WRITERS}")
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        return self._run(method, kwargs, directory, suffix)
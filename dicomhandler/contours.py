@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Columnar storage of the contours of a structure file.
+
+The ``ContourData`` of every slice of a structure is parsed only once
+into a contiguous ``(N, 3)`` float array per ROI, together with the
+offsets that delimit each slice inside that array. All the methods of
+``DicomInfo`` work on these arrays, and the points are written back to
+the ``ContourData`` of the DICOM dataset only when it is requested.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import copy
+
+import numpy as np
+
+from pydicom.dataset import Dataset
+from pydicom.multival import MultiValue
+
+from .datasets import set_value, shallow_copy
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# DICOM tag of ContourData (3006,0050).
+CONTOUR_DATA_TAG = 0x30060050
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def contour_array(contour):
+    """Parse the ``ContourData`` of a single contour.
+
+    When the element has not been converted yet by pydicom, the raw
+    decimal strings are parsed directly by NumPy, which avoids creating
+    one Python object per coordinate. The empty values (e.g. after a
+    trailing backslash) are dropped.
+
+    Parameters
+    ----------
+    contour : pydicom.dataset.Dataset
+        Item of a ``ContourSequence``.
+
+    Returns
+    -------
+    numpy.ndarray
+        Flat float64 array with the coordinates of the contour.
+
+    """
+    try:
+        element = contour.get_item(CONTOUR_DATA_TAG)
+    except AttributeError:
+        return np.asarray(contour.ContourData, dtype=float).ravel()
+    if element is None or element.value is None:
+        return np.empty(0)
+    value = element.value
+    if isinstance(value, bytes):
+        value = value.strip(b"\x00 ")
+        if not value:
+            return np.empty(0)
+        value = value.split(b"\\")
+    elif isinstance(value, (str, int, float)):
+        value = [value]
+    try:
+        return np.array(value).astype(float).ravel()
+    except ValueError:
+        value = [
+            item
+            for item in value
+            if not isinstance(item, (bytes, str)) or item.strip()
+        ]
+        return np.array(value, dtype=float).ravel()
+
+
+def contour_rows(offsets, positions):
+    """Rows of the points of some contours.
+
+    Parameters
+    ----------
+    offsets : numpy.ndarray
+        Slice offsets of an ROI.
+    positions : numpy.ndarray
+        Positions of the contours.
+
+    Returns
+    -------
+    numpy.ndarray
+        Position in the array of points of each point of the contours,
+        contour after contour.
+
+    """
+    starts = offsets[positions]
+    lengths = offsets[np.asarray(positions) + 1] - starts
+    first = np.cumsum(lengths) - lengths
+    return np.arange(np.sum(lengths)) + np.repeat(starts - first, lengths)
+
+
+# =============================================================================
+# CONTOUR STORE
+# =============================================================================
+
+
+class ContourStore:
+    """Contours of a structure file as contiguous arrays.
+
+    Every ROI is represented by an ``(N, 3)`` array with all its points,
+    slice after slice, and an ``offsets`` array of ``n_contours + 1``
+    integers, so that the points of the contour ``k`` are
+    ``points[offsets[k]:offsets[k + 1]]``. The ROIs are indexed by
+    position (the same position in ``StructureSetROISequence`` and in
+    ``ROIContourSequence``), by name and by ROI number.
+
+    The arrays of an ROI are parsed on first use, and the index of its
+    slices by z is built the first time that a slab of slices is
+    requested. The ROIs modified with
+    ``replace`` are marked as dirty and written back to the dataset by
+    ``flush``. The arrays are never modified in place, so copies of the
+    store share the arrays of the ROIs that they do not replace.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.FileDataset
+        Structure file (RTSTRUCT).
+
+    """
+
+    def __init__(self, dataset):
+        self.names, self.numbers, self._sequences = [], [], []
+        for roi, roi_contour in zip(
+            dataset.StructureSetROISequence, dataset.ROIContourSequence
+        ):
+            self.names.append(roi.ROIName)
+            self.numbers.append(getattr(roi, "ROINumber", None))
+            self._sequences.append(
+                getattr(roi_contour, "ContourSequence", None)
+            )
+        self.index = {name: item for item, name in enumerate(self.names)}
+        self.number_index = {
+            number: item
+            for item, number in enumerate(self.numbers)
+            if number is not None
+        }
+        self._points = [None] * len(self.names)
+        self._offsets = [None] * len(self.names)
+        self._truncated = [False] * len(self.names)
+        self._slices = [None] * len(self.names)
+        self._rebuild = set()
+        self.dirty = set()
+
+    def __len__(self):
+        """Return the number of ROIs."""
+        return len(self.names)
+
+    def _load(self, item):
+        """Parse all the contours of the ROI ``item``."""
+        arrays, lengths = [], [0]
+        for contour in self._sequences[item] or []:
+            data = contour_array(contour)
+            if data.size % 3 != 0:
+                self._truncated[item] = True
+                data = data[: data.size - data.size % 3]
+            arrays.append(data)
+            lengths.append(data.size // 3)
+        if arrays:
+            points = np.concatenate(arrays).reshape(-1, 3)
+        else:
+            points = np.empty((0, 3))
+        self._points[item] = points
+        self._offsets[item] = np.cumsum(lengths)
+
+    def points(self, item):
+        """Return the ``(N, 3)`` array with all the points of an ROI."""
+        if self._points[item] is None:
+            self._load(item)
+        return self._points[item]
+
+    def offsets(self, item):
+        """Return the slice offsets of an ROI."""
+        if self._offsets[item] is None:
+            self._load(item)
+        return self._offsets[item]
+
+    def truncated(self, item):
+        """Return True if a contour has a length not multiple of 3."""
+        if self._points[item] is None:
+            self._load(item)
+        return self._truncated[item]
+
+    def planes(self, item):
+        """Return the z coordinate of each non-empty contour of an ROI."""
+        offsets = self.offsets(item)
+        starts = offsets[:-1][np.diff(offsets) > 0]
+        return self.points(item)[starts, 2]
+
+    def slice_thickness(self):
+        """Return the smallest distance between slices of any ROI.
+
+        Returns
+        -------
+        float or None
+            Slice thickness, or None if no ROI has two slices.
+
+        """
+        thickness = None
+        for item in range(len(self)):
+            planes = np.unique(np.round(self.planes(item), 3))
+            if len(planes) > 1:
+                step = float(np.min(np.diff(planes)))
+                thickness = step if thickness is None else min(thickness, step)
+        return thickness
+
+    def slice_index(self, item):
+        """Return the index of the slices of an ROI by z.
+
+        Returns
+        -------
+        numpy.ndarray
+            z coordinate of each non-empty contour, ascending.
+        numpy.ndarray
+            Position of each of these contours.
+
+        """
+        if self._slices[item] is None:
+            offsets = self.offsets(item)
+            positions = np.flatnonzero(np.diff(offsets) > 0)
+            z = self.points(item)[offsets[positions], 2]
+            order = np.argsort(z, kind="stable")
+            self._slices[item] = (z[order], positions[order])
+        return self._slices[item]
+
+    def slab(self, item, low, high):
+        """Return the positions of the contours of an ROI within some z.
+
+        Parameters
+        ----------
+        item : int
+            Position of the ROI.
+        low, high : float
+            Lower and upper z in mm, both included.
+
+        Returns
+        -------
+        numpy.ndarray
+            Positions of the contours, ascending.
+
+        """
+        z, positions = self.slice_index(item)
+        first = np.searchsorted(z, low, side="left")
+        stop = np.searchsorted(z, high, side="right")
+        return np.sort(positions[first:stop])
+
+    def contours(self, item):
+        """Return the list of ``(n, 3)`` arrays, one per contour."""
+        offsets = self.offsets(item)
+        return np.split(self.points(item), offsets[1:-1])
+
+    def replace(self, item, points, offsets=None, rebuild=False):
+        """Replace the points of an ROI and mark it to be written back.
+
+        Parameters
+        ----------
+        item : int
+            Position of the ROI.
+        points : numpy.ndarray
+            New ``(N, 3)`` array of points.
+        offsets : numpy.ndarray, optional
+            New slice offsets. By default, the current ones are kept, so
+            ``points`` must have the same number of rows.
+        rebuild : bool, default=False
+            The contours do not correspond to the current slices, so the
+            items of ``ContourSequence`` are created again when they are
+            written back. It is implied when the number of contours
+            changes.
+
+        """
+        if offsets is None:
+            offsets = self.offsets(item)
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if offsets[-1] != len(points):
+            raise ValueError("Offsets do not match the number of points")
+        self._points[item] = points
+        self._offsets[item] = np.asarray(offsets)
+        self._slices[item] = None
+        if rebuild:
+            self._rebuild.add(item)
+        self.dirty.add(item)
+
+    def copy(self):
+        """Return a copy of the store sharing the arrays of every ROI."""
+        clone = copy.copy(self)
+        clone._sequences = list(self._sequences)
+        clone._points = list(self._points)
+        clone._offsets = list(self._offsets)
+        clone._truncated = list(self._truncated)
+        clone._slices = list(self._slices)
+        clone._rebuild = set(self._rebuild)
+        clone.dirty = set(self.dirty)
+        return clone
+
+    def _items(self, item, roi_contour):
+        """Return the items of ``ContourSequence`` to write the ROI in.
+
+        When the contours are rebuilt, the new items are copies of the
+        first current item without the references to the images, which
+        are no longer valid.
+
+        """
+        sequence = list(getattr(roi_contour, "ContourSequence", []))
+        n_contours = len(self._offsets[item]) - 1
+        if item not in self._rebuild and len(sequence) == n_contours:
+            return sequence
+        template = sequence[0] if sequence else Dataset()
+        items = []
+        for number in range(n_contours):
+            contour = shallow_copy(template)
+            if "ContourImageSequence" in contour:
+                del contour.ContourImageSequence
+            if "ContourNumber" in contour:
+                set_value(contour, "ContourNumber", number + 1)
+            items.append(contour)
+        return items
+
+    def flush(self, dataset):
+        """Write the modified ROIs back to ``ContourData``.
+
+        The items of ``ROIContourSequence`` and ``ContourSequence`` of
+        the modified ROIs are copied before writing, so other datasets
+        sharing them are not affected.
+
+        Parameters
+        ----------
+        dataset : pydicom.dataset.FileDataset
+            Structure file from which the store was built.
+
+        """
+        if not self.dirty:
+            return
+        roi_contours = list(dataset.ROIContourSequence)
+        for item in sorted(self.dirty):
+            points, offsets = self._points[item], self._offsets[item]
+            roi_contour = shallow_copy(roi_contours[item])
+            sequence = []
+            for number, contour in enumerate(self._items(item, roi_contour)):
+                start, stop = offsets[number], offsets[number + 1]
+                data = points[start:stop]
+                contour = shallow_copy(contour)
+                set_value(
+                    contour,
+                    "ContourData",
+                    MultiValue(float, data.ravel().tolist()),
+                )
+                if "NumberOfContourPoints" in contour:
+                    set_value(contour, "NumberOfContourPoints", len(data))
+                sequence.append(contour)
+            set_value(roi_contour, "ContourSequence", sequence)
+            roi_contours[item] = roi_contour
+            self._sequences[item] = roi_contour.ContourSequence
+        set_value(dataset, "ROIContourSequence", roi_contours)
+        self._rebuild.clear()
+        self.dirty.clear()
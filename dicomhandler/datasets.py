@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Helpers to handle DICOM datasets.
+
+``DicomInfo`` follows a copy-on-write model: the objects returned by its
+methods share every dataset, sequence and element with the original
+object, except the ones that they modify. These helpers copy a dataset
+without duplicating its elements and replace the value of an element
+without modifying the instance shared with other datasets.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import copy
+
+from pydicom.dataset import Dataset
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def shallow_copy(dataset):
+    """Copy a dataset sharing its elements with the original.
+
+    The copy has its own mapping of elements, so adding, removing or
+    replacing an element in the copy does not affect the original.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        Dataset to copy.
+
+    Returns
+    -------
+    pydicom.dataset.Dataset
+        Shallow copy of the dataset.
+
+    """
+    clone = copy.copy(dataset)
+    if isinstance(dataset, Dataset):
+        clone._dict = dataset._dict.copy()
+    return clone
+
+
+def set_value(dataset, keyword, value):
+    """Set the value of an element without modifying shared elements.
+
+    pydicom updates the value of an existing element in place, which
+    would also change every dataset sharing that element. The element is
+    removed first, so a new one is created.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        Dataset to modify.
+    keyword : str
+        DICOM keyword of the element.
+    value : object
+        New value of the element.
+
+    """
+    if isinstance(dataset, Dataset) and keyword in dataset:
+        delattr(dataset, keyword)
+    setattr(dataset, keyword, value)
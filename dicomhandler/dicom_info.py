@@ -33,17 +33,27 @@ in an easy *excelable* form.
 
 
 import copy
+import functools
 import os
 import pathlib
-import sys
 import warnings
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 import pandas as pd
 
-from pydicom.multival import MultiValue
+import pydicom
+
+from . import dvh, export, margins, simulation, spatial, transforms
+from .contours import ContourStore, contour_rows
+from .datasets import set_value, shallow_copy
+from .dose import DoseGrid, UNIT_LABELS
+from .dvh import DOSE_LEVELS, VOLUME_LEVELS
+from .geometry import COLUMNS, GeometryCache
+from .plan import PlanArrays
+from .raster import Grid, MaskCache
+from .scan import DirectoryScan
 
 
 # =============================================================================
@@ -61,6 +71,11 @@ class DicomInfo:
         different patients. Only one RS, RP and RD is accepted per patient,
         per instantiation.
 
+    .. note::
+        The methods never modify the object. The objects returned by
+        ``move``, ``add_margin`` and ``anonymize`` share with the original
+        every dataset, sequence and element that they do not change.
+
     The files accepted are:
         * Structures: RS.dcm.
         * Treatment plan: RP.dcm.
@@ -70,15 +85,45 @@ class DicomInfo:
     -------
     add_margin(struct, margin)
         Allows to expand or subtract margin for a single structure.
+    add_margin_3d(struct, margin, resolution)
+        Allows to expand or subtract a 3D margin for a single structure.
     anonymize(name=True, birth=True, operator=True, creation=True)
         Allows to overwrite the patient's information.
-    mlc_to_csv(path_or_buff)
+    from_directory(directory, pattern, recursive, workers, defer_size, force)
+        Scans a directory and builds one object per patient and plan.
+    dose_at(points)
+        Interpolates the dose of the dose grid at points or vertices.
+    dvh(names, bin_width, cumulative, relative, workers)
+        Computes the dose-volume histograms of the structures.
+    dvh_metrics(names, dose_levels, volume_levels, workers)
+        Reports the dose-volume metrics of the structures.
+    from_files(\*paths, defer_size, force)
+        Builds the object reading the DICOM files lazily.
+    geometry(names)
+        Reports the volume, surface, centroid and bounds of structures.
+    margin_sweep(struct, widths, volume)
+        Expands or contracts a structure by several margins at once.
+    mlc_to_csv(path_or_buff, compression)
         Creates DICOM MLC information in *csv-able* form.
-    move(struct, value, key, \*args)
+    mlc_to_dataframe(dtype)
+        Creates DICOM MLC information as a dataframe.
+    roi_mask(struct, grid)
+        Returns the voxel mask of a structure on the dose grid or a grid.
+    move(struct, value, key, \*args, z_range)
         Allows to move all the points for a single structure.
-    struct_to_csv(path_or_buff, names)
+    move_sequence(struct, steps, \*args, z_range)
+        Allows to apply a chain of movements to a single structure.
+    proximity(targets, organs, max_distance)
+        Reports the smallest distances between targets and organs.
+    setup_errors(struct, ptv, samples, translation, rotation, ...)
+        Simulates random setup errors and the coverage of a structure.
+    slab(struct, z_min, z_max)
+        Returns the contours of a structure within some z limits.
+    struct_to_csv(path_or_buff, names, layout, compression)
         Creates DICOM structure information in *csv-able* form.
-    summarize_to_dataframe(self, area)
+    struct_to_dataframe(names, dtype)
+        Creates DICOM structure information as a dataframe.
+    summarize_to_dataframe(self, area, jaws)
         Reports the main information of plan and MLC.
 
     Returns
@@ -121,9 +166,14 @@ class DicomInfo:
         >>> dicom = dh.DicomInfo(struct, plan)
 
         """
-        self.dicom_struct = None
-        self.dicom_dose = None
-        self.dicom_plan = None
+        self._dicom_struct = None
+        self._contours = None
+        self._dicom_dose = None
+        self._dose_grid = None
+        self._masks = MaskCache()
+        self._geometry = GeometryCache()
+        self._dicom_plan = None
+        self._plan_arrays = None
         self.PatientName = None
         self.PatientBirthDate = None
         self.PatientID = None
@@ -135,17 +185,13 @@ class DicomInfo:
             temp_modality = patient.Modality
             for files in args[1:]:
                 if temp_name != files.PatientName:
-                    warnings.warn(
-                        "Patients Name do not match,\
-                                first argument of patient name will be used"
-                    )
+                    warnings.warn("Patients Name do not match,\
+                                first argument of patient name will be used")
                 if temp_id != files.PatientID:
                     raise ValueError("Patient IDs do not match")
                 if temp_birthdate != files.PatientBirthDate:
-                    warnings.warn(
-                        "Patients BirthDate do not match,\
-                                first argument of birthdate will be used"
-                    )
+                    warnings.warn("Patients BirthDate do not match,\
+                                first argument of birthdate will be used")
                 if temp_modality == files.Modality:
                     raise ValueError("One > dicom of the same modality")
             for files in args:
@@ -161,6 +207,297 @@ class DicomInfo:
             self.PatientBirthDate = patient.PatientBirthDate
             self.PatientID = patient.PatientID
 
+    @classmethod
+    def from_files(cls, *paths, defer_size="64 KB", force=False):
+        """Build a ``DicomInfo`` object from the paths of the files.
+
+        Only the headers are read. The elements larger than
+        ``defer_size``, such as the ``ROIContourSequence`` of the
+        structures or the ``PixelData`` of the dose, stay on disk until
+        a method needs them for the first time, so opening a patient does
+        not depend on the size of its files.
+
+        .. note::
+            The files must not be moved or modified while the object is
+            in use.
+
+        Parameters
+        ----------
+        paths : str or pathlib.Path
+            Paths of the DICOM files of a patient (RS, RP and RD).
+        defer_size : int, str or None, default="64 KB"
+            Size from which the elements are read when accessed. None
+            reads the whole files.
+        force : bool, default=False
+            Read the files even without a DICOM File Meta Information
+            header (see ``pydicom.dcmread``).
+
+        Returns
+        -------
+        DicomInfo
+            Object with the datasets of the files.
+
+        Raises
+        ------
+        ValueError
+            If the modality is not supported or if many files has the
+            same modality.
+
+        Examples
+        --------
+        >>> import dicomhandler.dicom_info as dh
+        >>> dicom = dh.DicomInfo.from_files('RS.dcm', 'RP.dcm', 'RD.dcm')
+        >>> # The contours are read now.
+        >>> dicom.struct_to_csv('output.csv')
+
+        """
+        datasets = [
+            pydicom.dcmread(path, defer_size=defer_size, force=force)
+            for path in paths
+        ]
+        return cls(*datasets)
+
+    @classmethod
+    def from_directory(
+        cls,
+        directory,
+        pattern="*.dcm",
+        recursive=True,
+        workers=None,
+        defer_size="64 KB",
+        force=False,
+    ):
+        """Scan a directory and group its files into ``DicomInfo`` objects.
+
+        Only the tags needed to match the files (PatientID, Modality,
+        UIDs and references) are read, with a pool of threads. The files
+        are grouped by patient: each plan with the structure set that it
+        references and the dose that references it. The objects are
+        built lazily with ``from_files`` while iterating over the scan.
+
+        Parameters
+        ----------
+        directory : str or pathlib.Path
+            Directory with the DICOM files.
+        pattern : str, default="*.dcm"
+            Pattern of the names of the files.
+        recursive : bool, default=True
+            Search the files in the subdirectories too.
+        workers : int, default=None
+            Number of threads that read the headers.
+        defer_size : int, str or None, default="64 KB"
+            Size from which the elements are read when accessed (see
+            ``from_files``).
+        force : bool, default=False
+            Read the files even without a DICOM File Meta Information
+            header.
+
+        Returns
+        -------
+        dicomhandler.scan.DirectoryScan
+            Iterable of ``DicomInfo`` objects. The files that can not be
+            read or grouped are reported in its ``bad_files`` attribute
+            instead of raising.
+
+        Raises
+        ------
+        ValueError
+            If the directory does not exist.
+
+        Examples
+        --------
+        >>> import dicomhandler.dicom_info as dh
+        >>> scan = dh.DicomInfo.from_directory('archive', workers=16)
+        >>> for dicom in scan:
+        ...     dicom.summarize_to_dataframe(area=True)
+        >>> scan.bad_files
+
+        """
+        loader = functools.partial(
+            cls.from_files, defer_size=defer_size, force=force
+        )
+        return DirectoryScan(
+            directory,
+            loader,
+            pattern=pattern,
+            recursive=recursive,
+            workers=workers,
+            force=force,
+        )
+
+    @property
+    def dicom_struct(self):
+        """Structure file (RTSTRUCT) of the patient.
+
+        The contours modified by the methods of ``DicomInfo`` are kept
+        in the contour store and written back to the ``ContourData`` of
+        the dataset when it is accessed.
+
+        """
+        if self._contours is not None and self._contours.dirty:
+            self._contours.flush(self._dicom_struct)
+        return self._dicom_struct
+
+    @dicom_struct.setter
+    def dicom_struct(self, dataset):
+        self._dicom_struct = dataset
+        self._contours = None
+
+    @property
+    def contours(self):
+        """Contour store with the points of every structure.
+
+        The store is built once from the structure file and it is shared
+        by every method of ``DicomInfo``.
+
+        Returns
+        -------
+        dicomhandler.contours.ContourStore
+            Columnar arrays with the points of every ROI.
+
+        Raises
+        ------
+        ValueError
+            If the structure file is not loaded.
+
+        """
+        if self._contours is None:
+            if not self._dicom_struct:
+                raise ValueError("Structure file not loaded")
+            self._contours = ContourStore(self._dicom_struct)
+        return self._contours
+
+    @property
+    def dicom_dose(self):
+        """Dose file (RTDOSE) of the patient."""
+        return self._dicom_dose
+
+    @dicom_dose.setter
+    def dicom_dose(self, dataset):
+        self._dicom_dose = dataset
+        self._dose_grid = None
+
+    @property
+    def dose_grid(self):
+        """Dose grid of the dose file with its patient coordinates.
+
+        The stored values are memory-mapped from the file when the
+        object is built with ``from_files``, so only the parts of the
+        grid that are used are read, and the ``DoseGridScaling`` is
+        applied to the values read.
+
+        Returns
+        -------
+        dicomhandler.dose.DoseGrid
+            Dose grid with the x, y and z axes in mm.
+
+        Raises
+        ------
+        ValueError
+            If the dose file is not loaded.
+
+        """
+        if self._dose_grid is None:
+            if not self._dicom_dose:
+                raise ValueError("Dose file not loaded")
+            self._dose_grid = DoseGrid(self._dicom_dose)
+        return self._dose_grid
+
+    @property
+    def dicom_plan(self):
+        """Plan file (RTPLAN) of the patient."""
+        return self._dicom_plan
+
+    @dicom_plan.setter
+    def dicom_plan(self, dataset):
+        self._dicom_plan = dataset
+        self._plan_arrays = None
+
+    @property
+    def plan_arrays(self):
+        """Control points of the plan decoded into arrays.
+
+        The plan is decoded once and the arrays are shared by every
+        method of ``DicomInfo`` that reads the control points.
+
+        Returns
+        -------
+        dicomhandler.plan.PlanArrays
+            Arrays with one row per control point of every beam.
+
+        Raises
+        ------
+        ValueError
+            If the plan file is not loaded.
+
+        """
+        if self._plan_arrays is None:
+            if not self._dicom_plan:
+                raise ValueError("Plan file not loaded")
+            self._plan_arrays = PlanArrays(self._dicom_plan)
+        return self._plan_arrays
+
+    def _copy(self, struct=False, plan=False, dose=False):
+        """Return a copy of the object sharing its datasets.
+
+        Only the selected datasets are copied, and they still share all
+        their elements with the originals (see ``datasets.shallow_copy``).
+
+        """
+        dicom_copy = copy.copy(self)
+        if struct and self._dicom_struct is not None:
+            dicom_copy._dicom_struct = shallow_copy(self._dicom_struct)
+            if self._contours is not None:
+                dicom_copy._contours = self._contours.copy()
+        if plan and self._dicom_plan is not None:
+            dicom_copy._dicom_plan = shallow_copy(self._dicom_plan)
+        if dose and self._dicom_dose is not None:
+            dicom_copy._dicom_dose = shallow_copy(self._dicom_dose)
+        return dicom_copy
+
+    def _structure_items(self, names=None):
+        """Positions in the contour store of some structures by name.
+
+        Raises
+        ------
+        ValueError
+            If a name is not in the structure file.
+
+        """
+        store = self.contours
+        if not names:
+            return dict(store.index)
+        items = {}
+        for name in names:
+            if name not in store.index.keys():
+                raise ValueError(f"{name} not founded.")
+            items[name] = store.index[name]
+        return items
+
+    def _map_doses(self, function, names=None, workers=None):
+        """Apply a function to the dose and volume of each structure.
+
+        The structures are rasterized on the dose grid and processed in
+        a pool of threads, each one reading only the bounding box of its
+        structure.
+
+        Returns
+        -------
+        dict
+            Result of the function for each structure, by name.
+
+        """
+        items = self._structure_items(names)
+        dose_grid = self.dose_grid
+        grid = Grid.from_dose(dose_grid)
+
+        def run(name):
+            mask = self.roi_mask(name, grid)
+            return function(*dvh.dose_volume(dose_grid, mask))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return dict(zip(items, executor.map(run, items)))
+
     def anonymize(self, name=True, birth=True, operator=True, creation=True):
         """Protect the sensitive personal information from files.
 
@@ -198,7 +535,6 @@ class DicomInfo:
         >>> dicom = dicom.anonymize(creation=False)
 
         """
-        dicom_copy = copy.deepcopy(self)
         name_dcm = "PatientName"
         birth_dcm = "19720101"
         operator_dcm = "OperatorName"
@@ -206,7 +542,7 @@ class DicomInfo:
 
         empty_di = all(
             [
-                self.dicom_struct is None,
+                self._dicom_struct is None,
                 self.dicom_dose is None,
                 self.dicom_plan is None,
                 self.PatientName is None,
@@ -219,55 +555,40 @@ class DicomInfo:
             warnings.warn(
                 "anonymize should be run after adding data to the object"
             )
-            return dicom_copy
-
+            return copy.copy(self)
+
+        dicom_copy = self._copy(struct=True, plan=True, dose=True)
+        datasets = [
+            dataset
+            for dataset in [
+                dicom_copy.dicom_struct,
+                dicom_copy.dicom_plan,
+                dicom_copy.dicom_dose,
+            ]
+            if dataset is not None
+        ]
+        values = {}
         if name:
             dicom_copy.PatientName = name_dcm
-            if dicom_copy.dicom_struct is not None:
-                dicom_copy.dicom_struct.PatientName = name_dcm
-
-            if dicom_copy.dicom_plan is not None:
-                dicom_copy.dicom_plan.PatientName = name_dcm
-
-            if dicom_copy.dicom_dose is not None:
-                dicom_copy.dicom_dose.PatientName = name_dcm
-
+            values["PatientName"] = name_dcm
         if birth:
             dicom_copy.PatientBirthDate = birth_dcm
-            if dicom_copy.dicom_struct is not None:
-                (dicom_copy.dicom_struct.PatientBirthDate) = birth_dcm
-
-            if dicom_copy.dicom_plan is not None:
-                (dicom_copy.dicom_plan.PatientBirthDate) = birth_dcm
-
-            if dicom_copy.dicom_dose is not None:
-                (dicom_copy.dicom_dose.PatientBirthDate) = birth_dcm
-
+            values["PatientBirthDate"] = birth_dcm
         if operator:
             dicom_copy.OperatorsName = operator_dcm
-            if dicom_copy.dicom_struct is not None:
-                dicom_copy.dicom_struct.OperatorsName = operator_dcm
-
-            if dicom_copy.dicom_plan is not None:
-                dicom_copy.dicom_plan.OperatorsName = operator_dcm
-
-            if dicom_copy.dicom_dose is not None:
-                dicom_copy.dicom_dose.OperatorsName = operator_dcm
-
+            values["OperatorsName"] = operator_dcm
         if creation:
             dicom_copy.InstanceCreationDate = creation_dcm
-            if dicom_copy.dicom_struct is not None:
-                (dicom_copy.dicom_struct.InstanceCreationDate) = creation_dcm
-
-            if dicom_copy.dicom_plan is not None:
-                (dicom_copy.dicom_plan.InstanceCreationDate) = creation_dcm
-
-            if dicom_copy.dicom_dose is not None:
-                (dicom_copy.dicom_dose.InstanceCreationDate) = creation_dcm
+            values["InstanceCreationDate"] = creation_dcm
+        for dataset in datasets:
+            for keyword, value in values.items():
+                set_value(dataset, keyword, value)
 
         return dicom_copy
 
-    def struct_to_csv(self, path_or_buff=None, names=None):
+    def struct_to_csv(
+        self, path_or_buff=None, names=None, layout="wide", compression="infer"
+    ):
         """Create an csv file with the information of the structure file.
 
         The information of the Cartesian coordinates (relative positions)
@@ -275,10 +596,8 @@ class DicomInfo:
         values (csv) file or in a text file (txt) for pos-processing.
         The file can be created in any path or by buffer.
 
-        .. note::
-            **Important:** For all structures, it could be a slow process
-            to take couple of minutes. The structure BODY or OUTER CONTOUR
-            contains a lot of points.
+        The rows are written chunk by chunk from the contour store, so
+        the memory used does not depend on the size of the structures.
 
         Parameters
         ----------
@@ -287,6 +606,14 @@ class DicomInfo:
         names : list, default=None
             List of strings, with the name of the structures to create
             the csv file. By default all structures.
+        layout : {'wide', 'long'}, default='wide'
+            With 'wide', one row per point index and the columns x, y and
+            z of each slice. With 'long', one row per point and the
+            columns roi, slice, point, x, y and z.
+        compression : {'infer', 'gzip', None}, default='infer'
+            Compression of the output. With 'infer', the paths ending in
+            '.gz' (e.g. 'output.csv.gz') are compressed with gzip. The
+            buffers must be binary (e.g. BytesIO) when compressed.
 
         Returns
         -------
@@ -299,6 +626,7 @@ class DicomInfo:
             If the name of the structures are not in the files.
             If the file has not a name.
             If the file has not a .csv o .txt extension.
+            If the layout or the compression are not valid.
 
         References
         ----------
@@ -313,11 +641,15 @@ class DicomInfo:
         >>> dicom.struct_to_csv(path_or_buff=StringIO(), ['Eye Right'])
         >>> # Extract the coordinates of the all structures.
         >>> dicom.struct_to_csv(path_or_buff='output.csv')
+        >>> # One row per point, compressed with gzip.
+        >>> dicom.struct_to_csv(path_or_buff='output.csv.gz', layout='long')
         """
-        dicom_copy = copy.deepcopy(self)
-        if not dicom_copy.dicom_struct:
+        if not self._dicom_struct:
             raise ValueError("Structure file not loaded")
-        elif isinstance(path_or_buff, str):
+        elif layout not in export.LAYOUTS:
+            raise ValueError(f"Layout must be one of {export.LAYOUTS}")
+        compression = export.resolve_compression(path_or_buff, compression)
+        if isinstance(path_or_buff, str):
             name_file = path_or_buff.split("/")[-1].split(".")[0]
             exten = path_or_buff.split("/")[-1].split(".")[1]
             if name_file == "":
@@ -328,67 +660,109 @@ class DicomInfo:
                      not .{exten}"
                 )
         elif isinstance(path_or_buff, pathlib.Path):
-            name_file = (
-                os.path.splitext(path_or_buff)[0].split("/")[-1].split(".")[0]
-            )
-            exten = os.path.splitext(path_or_buff)[-1]
+            path = path_or_buff
+            if compression == "gzip" and path.suffix == ".gz":
+                path = path.with_suffix("")
+            name_file = os.path.splitext(path)[0].split("/")[-1].split(".")[0]
+            exten = os.path.splitext(path)[-1]
             if name_file == "":
                 raise ValueError("Enter the file name")
             elif exten not in [".csv", ".txt"]:
-                raise ValueError(
-                    f"The file must have a .csv or .txt \
-                extension, not {exten}"
-                )
-        names = [] if names is None else names
-        names_aux, names_all = {}, {}
-        df = []
-        for item, value in enumerate(
-            dicom_copy.dicom_struct.StructureSetROISequence
-        ):
-            names_aux[value.ROIName] = item
-        if len(names) != 0:
-            for name in names:
-                if name in names_aux.keys():
-                    names_all[name] = names_aux[name]
-                else:
-                    raise ValueError(f"{name} not founded.")
-        else:
-            names_all = names_aux
-        for roiname in names_all:
-            array = []
-            for num, contour in enumerate(
-                dicom_copy.dicom_struct.ROIContourSequence[
-                    names_all[roiname]
-                ].ContourSequence
-            ):
-                x, y, z = [], [], []
-                counter = 0
-                while counter < int(len(contour.ContourData) / 3):
-                    x.append(float(contour.ContourData[3 * counter]))
-                    y.append(float(contour.ContourData[3 * counter + 1]))
-                    z.append(float(contour.ContourData[3 * counter + 2]))
-                    seriesx = pd.Series(x, name=f"x{num} [mm]")
-                    seriesy = pd.Series(y, name=f"y{num} [mm]")
-                    seriesz = pd.Series(z, name=f"z{num} [mm]")
-                    counter = counter + 1
-                array.append(seriesx)
-                array.append(seriesy)
-                array.append(seriesz)
-            df.append(pd.concat(array, axis=1))
-        df_all = pd.concat(df)
-        try:
-            if path_or_buff is None:
-                buffer, close = sys.stdout, False
-            elif isinstance(path_or_buff, (str, pathlib.Path)):
-                buffer, close = open(path_or_buff, "w"), True
-            else:
-                buffer, close = path_or_buff, False
-            df_all.to_csv(buffer)
-        finally:
-            if close and not buffer.closed:
-                buffer.close()
+                raise ValueError(f"The file must have a .csv or .txt \
+                extension, not {exten}")
+        store = self.contours
+        items = self._structure_items(names)
+        writer = export.write_wide if layout == "wide" else export.write_long
+        with export.open_output(path_or_buff, compression) as buffer:
+            writer(buffer, store, list(items.values()))
+
+    def struct_to_dataframe(self, names=None, dtype=float):
+        """Create a dataframe with the information of the structure file.
+
+        The dataframe has the long layout of ``struct_to_csv``, one row
+        per point, and it is built directly from the arrays of the
+        contour store, without writing and parsing a csv file.
+
+        Parameters
+        ----------
+        names : list, default=None
+            List of strings, with the name of the structures to include
+            in the dataframe. By default all structures.
+        dtype : data-type, default=float
+            Type of the coordinates, e.g. ``numpy.float32`` to halve the
+            memory used.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Dataframe with the columns roi (categorical), slice, point,
+            x [mm], y [mm] and z [mm].
+
+        Raises
+        ------
+        ValueError
+            If the structure file is not loaded.
+            If the name of the structures are not in the files.
+
+        Examples
+        --------
+        >>> # Coordinates of the structure Eye Right in simple precision.
+        >>> dicom.struct_to_dataframe(['Eye Right'], dtype=np.float32)
+        >>> # Coordinates of all the structures.
+        >>> dicom.struct_to_dataframe()
+        """
+        if not self._dicom_struct:
+            raise ValueError("Structure file not loaded")
+        store = self.contours
+        items = self._structure_items(names)
+        return export.contour_frame(store, list(items.values()), dtype)
+
+    def slab(self, struct, z_min, z_max):
+        """Return the contours of a structure within some z limits.
+
+        The slices of each structure are indexed by z the first time
+        that a slab is requested, so the cost of a slab only depends on
+        the number of its contours, not on the size of the structure.
+
+        Parameters
+        ----------
+        struct : str
+            Name of the structure.
+        z_min, z_max : float
+            Lower and upper z in mm, both included.
+
+        Returns
+        -------
+        list
+            ``(n, 3)`` read-only views of the points of each contour
+            within the limits, in the order of the structure file.
 
-    def mlc_to_csv(self, path_or_buff=None):
+        Raises
+        ------
+        ValueError
+            If the structure file is not loaded or the name is not
+            founded.
+
+        Examples
+        --------
+        >>> # Contours of the tumor within 10 mm of the isocenter.
+        >>> dicom.slab('1 GTV', iso[2] - 10.0, iso[2] + 10.0)
+
+        """
+        if not self._dicom_struct:
+            raise ValueError("Structure file not loaded")
+        store = self.contours
+        item = self._structure_items([struct])[struct]
+        points, offsets = store.points(item), store.offsets(item)
+        contours = []
+        for position in store.slab(item, z_min, z_max):
+            begin, end = offsets[position], offsets[position + 1]
+            contour = points[begin:end]
+            contour.flags.writeable = False
+            contours.append(contour)
+        return contours
+
+    def mlc_to_csv(self, path_or_buff=None, compression="infer"):
         """Create an csv file with the information of the plan file.
 
         The information of the multileaf collimator (MLC) positions,
@@ -403,6 +777,8 @@ class DicomInfo:
         ----------
         path_or_buff : str, pathlib.Path or StringIO, default=None
             Path or buffer to write the information from a dataframe.
+        compression : {'infer', 'gzip', None}, default='infer'
+            Compression of the output, as in ``struct_to_csv``.
 
         Returns
         -------
@@ -415,6 +791,7 @@ class DicomInfo:
             If the plan is not loaded.
             If the file has not a name.
             If the file has not a .csv o .txt extension.
+            If the compression is not valid.
 
 
         References
@@ -427,11 +804,13 @@ class DicomInfo:
         >>> dicom.mlc_to_csv(path_or_buff='output.csv')
         >>> # Extract MLC positions and checkpoints from a buffer.
         >>> dicom.struct_to_csv(path_or_buff=StringIO())
+        >>> # Compressed with gzip.
+        >>> dicom.mlc_to_csv(path_or_buff='output.csv.gz')
         """
-        dicom_copy = copy.deepcopy(self)
-        if not dicom_copy.dicom_plan:
+        if not self.dicom_plan:
             raise ValueError("Plan file not loaded")
-        elif isinstance(path_or_buff, str):
+        compression = export.resolve_compression(path_or_buff, compression)
+        if isinstance(path_or_buff, str):
             name_file = path_or_buff.split("/")[-1].split(".")[0]
             exten = path_or_buff.split("/")[-1].split(".")[1]
             if name_file == "":
@@ -442,44 +821,30 @@ class DicomInfo:
                      not .{exten}"
                 )
         elif isinstance(path_or_buff, pathlib.Path):
-            name_file = (
-                os.path.splitext(path_or_buff)[0].split("/")[-1].split(".")[0]
-            )
-            exten = os.path.splitext(path_or_buff)[-1]
+            path = path_or_buff
+            if compression == "gzip" and path.suffix == ".gz":
+                path = path.with_suffix("")
+            name_file = os.path.splitext(path)[0].split("/")[-1].split(".")[0]
+            exten = os.path.splitext(path)[-1]
             if name_file == "":
                 raise ValueError("Enter the file name")
             elif exten not in [".csv", ".txt"]:
                 raise ValueError(
                     f"The file must have a .csv or .txt extension, not {exten}"
                 )
+        arrays = self.plan_arrays
         df = []
-        for number, sequence in enumerate(dicom_copy.dicom_plan.BeamSequence):
+        for number in range(arrays.n_beams):
+            first = arrays.offsets[number]
             array = []
-            for item, point in enumerate(sequence.ControlPointSequence):
-                gantry_angle = point.GantryAngle
-                gantry_direction = point.GantryRotationDirection
-                table_direction = sequence.ControlPointSequence[
-                    0
-                ].PatientSupportAngle
-                if item == 0:
-                    mlc = np.array(
-                        point.BeamLimitingDevicePositionSequence[
-                            2
-                        ].LeafJawPositions
-                    )
-                else:
-                    mlc = np.array(
-                        point.BeamLimitingDevicePositionSequence[
-                            0
-                        ].LeafJawPositions
-                    )
+            for item, mlc in enumerate(arrays.mlc(number)):
                 values = [
                     "GantryAngle",
-                    gantry_angle,
+                    arrays.gantry_angle[first + item],
                     "GantryDirection",
-                    gantry_direction,
+                    arrays.gantry_direction[first + item],
                     "TableDirection",
-                    table_direction,
+                    arrays.table[first + item],
                     "MLC",
                 ]
                 for leaf in mlc:
@@ -488,24 +853,74 @@ class DicomInfo:
                 array.append(series)
             df.append(pd.concat(array, axis=1))
         df_all = pd.concat(df)
-        try:
-            if path_or_buff is None:
-                buffer, close = sys.stdout, False
-            elif isinstance(path_or_buff, (str, pathlib.Path)):
-                buffer, close = open(path_or_buff, "w"), True
-            else:
-                buffer, close = path_or_buff, False
+        with export.open_output(path_or_buff, compression) as buffer:
             df_all.to_csv(buffer)
-        finally:
-            if close and not buffer.closed:
-                buffer.close()
 
-    def summarize_to_dataframe(self, area=False):
+    def mlc_to_dataframe(self, dtype=float):
+        """Create a dataframe with the information of the plan file.
+
+        The dataframe has one row per control point with the same
+        information of ``mlc_to_csv``: gantry angle, gantry direction,
+        table angle and the positions of the multileaf collimator (MLC).
+
+        Parameters
+        ----------
+        dtype : data-type, default=float
+            Type of the MLC positions, e.g. ``numpy.float32``.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Dataframe with the columns beam (categorical), checkpoint,
+            gantry_angle, gantry_direction (categorical), table and one
+            column per MLC position (mlc1, mlc2, ...). The beams with
+            less positions are filled with NaN.
+
+        Raises
+        ------
+        ValueError
+            If the plan is not loaded.
+
+        Examples
+        --------
+        >>> # Extract MLC positions and checkpoints.
+        >>> dicom.mlc_to_dataframe()
+        """
+        if not self.dicom_plan:
+            raise ValueError("Plan file not loaded")
+        arrays = self.plan_arrays
+        width = 2 * int(arrays.n_leaves.max(initial=0))
+        positions = np.full((len(arrays), width), np.nan, dtype=dtype)
+        for number in range(arrays.n_beams):
+            mlc = arrays.mlc(number)
+            start, stop = arrays.offsets[number], arrays.offsets[number + 1]
+            positions[start:stop, : mlc.shape[1]] = mlc
+        frame = pd.DataFrame(
+            positions,
+            columns=[f"mlc{leaf + 1}" for leaf in range(width)],
+            copy=False,
+        )
+        columns = {
+            "beam": pd.Categorical(arrays.beam + 1),
+            "checkpoint": arrays.control_point + 1,
+            "gantry_angle": arrays.gantry_angle,
+            "gantry_direction": pd.Categorical(arrays.gantry_direction),
+            "table": arrays.table,
+        }
+        for column, (name, values) in enumerate(columns.items()):
+            frame.insert(column, name, values)
+        return frame
+
+    def summarize_to_dataframe(self, area=False, jaws=False):
         """Report the main information of the radiotherapy plan.
 
         The information of the prescribed dose, reference points in targets,
         dose to references points, the mass centre and distance to isocenter
-        for each target are summarized in a dataframe.
+        for each target are summarized in a dataframe. When the dose file
+        is loaded, the dose of the grid interpolated at the reference
+        points is reported too (see ``dose_at``), in the ``DoseUnits`` of
+        the grid, unless the grid is not supported (see
+        ``dicomhandler.dose.DoseGrid``).
 
         Also, this method calculates the areas of multileaf collimator (MLC)
         modulation. The objective of this method is to describe the movements
@@ -520,21 +935,24 @@ class DicomInfo:
             * The table angle.
 
         The total area is calculated as the sum of the areas defined
-        between the opposite pair of leaves.
+        between the opposite pair of leaves, with the width of the leaves
+        given by the leaf position boundaries of each beam, so the beams
+        may have different multileaf collimators. With ``jaws=True``, the
+        openings and the leaves are clipped by the jaws (ASYMX/X and
+        ASYMY/Y) when their positions are in the plan.
 
         .. note::
             It is necessary to include the plan file.
 
-        Every beam is contains information with the same machine for a
-        patient, so the number of leaves of the machine is the same for
-        every beam.
-
         Parameters
         ----------
         areas : bool, default=False
             Areas defined the information reported. By default, the
             dataframe corresponds to general RTPlan information. If
             areas is True, the dataframe corresponds to the MLC areas.
+        jaws : bool, default=False
+            Clip the MLC areas with the jaws (see
+            ``dicomhandler.plan.PlanArrays.exposed_area``).
 
         Returns
         -------
@@ -545,8 +963,8 @@ class DicomInfo:
         ------
         ValueError
             If plan dicom and struct dicom are not present.
-            If the modality is not RTPlan or if the number of leaves varies
-            from each checkpoint.
+            If the number of leaves of a beam does not match its leaf
+            position boundaries.
 
         TypeError
             The direction of gantry is not a string.
@@ -567,90 +985,31 @@ class DicomInfo:
         >>> dicom.summarize_to_dataframe(area = False)
         >>> # Or, to obtain dataframe with MLC areas.
         >>> dicom.summarize_to_dataframe(area = True)
+        >>> # MLC areas clipped by the jaws.
+        >>> dicom.summarize_to_dataframe(area=True, jaws=True)
 
         """
-        dicom_copy = copy.deepcopy(self)
-        if dicom_copy.dicom_plan is None:
+        if self.dicom_plan is None:
             raise ValueError("You must load plan and structure files.")
         elif area:
-            leaf_pos = (
-                dicom_copy.dicom_plan.BeamSequence[0]
-                .BeamLimitingDeviceSequence[2]
-                .LeafPositionBoundaries
-            )
-            n_laminas = len(leaf_pos) - 1
-            for _, item in enumerate(dicom_copy.dicom_plan.BeamSequence):
-                if (
-                    n_laminas
-                    != len(
-                        item.BeamLimitingDeviceSequence[
-                            2
-                        ].LeafPositionBoundaries
-                    )
-                    - 1
-                ):
-                    raise ValueError(
-                        "The number of leaves is different among the beams"
-                    )
-            df_cols = [
-                "beam",
-                "checkpoint",
-                "area",
-                "gantry_angle",
-                "gantry_direction",
-                "table",
-            ]
-            dict_leaves = defaultdict(list)
-            for pos1, pos2 in enumerate(leaf_pos[: len(leaf_pos) - 1]):
-                dict_leaves[pos1 + 1].append(abs(pos2 - leaf_pos[pos1 + 1]))
-            rows_df = []
-            for number, sequence in enumerate(
-                dicom_copy.dicom_plan.BeamSequence
-            ):
-                table = sequence.ControlPointSequence[0].PatientSupportAngle
-                gantry_direction = sequence.ControlPointSequence[
-                    0
-                ].GantryRotationDirection
+            arrays = self.plan_arrays
+            areas = arrays.aperture_area(jaws)
+            first = arrays.offsets[:-1]
+            for gantry_direction in arrays.gantry_direction[first]:
                 if isinstance(gantry_direction, str) is False:
                     raise TypeError("Gantry direction must be a string")
-                for control, gantry in enumerate(
-                    sequence.ControlPointSequence
-                ):
-                    gantry_angle = gantry.GantryAngle
-                    if control == 0:
-                        mlc_positions = (
-                            gantry.BeamLimitingDevicePositionSequence[
-                                2
-                            ].LeafJawPositions
-                        )
-                    else:
-                        mlc_positions = (
-                            gantry.BeamLimitingDevicePositionSequence[
-                                0
-                            ].LeafJawPositions
-                        )
-                    bank_a = np.array(mlc_positions[: len(mlc_positions) // 2])
-                    lim1 = len(mlc_positions) // 2
-                    lim2 = len(mlc_positions)
-                    bank_b = np.array(mlc_positions[lim1:lim2])
-                    diff = abs(bank_a - bank_b)
-                    dict_leaf_prov = copy.deepcopy(dict_leaves)
-                    for z, elem_diff in enumerate(diff):
-                        dict_leaf_prov[z + 1].append(elem_diff)
-                    areas = 0
-                    for values in dict_leaf_prov.values():
-                        areas += values[0] * values[1]
-                    rows_df.append(
-                        [
-                            number + 1,
-                            control + 1,
-                            round(areas, 1),
-                            gantry_angle,
-                            gantry_direction,
-                            table,
-                        ]
-                    )
-            df = pd.DataFrame(rows_df, columns=df_cols)
+            df = pd.DataFrame(
+                {
+                    "beam": arrays.beam + 1,
+                    "checkpoint": arrays.control_point + 1,
+                    "area": [round(value, 1) for value in areas.tolist()],
+                    "gantry_angle": arrays.gantry_angle,
+                    "gantry_direction": arrays.gantry_direction[first][
+                        arrays.beam
+                    ],
+                    "table": arrays.table[first][arrays.beam],
+                }
+            )
         else:
             dict_plan = {}
             names_plan, dose, dose_ref, coordinates, dist2iso = (
@@ -661,12 +1020,12 @@ class DicomInfo:
                 [],
             )
             isocenter = np.array(
-                dicom_copy.dicom_plan.BeamSequence[0]
+                self.dicom_plan.BeamSequence[0]
                 .ControlPointSequence[0]
                 .IsocenterPosition
             )
             for value, name in enumerate(
-                dicom_copy.dicom_plan.DoseReferenceSequence
+                self.dicom_plan.DoseReferenceSequence
             ):
                 if value % 2 == 0:
                     names_plan.append(name.DoseReferenceDescription)
@@ -690,10 +1049,26 @@ class DicomInfo:
             dict_plan["Reference point dose [Gy]"] = dose_ref
             dict_plan["Reference coordinates [mm]"] = coordinates
             dict_plan["Distance to iso [mm]"] = dist2iso
+            try:
+                grid = self.dose_grid if self._dicom_dose else None
+            except (AttributeError, ValueError):
+                # The dose files that are not supported are not sampled.
+                grid = None
+            if grid is not None:
+                doses = grid.sample(
+                    np.array(coordinates, dtype=float).reshape(-1, 3)
+                )
+                units = UNIT_LABELS.get(grid.units, grid.units)
+                column = "RTDOSE at reference point"
+                if units:
+                    column = f"{column} [{units}]"
+                dict_plan[column] = [
+                    round(value, 2) for value in doses.tolist()
+                ]
             df = pd.DataFrame(dict_plan)
         return df
 
-    def move(self, struct, value, key, *args):
+    def move(self, struct, value, key, *args, z_range=None):
         r"""Moves a structure for a reference point.
 
         Allow to rotate and translate all the points for a single
@@ -729,6 +1104,9 @@ class DicomInfo:
             structure file (last structure in RS DICOM called Coord 1).
             If not is able this structure, you can add an
             arbritrarly point.
+        z_range : tuple, default=None
+            Lower and upper z in mm of the slices to move. By default,
+            all the slices.
 
         Returns
         -------
@@ -757,133 +1135,88 @@ class DicomInfo:
         >>> dicom.move('1 GTV', 1.0, 'yaw', iso)
         >>> # translate tumor 1.0 mm in x in isocenter.
         >>> moved = dicom.move('1 GTV', 1.0, 'x')
+        >>> # translate only the slices between z = -10 and 10 mm.
+        >>> moved = dicom.move('1 GTV', 1.0, 'x', z_range=(-10.0, 10.0))
 
         """
-        dicom_copy = copy.deepcopy(self)
-        if not dicom_copy.dicom_struct:
-            raise ValueError("Structure file must be loaded")
-        elif not isinstance(value, (int, float)):
-            raise TypeError("The value of the movement must be float or int")
-        elif (key in ["roll", "pitch", "yaw"]) and (abs(value) < 360):
-            delta = np.radians(value)
-        elif (key in ["x", "y", "z"]) and (abs(value) < 1000):
-            delta = value
-        else:
-            raise ValueError("Choose a correct key or a valid value")
+        return self.move_sequence(
+            struct, [(key, value)], *args, z_range=z_range
+        )
 
-        names_all = {}
-        length = len(dicom_copy.dicom_struct.StructureSetROISequence)
-        for item, value in enumerate(
-            dicom_copy.dicom_struct.StructureSetROISequence
-        ):
-            names_all[value.ROIName] = item
-        if struct in names_all.keys():
+    def move_sequence(self, struct, steps, *args, z_range=None):
+        r"""Moves a structure with a chain of rotations and translations.
+
+        The movements are applied in the given order around the same
+        origin. The whole chain is composed into a single matrix, which
+        is applied to all the points of the structure at once, so a
+        six degrees of freedom setup correction costs the same as a
+        single ``move``.
+
+        Parameters
+        ----------
+        struct : str
+            Name of the structure to move.
+        steps : list
+            List of ``(key, value)`` pairs, where key is 'roll', 'pitch',
+            'yaw', 'x', 'y' or 'z' and value is the angle (in degrees)
+            or the shift (in mm), as in ``move``.
+        \*args : list, optional
+            Origin in a list of float elements [x, y, z].
+            By default, it is considered the isocenter of the
+            structure file (last structure in RS DICOM called Coord 1).
+        z_range : tuple, default=None
+            Lower and upper z in mm of the slices to move. By default,
+            all the slices. Only the points of these slices are
+            transformed.
+
+        Returns
+        -------
+        pydicom.dataset.FileDataset
+            Object with DICOM properties of the moved structure.
+
+        Raises
+        ------
+        TypeError
+            If a value is not float or int.
+        ValueError
+            If you select an incorrect key, incorrect name
+            or if you type an origin point with no float.
+
+        Examples
+        --------
+        >>> # rotate tumor 1.0 degree in yaw and translate it 2.0 mm in x.
+        >>> moved = dicom.move_sequence('1 GTV', [('yaw', 1.0), ('x', 2.0)])
+
+        """
+        if not self._dicom_struct:
+            raise ValueError("Structure file must be loaded")
+        for key, value in steps:
+            transforms.check_step(key, value)
+        store = self.contours
+        if struct in store.index.keys():
             if not args:
-                origin = (
-                    dicom_copy.dicom_struct.ROIContourSequence[length - 1]
-                    .ContourSequence[0]
-                    .ContourData
-                )
+                origin = store.points(len(store) - 1)[0]
             elif len(args[0]) == 3 and all(
                 isinstance(x, float) for x in args[0]
             ):
                 origin = args[0]
             else:
                 raise ValueError("Type an origin [x,y,z] with float elements")
-            m = {
-                "roll": np.array(
-                    [
-                        [1, 0, 0, 0],
-                        [0, np.cos(delta), -np.sin(delta), 0],
-                        [0, np.sin(delta), np.cos(delta), 0],
-                        [0, 0, 0, 1],
-                    ]
-                ),
-                "pitch": np.array(
-                    [
-                        [np.cos(delta), 0, np.sin(delta), 0],
-                        [0, 1, 0, 0],
-                        [-np.sin(delta), 0, np.cos(delta), 0],
-                        [0, 0, 0, 1],
-                    ]
-                ),
-                "yaw": np.array(
-                    [
-                        [np.cos(delta), -np.sin(delta), 0, 0],
-                        [np.sin(delta), np.cos(delta), 0, 0],
-                        [0, 0, 1, 0],
-                        [0, 0, 0, 1],
-                    ]
-                ),
-                "x": np.array(
-                    [
-                        [1, 0, 0, delta],
-                        [0, 1, 0, 0],
-                        [0, 0, 1, 0],
-                        [0, 0, 0, 1],
-                    ]
-                ),
-                "y": np.array(
-                    [
-                        [1, 0, 0, 0],
-                        [0, 1, 0, delta],
-                        [0, 0, 1, 0],
-                        [0, 0, 0, 1],
-                    ]
-                ),
-                "z": np.array(
-                    [
-                        [1, 0, 0, 0],
-                        [0, 1, 0, 0],
-                        [0, 0, 1, delta],
-                        [0, 0, 0, 1],
-                    ]
-                ),
-                "point2iso": np.array(
-                    [
-                        [1, 0, 0, -origin[0]],
-                        [0, 1, 0, -origin[1]],
-                        [0, 0, 1, -origin[2]],
-                        [0, 0, 0, 1],
-                    ]
-                ),
-                "iso2point": np.array(
-                    [
-                        [1, 0, 0, origin[0]],
-                        [0, 1, 0, origin[1]],
-                        [0, 0, 1, origin[2]],
-                        [0, 0, 0, 1],
-                    ]
-                ),
-            }
-            for _, contour in enumerate(
-                dicom_copy.dicom_struct.ROIContourSequence[
-                    names_all[struct]
-                ].ContourSequence
-            ):
-                if len(contour.ContourData) % 3 != 0:
-                    raise ValueError(
-                        "One slice does not have all points of 3 elements"
-                    )
-                contour_rotated = []
-                counter = 0
-                while counter < int(len(contour.ContourData) / 3):
-                    rotation = (
-                        m["iso2point"]
-                        @ m[key]
-                        @ m["point2iso"]
-                        @ [
-                            float(contour.ContourData[3 * counter]),
-                            float(contour.ContourData[3 * counter + 1]),
-                            float(contour.ContourData[3 * counter + 2]),
-                            1.0,
-                        ]
-                    )
-                    contour_rotated.append(rotation[0])
-                    contour_rotated.append(rotation[1])
-                    contour_rotated.append(rotation[2])
-                    counter = counter + 1
-                contour.ContourData = MultiValue(float, contour_rotated)
+            item = store.index[struct]
+            if store.truncated(item):
+                raise ValueError(
+                    "One slice does not have all points of 3 elements"
+                )
+            matrix = transforms.compose(steps, origin)
+            points, offsets = store.points(item), store.offsets(item)
+            if z_range is None:
+                points = transforms.apply(matrix, points)
+            else:
+                rows = contour_rows(offsets, store.slab(item, *z_range))
+                points = points.copy()
+                points[rows] = transforms.apply(matrix, points[rows])
+            dicom_copy = self._copy(struct=True)
+            dicom_copy.contours.replace(item, points, offsets)
         else:
             raise ValueError("Type a correct name")
         return dicom_copy
@@ -950,123 +1283,640 @@ class DicomInfo:
         >>> dicom.add_margin('1 GTV', -1.2)
 
         """
-        dicom_copy = copy.deepcopy(self)
         if isinstance(margin, float) is False:
             raise TypeError(f"{margin} must be float")
-        for item, name in enumerate(
-            dicom_copy.dicom_struct.StructureSetROISequence
+        store = self.contours
+        dicom_copy = self._copy(struct=True)
+        for item, name in enumerate(store.names):
+            if struct in name:
+                offsets = store.offsets(item)
+                if np.any(np.diff(offsets) < 1):
+                    raise ValueError("Contour needs at least 1 point")
+                if len(offsets) > 1:
+                    points, offsets = margins.radial_margin(
+                        store.points(item), offsets, margin
+                    )
+                    dicom_copy.contours.replace(item, points, offsets)
+        return dicom_copy
+
+    def margin_sweep(self, struct, widths, volume=False):
+        """Expand or contract a structure by several margins at once.
+
+        The structures are selected as in ``add_margin``, every ROI
+        whose name contains ``struct``. The points of each one are read
+        once and moved by all the margins in a single batch (see
+        ``dicomhandler.margins.radial_sweep``), with the same result as
+        ``add_margin`` for each margin. The objects returned share with
+        the original every dataset and ROI but the modified ones.
+
+        Parameters
+        ----------
+        struct : str
+            Name, or part of the name, of the structures.
+        widths : array_like
+            The expansions (positive) or substractions (negative) in mm.
+        volume : bool, default=False
+            Also return the volume of the modified structures for each
+            margin, measured all at once as in ``geometry``.
+
+        Returns
+        -------
+        list
+            Object with the modified structures for each margin.
+        pandas.Series
+            Total volume in cm3 of the modified structures for each
+            margin, indexed by margin. Only with ``volume=True``.
+
+        Raises
+        ------
+        TypeError
+            If the margins are not numbers.
+        ValueError
+            If there are no margins, a contour is empty or no name
+            contains ``struct``.
+
+        Examples
+        --------
+        >>> sweep = dicom.margin_sweep('1 GTV', np.arange(0.5, 5.5, 0.5))
+        >>> sweep, volumes = dicom.margin_sweep('1 GTV', [-1.0, 1.0], True)
+
+        """
+        widths = np.asarray(widths)
+        if widths.dtype.kind not in "iuf":
+            raise TypeError(f"{widths} must be numbers")
+        widths = widths.astype(float).ravel()
+        if len(widths) == 0:
+            raise ValueError("At least one margin is needed")
+        store = self.contours
+        items = [
+            item for item, name in enumerate(store.names) if struct in name
+        ]
+        if not items:
+            raise ValueError(f"{struct} not founded.")
+        sweep = [self._copy(struct=True) for _ in widths]
+        for item in items:
+            points, offsets = store.points(item), store.offsets(item)
+            if np.any(np.diff(offsets) < 1):
+                raise ValueError("Contour needs at least 1 point")
+            if len(offsets) == 1:
+                continue
+            results = margins.radial_sweep(points, offsets, widths)
+            for dicom_copy, (new_points, new_offsets) in zip(sweep, results):
+                dicom_copy.contours.replace(item, new_points, new_offsets)
+        if not volume:
+            return sweep
+        structures = []
+        for item in items:
+            thickness = None
+            if len(np.unique(store.planes(item))) < 2:
+                thickness = store.slice_thickness()
+            structures.extend(
+                (
+                    dicom_copy.contours.points(item),
+                    dicom_copy.contours.offsets(item),
+                    thickness,
+                )
+                for dicom_copy in sweep
+            )
+        measures = self._geometry.get(structures)[:, 0]
+        totals = np.nansum(measures.reshape(len(items), len(widths)), axis=0)
+        volumes = pd.Series(totals, index=pd.Index(widths, name="margin"))
+        return sweep, volumes.rename("volume")
+
+    def add_margin_3d(self, struct, margin, resolution=None):
+        r"""Expand or contract a structure a specified 3D margin.
+
+        Unlike ``add_margin``, which moves each point radially from the
+        centre of the structure, this method computes the true margin of
+        the volume. The structure is filled on a voxel grid, expanded or
+        contracted with an ellipsoidal distance transform and converted
+        back to planar axial contours. When the margin in z is larger
+        than the slice thickness, slices are added (or removed) at both
+        ends of the structure.
+
+        .. note::
+            The precision of the new contours is half the in-plane
+            resolution. The time and memory grow with the square of the
+            extent of the structure divided by the resolution.
+
+        Parameters
+        ----------
+        struct : str
+            Name of the structure to modify the margin.
+        margin : float or list
+            The expansion (positive) or substraction (negative) in mm.
+            Isotropic for a float, or different along each axis for a
+            list of three floats [x, y, z] with the same sign.
+        resolution : float, optional
+            In-plane size of the voxels in mm. By default, 0.5 mm, or
+            coarser when the expanded structure is larger than 128 mm,
+            so that the grid has at most 256 voxels along x and y.
+
+        Returns
+        -------
+        pydicom.dataset.FileDataset
+            Object with DICOM properties of the structure.
+
+        Raises
+        ------
+        TypeError
+            If the margin is not float or a list of three floats.
+        ValueError
+            If the name is not founded, if the margins have different
+            signs or if the structure has no closed contours.
+
+        References
+        ----------
+            :cite:p:`zhang2016margin`
+
+        Examples
+        --------
+        >>> # Add 2.0 mm to the tumor.
+        >>> dicom.add_margin_3d('1 GTV', 2.0)
+        >>> # Add 2.0 mm in the axial plane and 5.0 mm in z.
+        >>> dicom.add_margin_3d('1 GTV', [2.0, 2.0, 5.0])
+
+        """
+        if isinstance(margin, float):
+            margin = [margin] * 3
+        elif not (
+            isinstance(margin, (list, tuple, np.ndarray))
+            and len(margin) == 3
+            and all(isinstance(value, float) for value in margin)
         ):
-            if struct in name.ROIName:
-                array = []
-                for items, data in enumerate(
-                    dicom_copy.dicom_struct.ROIContourSequence[
-                        item
-                    ].ContourSequence
-                ):
-                    if int(len(data.ContourData) / 3) < 1:
-                        raise ValueError("Contour needs at least 1 point")
-                    else:
-                        count = 0
-                        while count < int(len(data.ContourData) / 3):
-                            array.append(
-                                [
-                                    float(data.ContourData[3 * count]),
-                                    float(data.ContourData[3 * count + 1]),
-                                    float(data.ContourData[3 * count + 2]),
-                                ]
-                            )
-                            count = count + 1
-                centermass = np.mean(array, axis=0)
-                for items, data in enumerate(
-                    dicom_copy.dicom_struct.ROIContourSequence[
-                        item
-                    ].ContourSequence
-                ):
-                    count = 0
-                    contourmargin = []
-                    if len(data.ContourData) == 3 and margin > 0:
-                        contourmargin = [
-                            data.ContourData[0],
-                            data.ContourData[1] + margin,
-                            data.ContourData[2],
-                            data.ContourData[0] + margin,
-                            data.ContourData[1],
-                            data.ContourData[2],
-                            data.ContourData[0],
-                            data.ContourData[1] - margin,
-                            data.ContourData[2],
-                            data.ContourData[0] - margin,
-                            data.ContourData[1],
-                            data.ContourData[2],
-                        ]
-                    elif len(data.ContourData) == 3 and margin <= 0:
-                        contourmargin = data.ContourData
-                    else:
-                        while count < int(len(data.ContourData) / 3):
-                            vector = [
-                                float(data.ContourData[3 * count]),
-                                float(data.ContourData[3 * count + 1]),
-                                float(data.ContourData[3 * count + 2]),
-                            ]
-                            parameter = np.linalg.norm(
-                                np.array(vector - centermass)
-                            )
-                            if parameter != 0.0:
-                                counter = 0
-                                distances, solutions = [], []
-                                while counter < 2:
-                                    if counter == 0:
-                                        sol = margin / (2 * (parameter))
-                                    else:
-                                        sol = -margin / (2 * (parameter))
-                                    solution = []
-                                    for value, _ in enumerate(centermass):
-                                        solution.append(
-                                            round(
-                                                2
-                                                * (
-                                                    centermass[value]
-                                                    - vector[value]
-                                                )
-                                                * sol
-                                                + vector[value],
-                                                2,
-                                            )
-                                        )
-                                    distance = np.linalg.norm(
-                                        np.array(solution - centermass)
-                                    )
-                                    solutions.append(solution)
-                                    distances.append(distance)
-                                    counter = counter + 1
-                                if (
-                                    margin >= 0
-                                    and distances[0] >= distances[1]
-                                ) or (
-                                    margin < 0 and distances[0] < distances[1]
-                                ):
-                                    contourmargin.append(solutions[0][0])
-                                    contourmargin.append(solutions[0][1])
-                                    contourmargin.append(solutions[0][2])
-                                elif (
-                                    (
-                                        margin >= 0
-                                        and distances[0] < distances[1]
-                                    )
-                                    or margin < 0
-                                    and distances[0] > distances[1]
-                                ):
-                                    contourmargin.append(solutions[1][0])
-                                    contourmargin.append(solutions[1][1])
-                                    contourmargin.append(solutions[1][2])
-                            else:
-                                contourmargin.append(vector[0])
-                                contourmargin.append(vector[1])
-                                contourmargin.append(vector[2])
-                            count = count + 1
-                    (
-                        dicom_copy.dicom_struct.ROIContourSequence[item]
-                        .ContourSequence[items]
-                        .ContourData
-                    ) = MultiValue(float, contourmargin)
+            raise TypeError(f"{margin} must be float or [x, y, z] floats")
+        margin = np.array(margin, dtype=float)
+        if np.any(margin > 0) and np.any(margin < 0):
+            raise ValueError("The margins must have the same sign")
+        store = self.contours
+        if struct not in store.index.keys():
+            raise ValueError("Type a correct name")
+        item = store.index[struct]
+        thickness = None
+        planes = np.unique(store.planes(item))
+        if len(planes) < 2:
+            thickness = store.slice_thickness()
+        points, offsets = margins.volumetric_margin(
+            store.points(item),
+            store.offsets(item),
+            margin,
+            resolution,
+            thickness,
+        )
+        dicom_copy = self._copy(struct=True)
+        dicom_copy.contours.replace(item, points, offsets, rebuild=True)
         return dicom_copy
+
+    def dose_at(self, points):
+        """Interpolate the dose of the dose grid at some points.
+
+        The dose is interpolated with trilinear weights, all the points
+        at once (see ``dicomhandler.dose.DoseGrid.sample``).
+
+        Parameters
+        ----------
+        points : array_like or str
+            ``(N, 3)`` array with the x, y and z coordinates in mm, or
+            the name of a structure to sample the vertices of its
+            contours.
+
+        Returns
+        -------
+        numpy.ndarray
+            Dose at each point, NaN outside the grid.
+
+        Raises
+        ------
+        ValueError
+            If the dose file is not loaded or the name is not founded.
+
+        Examples
+        --------
+        >>> dicom.dose_at([[0.0, 0.0, 0.0], [10.0, -5.0, 2.5]])
+        >>> # Dose at the vertices of the contours of a structure.
+        >>> dicom.dose_at('Brainstem').max()
+
+        """
+        dose_grid = self.dose_grid
+        if isinstance(points, str):
+            item = self._structure_items([points])[points]
+            points = self.contours.points(item)
+        return dose_grid.sample(points)
+
+    def roi_mask(self, struct, grid=None):
+        """Rasterize a structure on a voxel grid.
+
+        The contours are filled with a scanline algorithm, with inner
+        contours as holes. Each plane of the grid takes the contours of
+        the nearest slice of the structure, within half the slice
+        thickness. The masks are cached per structure and grid, so the
+        same structure is rasterized only once, also by the copies of
+        the object that do not modify it.
+
+        Parameters
+        ----------
+        struct : str
+            Name of the structure.
+        grid : dicomhandler.raster.Grid, default=None
+            Grid of the mask. By default, the dose grid.
+
+        Returns
+        -------
+        dicomhandler.raster.VoxelMask
+            Mask cropped to the bounding box of the structure. Its
+            ``full`` method returns the mask on the whole grid.
+
+        Raises
+        ------
+        ValueError
+            If the name is not founded or if the grid is not given and
+            the dose file is not loaded.
+
+        Examples
+        --------
+        >>> from dicomhandler.raster import Grid
+        >>> mask = dicom.roi_mask('1 GTV')
+        >>> dose = dicom.dose_grid[mask.box][mask.values]
+        >>> grid = Grid.regular([-50, -50, -50], [50, 50, 50], 1.0)
+        >>> dicom.roi_mask('1 GTV', grid).count
+
+        """
+        store = self.contours
+        if struct not in store.index.keys():
+            raise ValueError("Type a correct name")
+        item = store.index[struct]
+        if grid is None:
+            grid = Grid.from_dose(self.dose_grid)
+        thickness = None
+        if len(np.unique(store.planes(item))) < 2:
+            thickness = store.slice_thickness()
+        return self._masks.get(
+            store.points(item), store.offsets(item), grid, thickness
+        )
+
+    def geometry(self, names=None):
+        """Report the geometry of the structures.
+
+        The structures are measured from their contours: the volume is
+        the area of each slice (with the inner contours as holes) times
+        the slice thickness, the centroid is weighted by the area and
+        the surface is the perimeter of each slice times its thickness
+        plus the first and last slices. The measures are cached per
+        structure, also for the copies of the object that do not modify
+        it.
+
+        Parameters
+        ----------
+        names : list, default=None
+            Names of the structures. By default all structures.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per structure with the columns roi, volume (cm3),
+            surface (cm2), x, y and z of the centroid and xmin, xmax,
+            ymin, ymax, zmin and zmax of the bounding box (mm). The
+            structures without closed contours have no volume or
+            centroid.
+
+        Raises
+        ------
+        ValueError
+            If the structure file is not loaded or if a name is not
+            founded.
+
+        Examples
+        --------
+        >>> dicom.geometry()
+        >>> dicom.geometry(['1 GTV']).loc[0, ['x', 'y', 'z']]
+
+        """
+        store = self.contours
+        items = self._structure_items(names)
+        structures = []
+        thickness = None
+        for item in items.values():
+            single = None
+            if len(np.unique(store.planes(item))) < 2:
+                if thickness is None:
+                    thickness = store.slice_thickness()
+                single = thickness
+            structures.append(
+                (store.points(item), store.offsets(item), single)
+            )
+        frame = pd.DataFrame(
+            self._geometry.get(structures), columns=list(COLUMNS)
+        )
+        frame.insert(0, "roi", list(items))
+        return frame
+
+    def proximity(self, targets=None, organs=None, max_distance=None):
+        """Report the smallest distances between structures.
+
+        The distance between two structures is the smallest distance
+        between the points of their contours, found descending the
+        octrees of both structures at once (see
+        ``dicomhandler.spatial.min_distance``). The pairs with bounding
+        boxes farther than ``max_distance`` are discarded without
+        comparing their points.
+
+        Parameters
+        ----------
+        targets : list, default=None
+            Names of the structures of the rows. By default all
+            structures.
+        organs : list, default=None
+            Names of the structures of the columns, e.g. the organs at
+            risk. By default all structures.
+        max_distance : float, default=None
+            Largest distance of interest in mm. The pairs of structures
+            farther than it are NaN.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Distance in mm from each target (rows) to each organ
+            (columns). The pairs with an empty structure are NaN.
+
+        Raises
+        ------
+        ValueError
+            If the structure file is not loaded or if a name is not
+            founded.
+
+        Examples
+        --------
+        >>> dicom.proximity(['1 GTV', '2 GTV'], ['Brainstem', 'Chiasm'])
+        >>> dicom.proximity(max_distance=10.0)
+
+        """
+        store = self.contours
+        rows = self._structure_items(targets)
+        columns = self._structure_items(organs)
+        bounds = self.geometry(list({**rows, **columns})).set_index("roi")
+        bounds = bounds[["xmin", "ymin", "zmin", "xmax", "ymax", "zmax"]]
+        bounds1 = bounds.loc[list(rows)].to_numpy()[:, None]
+        bounds2 = bounds.loc[list(columns)].to_numpy()[None]
+        low1, high1 = bounds1[..., :3], bounds1[..., 3:]
+        low2, high2 = bounds2[..., :3], bounds2[..., 3:]
+        # Distance between the bounding boxes of each pair.
+        gaps = np.maximum(np.maximum(low1 - high2, low2 - high1), 0)
+        gaps = np.sqrt(np.sum(gaps**2, axis=2))
+        limit = np.inf if max_distance is None else max_distance
+        distances = np.full(gaps.shape, np.nan)
+        trees = {}
+        for i, row in enumerate(rows.values()):
+            for j, column in enumerate(columns.values()):
+                if not gaps[i, j] <= limit:
+                    continue
+                # The empty structures have no bounds and are skipped.
+                for item in (row, column):
+                    if item not in trees:
+                        trees[item] = spatial.Octree(store.points(item))
+                distances[i, j] = spatial.min_distance(
+                    trees[row], trees[column], limit
+                )
+        distances[np.isinf(distances)] = np.nan
+        return pd.DataFrame(
+            distances,
+            index=pd.Index(list(rows), name="roi"),
+            columns=list(columns),
+        )
+
+    def setup_errors(
+        self,
+        struct,
+        ptv,
+        samples=1000,
+        translation=1.0,
+        rotation=0.0,
+        spacing=1.0,
+        origin=None,
+        seed=None,
+    ):
+        """Simulate random setup errors and the coverage of a structure.
+
+        Random rigid movements are sampled from normal distributions of
+        the rotations and translations and applied to the volume of the
+        structure, represented by the centres of the voxels of its mask
+        on a grid of ``spacing`` mm. All the movements are applied at
+        once as a batch of matrices, in chunks, without copying the
+        object (see ``dicomhandler.simulation``).
+
+        Parameters
+        ----------
+        struct : str
+            Name of the moved structure, e.g. the GTV.
+        ptv : str
+            Name of the structure that should cover it.
+        samples : int, default=1000
+            Number of random movements.
+        translation : float or list, default=1.0
+            Standard deviation of the shifts in mm, the same for x, y
+            and z or one per axis.
+        rotation : float or list, default=0.0
+            Standard deviation of the roll, pitch and yaw in degrees,
+            the same for all or one per angle.
+        spacing : float, default=1.0
+            Size of the voxels of the masks in mm.
+        origin : list, default=None
+            Point [x, y, z] around which the rotations are performed.
+            By default, the isocenter as in ``move``.
+        seed : int, default=None
+            Seed of the random numbers.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Errors of each sample, with the roll, pitch and yaw in
+            degrees, the x, y and z in mm and the coverage, the
+            percentage of the volume of the moved structure inside the
+            PTV.
+        pandas.Series
+            Summary statistics of the coverage.
+
+        Raises
+        ------
+        ValueError
+            If a name is not founded, if a structure has no contours or
+            if the number of samples or a standard deviation is not
+            valid.
+
+        Examples
+        --------
+        >>> errors, summary = dicom.setup_errors(
+        ...     '1 GTV', '1 PTV', samples=5000, translation=[1, 1, 2],
+        ...     rotation=0.5, seed=0
+        ... )
+        >>> summary['5%']  # Coverage of 95% of the samples.
+
+        """
+        if not isinstance(samples, int) or samples < 1:
+            raise ValueError("The number of samples must be a positive int")
+        translation = np.asarray(translation, dtype=float)
+        rotation = np.asarray(rotation, dtype=float)
+        if (
+            translation.size not in (1, 3)
+            or rotation.size not in (1, 3)
+            or np.any(translation < 0)
+            or np.any(rotation < 0)
+        ):
+            raise ValueError("The standard deviations must be non-negative")
+        store = self.contours
+        self._structure_items([struct, ptv])
+        bounds = self.geometry([struct, ptv]).set_index("roi")
+        bounds = bounds[["xmin", "ymin", "zmin", "xmax", "ymax", "zmax"]]
+        if bounds.isna().any(axis=None):
+            raise ValueError("The structures must have contours")
+        if origin is None:
+            origin = store.points(len(store) - 1)[0]
+        masks = []
+        for name in (struct, ptv):
+            limits = bounds.loc[name].to_numpy()
+            grid = Grid.regular(limits[:3], limits[3:], spacing)
+            masks.append((self.roi_mask(name, grid), grid))
+        points = simulation.voxel_centres(*masks[0])
+        errors = simulation.sample_errors(
+            samples,
+            translation.ravel(),
+            rotation.ravel(),
+            np.random.default_rng(seed),
+        )
+        matrices = transforms.compose_batch(errors, origin)
+        frame = pd.DataFrame(errors, columns=list(simulation.ERRORS))
+        frame["coverage"] = 100 * simulation.coverage(
+            matrices, points, *masks[1]
+        )
+        summary = frame["coverage"].describe(percentiles=[0.05, 0.5, 0.95])
+        return frame, summary
+
+    def dvh(
+        self,
+        names=None,
+        bin_width=0.1,
+        cumulative=True,
+        relative=True,
+        workers=None,
+    ):
+        """Compute the dose-volume histograms (DVH) of the structures.
+
+        The structures are rasterized on the dose grid (see
+        ``roi_mask``) and processed in parallel, each one reading only
+        the dose within its bounding box. Every voxel weighs its volume.
+
+        Parameters
+        ----------
+        names : list, default=None
+            Names of the structures. By default all structures.
+        bin_width : float, default=0.1
+            Width of the bins of dose, in the units of the dose file.
+        cumulative : bool, default=True
+            With True, the volume that receives at least the dose of each
+            bin. With False, the volume that receives a dose within each
+            bin (differential DVH).
+        relative : bool, default=True
+            Volumes in percentage of the volume of each structure. With
+            False, in cm3.
+        workers : int, default=None
+            Number of threads.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One column per structure, indexed by the lower dose of each
+            bin. The structures outside the dose grid have NaN relative
+            volumes.
+
+        Raises
+        ------
+        ValueError
+            If the structure or dose files are not loaded, if a name is
+            not founded or if the bin width is not positive.
+
+        Examples
+        --------
+        >>> # Cumulative DVH of two structures in bins of 0.01 Gy.
+        >>> dicom.dvh(['1 GTV', 'Brainstem'], bin_width=0.01)
+        >>> # Differential DVH of all the structures in cm3.
+        >>> dicom.dvh(cumulative=False, relative=False)
+
+        """
+        if not bin_width > 0:
+            raise ValueError("The bin width must be positive")
+        results = self._map_doses(
+            lambda doses, volumes: (
+                dvh.histogram(doses, volumes, bin_width),
+                np.sum(volumes),
+            ),
+            names,
+            workers,
+        )
+        size = max((len(hist) for hist, _ in results.values()), default=0)
+        data = {}
+        for name, (hist, total) in results.items():
+            hist = np.pad(hist, (0, size - len(hist)))
+            if cumulative:
+                hist = dvh.cumulative(hist)
+            if relative:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    hist = hist / total * 100.0
+            data[name] = hist
+        index = pd.Index(bin_width * np.arange(size), name="dose")
+        return pd.DataFrame(data, index=index)
+
+    def dvh_metrics(
+        self,
+        names=None,
+        dose_levels=DOSE_LEVELS,
+        volume_levels=VOLUME_LEVELS,
+        workers=None,
+    ):
+        """Report the dose-volume metrics of the structures.
+
+        The structures are rasterized on the dose grid (see
+        ``roi_mask``) and processed in parallel, each one reading only
+        the dose within its bounding box. Every voxel weighs its volume.
+
+        Parameters
+        ----------
+        names : list, default=None
+            Names of the structures. By default all structures.
+        dose_levels : list, default=(2, 50, 95, 98)
+            Percentages x of the volume of the metrics Dx, the minimum
+            dose received by the hottest x % of the structure.
+        volume_levels : list, default=(20,)
+            Doses y of the metrics Vy, the percentage of the structure
+            that receives at least the dose y.
+        workers : int, default=None
+            Number of threads.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per structure with the columns roi, volume (cm3),
+            Dmin, Dmean, Dmax, the Dx and the Vy (%). The doses are in
+            the units of the dose file. The structures outside the dose
+            grid have NaN metrics.
+
+        Raises
+        ------
+        ValueError
+            If the structure or dose files are not loaded or if a name
+            is not founded.
+
+        Examples
+        --------
+        >>> # D95, D98, V20 and V30 of the targets.
+        >>> dicom.dvh_metrics(['1 GTV', '2 GTV'], [95, 98], [20, 30])
+
+        """
+        results = self._map_doses(
+            lambda doses, volumes: dvh.metrics(
+                doses, volumes, dose_levels, volume_levels
+            ),
+            names,
+            workers,
+        )
+        frame = pd.DataFrame(list(results.values()))
+        frame.insert(0, "roi", list(results))
+        return frame
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Dose grid of the dose files (RTDOSE).
+
+The stored values of the grid are memory-mapped straight from the file
+when the ``PixelData`` of the dataset is still on disk (see
+``DicomInfo.from_files``), so opening a grid does not allocate it and
+reading a sub-volume only touches the pages that it needs. When the
+pixels are already in memory, the array is a view of their bytes. The
+``DoseGridScaling`` is applied only to the values that are read.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import numpy as np
+
+import pydicom
+from pydicom.dataelem import RawDataElement
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+PIXEL_DATA = pydicom.tag.Tag("PixelData")
+
+# Length of the elements with undefined length (encapsulated pixels).
+UNDEFINED_LENGTH = 0xFFFFFFFF
+
+AXIAL = np.array([1.0, 0.0, 0.0, 0.0, 1.0, 0.0])
+
+# Maximum number of points interpolated at once.
+CHUNK_POINTS = 2**20
+
+# Labels of the DoseUnits.
+UNIT_LABELS = {"GY": "Gy", "RELATIVE": "relative"}
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def pixel_dtype(dataset, little_endian=True):
+    """Type of the stored values of a dose grid.
+
+    Raises
+    ------
+    ValueError
+        If the number of bits allocated is not 16 or 32.
+
+    """
+    bits = int(dataset.BitsAllocated)
+    if bits not in (16, 32):
+        raise ValueError("The dose grid must have 16 or 32 bits allocated")
+    kind = "i" if dataset.get("PixelRepresentation", 0) == 1 else "u"
+    return np.dtype(f"{'<' if little_endian else '>'}{kind}{bits // 8}")
+
+
+def stored_values(dataset):
+    """Read-only array with the stored values of a dose grid.
+
+    The values are memory-mapped from the file if the ``PixelData`` has
+    not been read, viewed from its bytes if it is in memory and decoded
+    by pydicom if it is compressed.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        Dose file.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array with shape ``(frames, rows, columns)``.
+
+    """
+    shape = (
+        int(dataset.get("NumberOfFrames", 1) or 1),
+        int(dataset.Rows),
+        int(dataset.Columns),
+    )
+    meta = getattr(dataset, "file_meta", None)
+    syntax = meta.get("TransferSyntaxUID") if meta is not None else None
+    if syntax is not None and syntax.is_compressed:
+        values = dataset.pixel_array.reshape(shape)
+        values.flags.writeable = False
+        return values
+    element = dataset._dict.get(PIXEL_DATA)
+    if element is None:
+        raise ValueError("The dose file has no PixelData")
+    filename = getattr(dataset, "filename", None)
+    if (
+        isinstance(element, RawDataElement)
+        and element.value is None
+        and isinstance(filename, str)
+        and element.length != UNDEFINED_LENGTH
+    ):
+        dtype = pixel_dtype(dataset, element.is_little_endian is not False)
+        return np.memmap(
+            filename,
+            dtype=dtype,
+            mode="r",
+            offset=element.value_tell,
+            shape=shape,
+        )
+    dtype = pixel_dtype(dataset, dataset.is_little_endian is not False)
+    pixels = dataset.PixelData
+    return np.frombuffer(pixels, dtype=dtype, count=np.prod(shape)).reshape(
+        shape
+    )
+
+
+def locate(axis, values):
+    """Cell of a monotonic axis that contains some coordinates.
+
+    Parameters
+    ----------
+    axis : numpy.ndarray
+        Ascending or descending coordinates.
+    values : numpy.ndarray
+        Coordinates to locate.
+
+    Returns
+    -------
+    numpy.ndarray
+        Position of the first node of the cell of each value.
+    numpy.ndarray
+        Position of the second node of the cell.
+    numpy.ndarray
+        Weight of the second node, between 0 and 1.
+    numpy.ndarray
+        Boolean mask of the values within the axis.
+
+    """
+    size = len(axis)
+    if size == 1:
+        zeros = np.zeros(len(values), dtype=int)
+        return zeros, zeros, np.zeros(len(values)), values == axis[0]
+    descending = axis[0] > axis[-1]
+    ascending = axis[::-1] if descending else axis
+    step = (ascending[-1] - ascending[0]) / (size - 1)
+    if np.allclose(np.diff(ascending), step):
+        # Evenly spaced axes are located without searching.
+        position = np.floor((values - ascending[0]) / step)
+        position[~np.isfinite(position)] = 0
+        lower = np.clip(position, 0, size - 2).astype(int)
+    else:
+        lower = np.searchsorted(ascending, values, side="right") - 1
+        lower = np.clip(lower, 0, size - 2)
+    low, high = ascending[lower], ascending[lower + 1]
+    weight = (values - low) / (high - low)
+    inside = (values >= ascending[0]) & (values <= ascending[-1])
+    if descending:
+        return size - 1 - lower, size - 2 - lower, weight, inside
+    return lower, lower + 1, weight, inside
+
+
+def _select(axis, limits):
+    """Slice of an axis with the coordinates within some limits."""
+    if limits is None:
+        return slice(None)
+    low, high = min(limits), max(limits)
+    inside = np.flatnonzero((axis >= low) & (axis <= high))
+    if len(inside) == 0:
+        return slice(0, 0)
+    return slice(inside[0], inside[-1] + 1)
+
+
+# =============================================================================
+# DOSE GRID
+# =============================================================================
+
+
+class DoseGrid:
+    """Dose grid of a dose file with its patient coordinates.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        Dose file (RTDOSE).
+
+    Attributes
+    ----------
+    raw : numpy.ndarray
+        Read-only stored values, with shape ``(frames, rows, columns)``,
+        memory-mapped from the file when possible.
+    scaling : float
+        ``DoseGridScaling`` that converts the stored values to dose.
+    units : str
+        ``DoseUnits`` of the dose (e.g. 'GY').
+    x, y, z : numpy.ndarray
+        Patient coordinates in mm of the columns, rows and frames,
+        built from ``ImagePositionPatient``, ``PixelSpacing`` and
+        ``GridFrameOffsetVector``. x and y are descending when the grid
+        is flipped (e.g. for prone patients).
+
+    Raises
+    ------
+    ValueError
+        If the grid is not axial or the frame offsets do not match the
+        number of frames.
+
+    Examples
+    --------
+    >>> grid = DoseGrid(dataset)
+    >>> grid[10]  # Dose of a single frame, only this frame is read.
+    >>> dose, x, y, z = grid.sub_volume(x=(-20, 20), z=(0, 30))
+
+    """
+
+    def __init__(self, dataset):
+        orientation = np.asarray(
+            dataset.get("ImageOrientationPatient", AXIAL), dtype=float
+        )
+        if not np.allclose(np.abs(orientation), AXIAL):
+            raise ValueError("Only axial dose grids are supported")
+        self.raw = stored_values(dataset)
+        self.scaling = float(dataset.get("DoseGridScaling", 1.0) or 1.0)
+        self.units = dataset.get("DoseUnits")
+        position = np.asarray(dataset.ImagePositionPatient, dtype=float)
+        spacing = np.asarray(dataset.PixelSpacing, dtype=float)
+        frames, rows, columns = self.raw.shape
+        offsets = np.asarray(
+            dataset.get("GridFrameOffsetVector", [0.0]), dtype=float
+        )
+        if len(offsets) != frames:
+            raise ValueError(
+                "The frame offsets do not match the number of frames"
+            )
+        self.x = position[0] + orientation[0] * spacing[1] * np.arange(columns)
+        self.y = position[1] + orientation[4] * spacing[0] * np.arange(rows)
+        # The offsets are relative to the first frame when the first one
+        # is zero and absolute coordinates otherwise.
+        self.z = position[2] + offsets if offsets[0] == 0 else offsets
+        for axis in (self.x, self.y, self.z):
+            axis.flags.writeable = False
+
+    @property
+    def shape(self):
+        """Shape of the grid, ``(frames, rows, columns)``."""
+        return self.raw.shape
+
+    def __getitem__(self, key):
+        """Return the dose of a selection of the grid.
+
+        Only the selected values are read from the file and scaled.
+
+        """
+        return np.multiply(
+            np.asarray(self.raw[key]), self.scaling, dtype=float
+        )
+
+    def sample(self, points, fill_value=np.nan):
+        """Interpolate the dose at some points with trilinear weights.
+
+        The points are processed in chunks, so millions of points can
+        be sampled without large temporary arrays, and only the pages of
+        the grid around the points are read from the file.
+
+        Parameters
+        ----------
+        points : array_like
+            ``(N, 3)`` array with the x, y and z patient coordinates in
+            mm.
+        fill_value : float, default=numpy.nan
+            Dose of the points outside the grid.
+
+        Returns
+        -------
+        numpy.ndarray
+            Dose at each point.
+
+        Examples
+        --------
+        >>> grid.sample([[0.0, 0.0, 0.0], [10.0, -5.0, 2.5]])
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        doses = np.empty(len(points))
+        _, rows, columns = self.shape
+        flat = self.raw.reshape(-1)
+        for first in range(0, len(points), CHUNK_POINTS):
+            last = first + CHUNK_POINTS
+            chunk = points[first:last]
+            x0, x1, wx, inside_x = locate(self.x, chunk[:, 0])
+            y0, y1, wy, inside_y = locate(self.y, chunk[:, 1])
+            z0, z1, wz, inside_z = locate(self.z, chunk[:, 2])
+            # Linear interpolation along x, then y and then z.
+            planes = []
+            for frame in (z0, z1):
+                lines = []
+                for row in (y0, y1):
+                    start = (frame * rows + row) * columns
+                    low = flat.take(start + x0).astype(float)
+                    lines.append(low + wx * (flat.take(start + x1) - low))
+                planes.append(lines[0] + wy * (lines[1] - lines[0]))
+            result = planes[0] + wz * (planes[1] - planes[0])
+            result *= self.scaling
+            result[~(inside_x & inside_y & inside_z)] = fill_value
+            doses[first:last] = result
+        return doses
+
+    def index(self, x=None, y=None, z=None):
+        """Slices of the grid within some limits.
+
+        Parameters
+        ----------
+        x, y, z : tuple, default=None
+            Lower and upper limits in mm along each axis. None selects
+            the whole axis.
+
+        Returns
+        -------
+        tuple
+            Slices of the frames, rows and columns.
+
+        """
+        return _select(self.z, z), _select(self.y, y), _select(self.x, x)
+
+    def sub_volume(self, x=None, y=None, z=None):
+        """Dose and coordinates of a box of the grid.
+
+        Only the frames and rows within the box are read from the file.
+
+        Parameters
+        ----------
+        x, y, z : tuple, default=None
+            Lower and upper limits in mm along each axis. None selects
+            the whole axis.
+
+        Returns
+        -------
+        numpy.ndarray
+            Dose with shape ``(len(z), len(y), len(x))``.
+        numpy.ndarray
+            x coordinates of the box.
+        numpy.ndarray
+            y coordinates of the box.
+        numpy.ndarray
+            z coordinates of the box.
+
+        """
+        frames, rows, columns = self.index(x, y, z)
+        return (
+            self[frames, rows, columns],
+            self.x[columns],
+            self.y[rows],
+            self.z[frames],
+        )
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Dose-volume histograms (DVH) of the structures.
+
+The dose of a structure is read only within the bounding box of its
+mask (see ``dicomhandler.raster.VoxelMask``), so each structure touches
+only its part of the dose grid. Each voxel weighs its volume, which
+depends on the distance between the frames of the grid. The dose
+metrics (e.g. D95) are computed from the sorted doses of the voxels and
+the histograms are accumulated in bins of fixed width.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Percentages of the volume of the default dose metrics (D2, D50, ...).
+DOSE_LEVELS = (2, 50, 95, 98)
+
+# Doses of the default volume metrics (V20).
+VOLUME_LEVELS = (20,)
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def frame_thickness(z):
+    """Thickness of each frame of a grid, in mm.
+
+    The thickness of a frame spans half the distance to each
+    neighbouring frame. A single frame is 1 mm thick.
+
+    """
+    z = np.asarray(z, dtype=float)
+    if len(z) < 2:
+        return np.ones(len(z))
+    return np.abs(np.gradient(z))
+
+
+def dose_volume(dose_grid, mask):
+    """Dose and volume of the voxels of a structure.
+
+    Parameters
+    ----------
+    dose_grid : dicomhandler.dose.DoseGrid
+        Dose grid.
+    mask : dicomhandler.raster.VoxelMask
+        Mask of the structure on the dose grid.
+
+    Returns
+    -------
+    numpy.ndarray
+        Dose of each voxel.
+    numpy.ndarray
+        Volume of each voxel, in cm3.
+
+    """
+    frames = mask.box[0]
+    doses = dose_grid[mask.box][mask.values]
+    area = abs(
+        (dose_grid.x[1] - dose_grid.x[0] if len(dose_grid.x) > 1 else 1.0)
+        * (dose_grid.y[1] - dose_grid.y[0] if len(dose_grid.y) > 1 else 1.0)
+    )
+    thickness = frame_thickness(dose_grid.z)[frames]
+    per_frame = np.count_nonzero(mask.values, axis=(1, 2))
+    volumes = np.repeat(area * thickness / 1000.0, per_frame)
+    return doses, volumes
+
+
+def metrics(
+    doses, volumes, dose_levels=DOSE_LEVELS, volume_levels=VOLUME_LEVELS
+):
+    """Summary metrics of a dose-volume histogram.
+
+    Parameters
+    ----------
+    doses : numpy.ndarray
+        Dose of each voxel.
+    volumes : numpy.ndarray
+        Volume of each voxel, in cm3.
+    dose_levels : list, default=DOSE_LEVELS
+        Percentages x of the volume of the metrics Dx, the minimum dose
+        received by the hottest x % of the volume.
+    volume_levels : list, default=VOLUME_LEVELS
+        Doses y of the metrics Vy, the percentage of the volume that
+        receives at least the dose y.
+
+    Returns
+    -------
+    dict
+        Volume (cm3), Dmin, Dmean, Dmax, Dx and Vy (%), with NaN for the
+        empty structures.
+
+    """
+    total = float(np.sum(volumes))
+    result = {"volume": total}
+    if total == 0:
+        result.update({"Dmin": np.nan, "Dmean": np.nan, "Dmax": np.nan})
+        result.update({f"D{level}": np.nan for level in dose_levels})
+        result.update({f"V{level}": np.nan for level in volume_levels})
+        return result
+    result["Dmin"] = float(np.min(doses))
+    result["Dmean"] = float(np.sum(doses * volumes) / total)
+    result["Dmax"] = float(np.max(doses))
+    # Doses from the hottest voxel and percentage of the volume covered.
+    # Sorting the doses alone is faster when the voxels are equal.
+    if np.all(volumes == volumes[0]):
+        ranked = np.sort(doses)[::-1]
+        covered = np.arange(1, len(doses) + 1) * (100.0 / len(doses))
+    else:
+        order = np.argsort(doses)[::-1]
+        ranked = doses[order]
+        covered = np.cumsum(volumes[order]) / total * 100.0
+    for level in dose_levels:
+        position = min(np.searchsorted(covered, level), len(ranked) - 1)
+        result[f"D{level}"] = float(ranked[position])
+    for level in volume_levels:
+        received = np.sum(volumes[doses >= level])
+        result[f"V{level}"] = float(received / total * 100.0)
+    return result
+
+
+def histogram(doses, volumes, bin_width):
+    """Differential dose-volume histogram.
+
+    Parameters
+    ----------
+    doses : numpy.ndarray
+        Dose of each voxel.
+    volumes : numpy.ndarray
+        Volume of each voxel, in cm3.
+    bin_width : float
+        Width of the bins of dose.
+
+    Returns
+    -------
+    numpy.ndarray
+        Volume in cm3 with a dose in each bin ``[k * bin_width,
+        (k + 1) * bin_width)``, from zero up to the bin of the maximum
+        dose.
+
+    """
+    bins = np.floor(np.maximum(doses, 0.0) / bin_width).astype(int)
+    return np.bincount(bins, weights=volumes)
+
+
+def cumulative(differential):
+    """Volume with at least the dose of each bin edge."""
+    return np.cumsum(differential[::-1])[::-1]
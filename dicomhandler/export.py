@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Export of the contour store to text files and dataframes.
+
+The rows are formatted chunk by chunk directly from the ``(N, 3)`` arrays
+of the contour store and written as soon as they are ready, so the
+memory used does not depend on the size of the structures and the cost
+is linear in the number of points.
+
+Two layouts are available. The wide layout has one row per point index
+and one column triple per slice, as ``struct_to_csv`` always wrote. The
+long layout has one row per point with the columns roi, slice, point, x,
+y and z. The same long layout is built in memory as a dataframe, without
+formatting the values as text.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import contextlib
+import gzip
+import io
+import os
+import pathlib
+import sys
+
+import numpy as np
+
+import pandas as pd
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Maximum number of rows formatted at once.
+CHUNK_ROWS = 65536
+
+LAYOUTS = ("wide", "long")
+
+LONG_COLUMNS = ("roi", "slice", "point", "x [mm]", "y [mm]", "z [mm]")
+
+COMPRESSIONS = (None, "infer", "gzip")
+
+
+# =============================================================================
+# OUTPUT
+# =============================================================================
+
+
+def resolve_compression(path_or_buff, compression):
+    """Resolve the compression of an output.
+
+    Parameters
+    ----------
+    path_or_buff : str, pathlib.Path, file-like or None
+        Destination of the output.
+    compression : {'infer', 'gzip', None}
+        With 'infer', paths ending in '.gz' are compressed with gzip.
+
+    Returns
+    -------
+    str or None
+        'gzip' or None.
+
+    Raises
+    ------
+    ValueError
+        If the compression is not valid.
+
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Compression must be one of {COMPRESSIONS}")
+    if compression == "infer":
+        if isinstance(path_or_buff, (str, pathlib.Path)) and str(
+            path_or_buff
+        ).endswith(".gz"):
+            return "gzip"
+        return None
+    return compression
+
+
+@contextlib.contextmanager
+def open_output(path_or_buff, compression=None):
+    """Open a text stream to a path, a buffer or the standard output.
+
+    Paths are opened and closed here. Buffers and the standard output are
+    never closed. With gzip compression, buffers must be binary.
+
+    Parameters
+    ----------
+    path_or_buff : str, pathlib.Path, file-like or None
+        Destination of the output. None for the standard output.
+    compression : {'gzip', None}, default=None
+        Compression of the output.
+
+    Yields
+    ------
+    file-like
+        Text stream.
+
+    """
+    if compression != "gzip":
+        if path_or_buff is None:
+            yield sys.stdout
+        elif isinstance(path_or_buff, (str, pathlib.Path)):
+            with open(path_or_buff, "w") as buffer:
+                yield buffer
+        else:
+            yield path_or_buff
+        return
+    if path_or_buff is None:
+        raw = gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb")
+    elif isinstance(path_or_buff, (str, pathlib.Path)):
+        raw = gzip.GzipFile(os.fspath(path_or_buff), mode="wb")
+    else:
+        raw = gzip.GzipFile(fileobj=path_or_buff, mode="wb")
+    # Closing the wrapper closes the gzip stream, which never closes the
+    # file object that it wraps.
+    with io.TextIOWrapper(raw, encoding="utf-8") as buffer:
+        yield buffer
+
+
+# =============================================================================
+# FORMATTING
+# =============================================================================
+
+
+def format_floats(values):
+    """Format floats as pandas does, with the shortest repr.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Array of floats.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of strings, with empty strings for NaN.
+
+    """
+    text = np.asarray(values, dtype=float).astype(str)
+    text[np.isnan(values)] = ""
+    return text
+
+
+def quote(text):
+    """Quote a field of a csv file if it needs it."""
+    if any(char in text for char in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def point_indexes(offsets, rows):
+    """Slice and position within the slice of some points of a structure.
+
+    Parameters
+    ----------
+    offsets : numpy.ndarray
+        Slice offsets of the structure.
+    rows : numpy.ndarray
+        Positions of the points in the ``(N, 3)`` array of the structure.
+
+    Returns
+    -------
+    numpy.ndarray
+        Slice of each point.
+    numpy.ndarray
+        Position of each point within its slice.
+
+    """
+    slices = np.searchsorted(offsets, rows, side="right") - 1
+    return slices, rows - offsets[slices]
+
+
+def _write_lines(buffer, columns):
+    """Write rows given as a list of columns of strings."""
+    lines = map(",".join, zip(*columns))
+    buffer.write("\n".join(lines))
+    buffer.write("\n")
+
+
+# =============================================================================
+# LAYOUTS
+# =============================================================================
+
+
+def _wide_columns(store, items):
+    """Contours that fill the columns of each structure (wide layout).
+
+    An empty contour repeats the last contour found before it, also from
+    a previous structure, as ``struct_to_csv`` always did.
+
+    Returns
+    -------
+    list
+        For each structure, a list of ``(label, (item, start, stop))``
+        pairs with the label of the columns and the rows of the contour.
+
+    """
+    previous = None
+    frames = []
+    for item in items:
+        offsets = store.offsets(item)
+        columns = []
+        for num, (start, stop) in enumerate(zip(offsets[:-1], offsets[1:])):
+            if stop > start:
+                previous = (num, (item, start, stop))
+            if previous is not None:
+                columns.append(previous)
+        frames.append(columns)
+    return frames
+
+
+def _wide_header(frames):
+    """Position of the columns of each structure in the wide layout.
+
+    The labels are sorted by their first appearance. A label repeated
+    within a structure gets as many column triples as its largest number
+    of repetitions.
+
+    """
+    counts = {}
+    for columns in frames:
+        frame_counts = {}
+        for label, _ in columns:
+            frame_counts[label] = frame_counts.get(label, 0) + 1
+        for label, count in frame_counts.items():
+            counts[label] = max(counts.get(label, 0), count)
+    labels, first = [], {}
+    for label, count in counts.items():
+        first[label] = len(labels)
+        labels += [label] * count
+    positions = []
+    for columns in frames:
+        seen = {}
+        position = []
+        for label, _ in columns:
+            position.append(first[label] + seen.get(label, 0))
+            seen[label] = seen.get(label, 0) + 1
+        positions.append(position)
+    return labels, positions
+
+
+def write_wide(buffer, store, items, chunksize=CHUNK_ROWS):
+    """Write structures with one column triple per slice.
+
+    Parameters
+    ----------
+    buffer : file-like
+        Text stream.
+    store : dicomhandler.contours.ContourStore
+        Contours of the structures.
+    items : list
+        Positions of the structures in the store.
+    chunksize : int, default=CHUNK_ROWS
+        Maximum number of rows formatted at once.
+
+    """
+    frames = _wide_columns(store, items)
+    labels, positions = _wide_header(frames)
+    header = [""]
+    for label in labels:
+        header += [f"x{label} [mm]", f"y{label} [mm]", f"z{label} [mm]"]
+    buffer.write(",".join(header) + "\n")
+    for columns, position in zip(frames, positions):
+        if not columns:
+            continue
+        rows = max(stop - start for _, (_, start, stop) in columns)
+        for first in range(0, rows, chunksize):
+            last = min(first + chunksize, rows)
+            cells = np.full((3 * len(labels), last - first), "", dtype=object)
+            for (_, (item, start, stop)), slot in zip(columns, position):
+                begin, end = start + first, min(start + last, stop)
+                if begin >= end:
+                    continue
+                block = slice(3 * slot, 3 * slot + 3)
+                cells[block, : end - begin] = format_floats(
+                    store.points(item)[begin:end].T
+                )
+            index = np.arange(first, last).astype(str)
+            _write_lines(buffer, [index, *cells])
+
+
+def write_long(buffer, store, items, chunksize=CHUNK_ROWS):
+    """Write structures with one row per point.
+
+    Parameters
+    ----------
+    buffer : file-like
+        Text stream.
+    store : dicomhandler.contours.ContourStore
+        Contours of the structures.
+    items : list
+        Positions of the structures in the store.
+    chunksize : int, default=CHUNK_ROWS
+        Maximum number of rows formatted at once.
+
+    """
+    buffer.write(",".join(LONG_COLUMNS) + "\n")
+    for item in items:
+        points, offsets = store.points(item), store.offsets(item)
+        name = quote(str(store.names[item]))
+        for first in range(0, len(points), chunksize):
+            last = min(first + chunksize, len(points))
+            slices, point = point_indexes(offsets, np.arange(first, last))
+            roi = np.full(last - first, name, dtype=object)
+            _write_lines(
+                buffer,
+                [
+                    roi,
+                    slices.astype(str),
+                    point.astype(str),
+                    *format_floats(points[first:last].T),
+                ],
+            )
+
+
+# =============================================================================
+# DATAFRAMES
+# =============================================================================
+
+
+def contour_frame(store, items, dtype=float):
+    """Build the long layout of some structures as a dataframe.
+
+    Parameters
+    ----------
+    store : dicomhandler.contours.ContourStore
+        Contours of the structures.
+    items : list
+        Positions of the structures in the store.
+    dtype : data-type, default=float
+        Type of the coordinates, e.g. ``numpy.float32``.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per point with the columns roi (categorical), slice,
+        point and the coordinates x, y and z, which share a single
+        ``(N, 3)`` block.
+
+    """
+    points = [store.points(item) for item in items]
+    block = np.concatenate([np.empty((0, 3))] + points).astype(dtype)
+    slices, point = [], []
+    for item, roi_points in zip(items, points):
+        rows = np.arange(len(roi_points))
+        roi_slices, roi_point = point_indexes(store.offsets(item), rows)
+        slices.append(roi_slices)
+        point.append(roi_point)
+    codes = np.repeat(np.arange(len(items)), [len(p) for p in points])
+    frame = pd.DataFrame(block, columns=list(LONG_COLUMNS[3:]), copy=False)
+    frame.insert(
+        0,
+        "roi",
+        pd.Categorical.from_codes(
+            codes, categories=[store.names[item] for item in items]
+        ),
+    )
+    frame.insert(1, "slice", np.concatenate([np.empty(0, int)] + slices))
+    frame.insert(2, "point", np.concatenate([np.empty(0, int)] + point))
+    return frame
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Volume, surface, centroid and bounds of the structures.
+
+The structures are measured from their planar contours, all the
+contours of all the structures at once. The area and the centroid of
+each contour come from the shoelace formula. The contours inside an odd
+number of contours of the same plane are holes, as in the rasterization
+(see ``dicomhandler.raster``). Each plane spans half the distance to its
+neighbouring planes, so the volume is the sum of the areas of the
+planes times their thickness, and the lateral surface is the sum of the
+perimeters times the thickness, plus the areas of the first and last
+planes.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import threading
+import weakref
+
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Columns of the measures of a structure.
+COLUMNS = (
+    "volume",
+    "surface",
+    "x",
+    "y",
+    "z",
+    "xmin",
+    "xmax",
+    "ymin",
+    "ymax",
+    "zmin",
+    "zmax",
+)
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def _segments(lengths):
+    """First position of consecutive segments and the segment of each."""
+    starts = np.cumsum(lengths) - lengths
+    return starts, np.repeat(np.arange(len(lengths)), lengths)
+
+
+def contour_areas(points, offsets):
+    """Shoelace measures of closed planar contours.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        ``(N, 3)`` array with the points of the contours.
+    offsets : numpy.ndarray
+        Offsets of the contours, all with at least three points.
+
+    Returns
+    -------
+    numpy.ndarray
+        Signed area of each contour, positive if counterclockwise.
+    numpy.ndarray
+        Perimeter of each contour.
+    numpy.ndarray
+        ``(C, 2)`` array with the x and y of the centroid of each
+        contour.
+
+    """
+    starts, ends = offsets[:-1], offsets[1:]
+    x = np.ascontiguousarray(points[:, 0])
+    y = np.ascontiguousarray(points[:, 1])
+    # The point after the last point of a contour is its first point.
+    x_next, y_next = np.empty_like(x), np.empty_like(y)
+    x_next[:-1], y_next[:-1] = x[1:], y[1:]
+    x_next[ends - 1], y_next[ends - 1] = x[starts], y[starts]
+    cross = x * y_next - x_next * y
+    doubled = np.add.reduceat(cross, starts)
+    perimeters = np.add.reduceat(np.hypot(x_next - x, y_next - y), starts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        centroids = np.column_stack(
+            (
+                np.add.reduceat((x + x_next) * cross, starts),
+                np.add.reduceat((y + y_next) * cross, starts),
+            )
+        ) / (3 * doubled[:, None])
+    # Degenerate contours take the mean of their points.
+    flat = doubled == 0
+    if flat.any():
+        lengths = (ends - starts)[:, None]
+        means = np.add.reduceat(points[:, :2], starts) / lengths
+        centroids[flat] = means[flat]
+    return doubled / 2, perimeters, centroids
+
+
+def hole_signs(points, offsets, planes):
+    """Sign of each contour, -1 for the holes.
+
+    A contour is a hole if its first point is inside an odd number of
+    the other contours of its plane.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        ``(N, 3)`` array with the points of the contours.
+    offsets : numpy.ndarray
+        Offsets of the contours.
+    planes : numpy.ndarray
+        Identifier of the plane of each contour.
+
+    Returns
+    -------
+    numpy.ndarray
+        1 or -1 for each contour.
+
+    """
+    count = len(offsets) - 1
+    signs = np.ones(count)
+    order = np.argsort(planes, kind="stable")
+    _, group_starts, group_sizes = np.unique(
+        planes[order], return_index=True, return_counts=True
+    )
+    shared = group_sizes > 1
+    if not shared.any():
+        return signs
+    # All the ordered pairs (contour, other contour) of each plane.
+    sizes = group_sizes[shared]
+    repeated = np.repeat(sizes, sizes**2)
+    first, group = _segments(sizes**2)
+    local = np.arange(len(group)) - first[group]
+    pair_starts = np.repeat(group_starts[shared], sizes**2)
+    tested = order[pair_starts + local // repeated]
+    other = order[pair_starts + local % repeated]
+    distinct = tested != other
+    tested, other = tested[distinct], other[distinct]
+    # Crossings of a ray along +x from the first point of the contour
+    # with the edges of the other contour.
+    lengths = np.diff(offsets)[other]
+    edge_starts, pair = _segments(lengths)
+    edges = np.arange(len(pair)) - edge_starts[pair] + offsets[other][pair]
+    following = edges + 1
+    last = following == offsets[other + 1][pair]
+    following[last] = offsets[other][pair][last]
+    start = points[offsets[tested][pair]]
+    px, py = start[:, 0], start[:, 1]
+    x0, y0 = points[edges, 0], points[edges, 1]
+    x1, y1 = points[following, 0], points[following, 1]
+    spans = (y0 > py) != (y1 > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+    crosses = spans & (px < crossing)
+    inside = np.bincount(pair, weights=crosses, minlength=len(tested)) % 2
+    depth = np.bincount(tested, weights=inside, minlength=count)
+    signs[depth % 2 == 1] = -1.0
+    return signs
+
+
+def measure(structures):
+    """Measure some structures at once.
+
+    Parameters
+    ----------
+    structures : list
+        Tuples ``(points, offsets, thickness)`` with the points and the
+        slice offsets of each structure and the thickness of its planes
+        if it has a single one, or None.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(S, 11)`` array with the measures of ``COLUMNS`` of each
+        structure: volume in cm3, surface in cm2, centroid and bounds
+        in mm. The structures without closed contours have no volume
+        and the structures without points have NaN measures.
+
+    """
+    result = np.full((len(structures), len(COLUMNS)), np.nan)
+    if not structures:
+        return result
+    sizes = np.array([len(points) for points, _, _ in structures])
+    points = np.concatenate([points for points, _, _ in structures])
+    # Bounds of the structures with points.
+    filled = sizes > 0
+    if filled.any():
+        starts = (np.cumsum(sizes) - sizes)[filled]
+        result[filled, 5::2] = np.minimum.reduceat(points, starts)
+        result[filled, 6::2] = np.maximum.reduceat(points, starts)
+    result[filled, 0:2] = 0.0
+
+    # Closed contours, with at least three points.
+    lengths = [np.diff(offsets) for _, offsets, _ in structures]
+    owner = np.repeat(np.arange(len(structures)), [len(x) for x in lengths])
+    lengths = np.concatenate(lengths)
+    closed = lengths >= 3
+    if not closed.any():
+        return result
+    if not closed.all():
+        points = points[np.repeat(closed, lengths)]
+    owner = owner[closed]
+    offsets = np.concatenate(([0], np.cumsum(lengths[closed])))
+    areas, perimeters, centroids = contour_areas(points, offsets)
+    z = np.round(points[offsets[:-1], 2], 3)
+
+    # Planes of the structures, sorted by structure and z.
+    planes, plane = np.unique(
+        np.column_stack((owner, z)), axis=0, return_inverse=True
+    )
+    plane = plane.ravel()
+    signs = hole_signs(points, offsets, plane)
+    plane_owner = planes[:, 0].astype(int)
+    plane_z = planes[:, 1]
+
+    # Thickness of each plane, half the distance to each neighbour.
+    same = plane_owner[1:] == plane_owner[:-1]
+    gaps = np.where(same, np.diff(plane_z), np.nan)
+    before = np.concatenate(([np.nan], gaps))
+    after = np.concatenate((gaps, [np.nan]))
+    thickness = np.where(
+        np.isnan(before),
+        after,
+        np.where(np.isnan(after), before, (before + after) / 2),
+    )
+    single = np.array([structure[2] for structure in structures], dtype=float)[
+        plane_owner
+    ]
+    thickness = np.where(np.isnan(thickness), single, thickness)
+    thickness = np.nan_to_num(thickness)
+
+    # Volume, centroid and surface of each structure.
+    weights = signs * np.abs(areas) * thickness[plane]
+    plane_areas = np.bincount(
+        plane, weights=signs * np.abs(areas), minlength=len(planes)
+    )
+    count = len(structures)
+    volumes = np.bincount(owner, weights=weights, minlength=count)
+    lateral = np.bincount(
+        owner, weights=perimeters * thickness[plane], minlength=count
+    )
+    first = np.flatnonzero(np.concatenate(([True], ~same)))
+    last = np.flatnonzero(np.concatenate((~same, [True])))
+    caps = np.bincount(
+        plane_owner[first], weights=plane_areas[first], minlength=count
+    ) + np.bincount(
+        plane_owner[last], weights=plane_areas[last], minlength=count
+    )
+    measured = np.unique(owner)
+    result[measured, 0] = volumes[measured] / 1000.0
+    result[measured, 1] = (lateral + caps)[measured] / 100.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for column, values in zip(
+            (2, 3, 4), (centroids[:, 0], centroids[:, 1], z)
+        ):
+            moments = np.bincount(
+                owner, weights=weights * values, minlength=count
+            )
+            result[measured, column] = (moments / volumes)[measured]
+    return result
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+
+class GeometryCache:
+    """Measures of structures, computed once per structure.
+
+    The measures are identified by the arrays of points and offsets of
+    the structure, as the masks of ``dicomhandler.raster.MaskCache``,
+    but the entries do not keep the arrays alive.
+
+    """
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of structures measured."""
+        return len(self._rows)
+
+    def __getstate__(self):
+        """Pickle (or deep copy) the cache empty, without its lock."""
+        return {}
+
+    def __setstate__(self, state):
+        """Build an empty cache."""
+        self.__init__()
+
+    def get(self, structures):
+        """Return the measures of some structures, measuring the new ones.
+
+        Parameters
+        ----------
+        structures : list
+            Tuples ``(points, offsets, thickness)`` (see ``measure``).
+
+        Returns
+        -------
+        numpy.ndarray
+            ``(S, 11)`` array with the measures of ``COLUMNS``.
+
+        """
+        keys = [
+            (id(points), id(offsets), thickness)
+            for points, offsets, thickness in structures
+        ]
+        rows, missing = [], []
+        with self._lock:
+            for key, (points, offsets, _) in zip(keys, structures):
+                entry = self._rows.get(key)
+                if (
+                    entry is not None
+                    and entry[0]() is points
+                    and entry[1]() is offsets
+                ):
+                    rows.append(entry[2])
+                else:
+                    rows.append(None)
+                    missing.append(len(rows) - 1)
+        if missing:
+            measures = measure([structures[item] for item in missing])
+            with self._lock:
+                # The entries of the arrays already released are removed.
+                if len(self._rows) > 2 * len(structures) + 1024:
+                    self._rows = {
+                        key: entry
+                        for key, entry in self._rows.items()
+                        if entry[0]() is not None
+                    }
+                for item, row in zip(missing, measures):
+                    points, offsets, _ = structures[item]
+                    row.flags.writeable = False
+                    self._rows[keys[item]] = (
+                        weakref.ref(points),
+                        weakref.ref(offsets),
+                        row,
+                    )
+                    rows[item] = row
+        return np.array(rows).reshape(len(structures), len(COLUMNS))
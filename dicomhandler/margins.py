@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Margins of structures.
+
+Vectorized kernels to expand or contract the points of a structure,
+working on the ``(N, 3)`` arrays of the contour store.
+
+Two models are available. The radial model moves every point along the
+line through the centre of mass of the structure (``add_margin``). The
+volumetric model voxelizes the structure, expands or contracts it with
+an ellipsoidal distance transform and extracts new planar contours,
+adding or removing slices when the margin in z requires it
+(``add_margin_3d``).
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import numpy as np
+
+from .raster import contour_planes, extract_contours, rasterize
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Directions of the points added around a single point contour.
+CROSS = np.array(
+    [[0.0, 1.0, 0.0], [1.0, 0.0, 0.0], [0.0, -1.0, 0.0], [-1.0, 0.0, 0.0]]
+)
+
+# Maximum number of moved points computed at once by a sweep of margins.
+CHUNK_POINTS = 2**21
+
+# Finest in-plane resolution, in mm, and largest number of voxels along
+# x or y of the grids filled by a 3D margin when no resolution is given.
+MIN_RESOLUTION = 0.5
+GRID_VOXELS = 256
+
+# Distance to the centre, or margin, in mm above which the rounding to
+# 0.01 mm cannot change which candidate of a point is farther.
+TIE_DISTANCE = 0.05
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def _norm(vectors):
+    """Euclidean norm of each row of an ``(..., 3)`` array."""
+    return np.sqrt(
+        vectors[..., 0] * vectors[..., 0]
+        + vectors[..., 1] * vectors[..., 1]
+        + vectors[..., 2] * vectors[..., 2]
+    )
+
+
+def _round(values):
+    """Round to 0.01 mm in place, as ``numpy.round(values, 2)``."""
+    np.multiply(values, 100.0, out=values)
+    np.rint(values, out=values)
+    return np.true_divide(values, 100.0, out=values)
+
+
+def radial_kernel(points, centermass, margin):
+    """Move every point along the line through the centre of mass.
+
+    For each point, the two candidates at a distance ``margin`` along
+    the line that joins the point and the centre are rounded to 0.01 mm,
+    and the one farther from (closer to) the centre is chosen for a
+    positive (negative) margin.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        ``(N, 3)`` array of points.
+    centermass : numpy.ndarray
+        Centre of mass of the structure.
+    margin : float or numpy.ndarray
+        The expansion (positive) or substraction (negative) in mm, or a
+        ``(M,)`` array of margins to move the points by each of them.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(N, 3)`` array with the moved points, or ``(M, N, 3)`` for an
+        array of margins.
+    numpy.ndarray
+        Boolean mask of the points that are kept. A point is discarded
+        if, for a negative margin, both candidates are at the same
+        distance of the centre.
+
+    """
+    margin = np.asarray(margin, dtype=float)[..., np.newaxis]
+    parameter = _norm(points - centermass)
+    still = parameter == 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sol = (margin / (2 * parameter))[..., np.newaxis]
+        # The step of the second candidate is exactly the opposite one.
+        step = 2 * (centermass - points) * sol
+        moved = _round(points - step)
+    # The distances to the centre of the two candidates differ by twice
+    # the smallest of the distance of the point and the margin, so the
+    # second candidate, away from (towards) the centre for a positive
+    # (negative) margin, is chosen unless both are small.
+    keep = np.ones(np.broadcast_shapes(margin.shape, still.shape), bool)
+    close = np.minimum(parameter, np.abs(margin)) <= TIE_DISTANCE
+    if close.any():
+        index = np.nonzero(close)
+        margins = np.broadcast_to(margin, close.shape)[index]
+        with np.errstate(invalid="ignore"):
+            first = _round(step[index] + points[index[-1]])
+        second = moved[index]
+        distances = _norm(first - centermass), _norm(second - centermass)
+        choose_first = np.where(
+            margins >= 0,
+            distances[0] >= distances[1],
+            distances[0] < distances[1],
+        )
+        choose_second = np.where(
+            margins >= 0, ~choose_first, distances[0] > distances[1]
+        )
+        moved[index] = np.where(choose_first[:, np.newaxis], first, second)
+        keep[index] = choose_first | choose_second
+    moved[..., still, :] = points[still]
+    keep[..., still] = True
+    return moved, keep
+
+
+def _contours(points, lengths, moved, keep, margin):
+    """Contours of a structure from its moved points.
+
+    The contours with a single point are replaced by four points around
+    it for a positive margin and are kept unchanged otherwise.
+
+    """
+    if np.all(lengths != 1) and keep.all():
+        return moved, np.concatenate([[0], np.cumsum(lengths)])
+    contour = np.repeat(np.arange(len(lengths)), lengths)
+    single = (lengths == 1)[contour]
+    moved[single] = points[single]
+    counts = keep.astype(int)
+    counts[single] = 4 if margin > 0 else 1
+    result = np.repeat(moved, counts, axis=0)
+    if margin > 0 and single.any():
+        starts = np.cumsum(counts) - counts
+        rows = starts[single][:, np.newaxis] + np.arange(4)
+        result[rows] = points[single][:, np.newaxis] + CROSS * margin
+    new_lengths = np.bincount(contour, weights=counts, minlength=len(lengths))
+    new_offsets = np.concatenate([[0], np.cumsum(new_lengths.astype(int))])
+    return result, new_offsets
+
+
+def radial_margin(points, offsets, margin, centermass=None):
+    """Expand or contract all the contours of a structure.
+
+    The contours with a single point are replaced by four points around
+    it for a positive margin and are kept unchanged otherwise. The rest
+    of the points are moved with ``radial_kernel``.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        ``(N, 3)`` array with all the points of the structure.
+    offsets : numpy.ndarray
+        Slice offsets of the structure.
+    margin : float
+        The expansion (positive) or substraction (negative) in mm.
+    centermass : numpy.ndarray, optional
+        Centre of the expansion. By default, the mean of the points.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(M, 3)`` array with the new points.
+    numpy.ndarray
+        New slice offsets.
+
+    """
+    if centermass is None:
+        centermass = np.mean(points, axis=0)
+    moved, keep = radial_kernel(points, centermass, margin)
+    return _contours(points, np.diff(offsets), moved, keep, margin)
+
+
+def radial_sweep(points, offsets, margins, centermass=None):
+    """Expand or contract a structure by several margins at once.
+
+    The points are moved by all the margins in a single batch, in
+    chunks of at most ``CHUNK_POINTS`` moved points, with the same
+    results as ``radial_margin`` for each margin.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        ``(N, 3)`` array with all the points of the structure.
+    offsets : numpy.ndarray
+        Slice offsets of the structure.
+    margins : array_like
+        The expansions (positive) or substractions (negative) in mm.
+    centermass : numpy.ndarray, optional
+        Centre of the expansion. By default, the mean of the points.
+
+    Returns
+    -------
+    list
+        Pairs with the ``(M, 3)`` array of new points and the new slice
+        offsets for each margin.
+
+    """
+    margins = np.asarray(margins, dtype=float).ravel()
+    if centermass is None:
+        centermass = np.mean(points, axis=0)
+    lengths = np.diff(offsets)
+    chunk = max(1, CHUNK_POINTS // max(len(points), 1))
+    results = []
+    for first in range(0, len(margins), chunk):
+        last = first + chunk
+        block = margins[first:last]
+        moved, keep = radial_kernel(points, centermass, block)
+        for margin, moved_points, kept in zip(block, moved, keep):
+            results.append(
+                _contours(points, lengths, moved_points, kept, margin)
+            )
+    return results
+
+
+def dilate(mask, spacing, extent):
+    """Dilate a mask with an ellipsoid.
+
+    The squared distance, scaled by the semi-axes of the ellipsoid, is
+    propagated axis by axis with a min-plus sweep restricted to the
+    reach of the margin, which gives the exact Euclidean result.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        Boolean 3D mask.
+    spacing : list
+        Size of the voxels along each axis of the mask, in mm.
+    extent : list
+        Semi-axes of the ellipsoid along each axis of the mask, in mm.
+        An axis with zero extent is not dilated.
+
+    Returns
+    -------
+    numpy.ndarray
+        Dilated mask. The voxels closer than ``extent`` to the border of
+        the grid may be truncated, so the grid must be padded.
+
+    """
+    distance = np.where(mask, 0.0, np.inf).astype(np.float32)
+    for axis in range(3):
+        if extent[axis] <= 0:
+            continue
+        step = spacing[axis] / extent[axis]
+        reach = int(np.floor(extent[axis] / spacing[axis] + 1e-9))
+        # The axis is moved first in memory, so the shifts move whole
+        # rows or planes instead of single values.
+        source = np.ascontiguousarray(np.moveaxis(distance, axis, 0))
+        result = source.copy()
+        # The shifted distances are added in a single buffer, instead of
+        # a new array for each shift.
+        shifted = np.empty_like(source)
+        for shift in range(1, min(reach, len(source) - 1) + 1):
+            weight = np.float32((shift * step) ** 2)
+            np.add(source[:-shift], weight, out=shifted[shift:])
+            np.minimum(result[shift:], shifted[shift:], out=result[shift:])
+            np.add(source[shift:], weight, out=shifted[:-shift])
+            np.minimum(result[:-shift], shifted[:-shift], out=result[:-shift])
+        distance = np.moveaxis(result, 0, axis)
+    return distance <= 1.0 + 1e-6
+
+
+def volumetric_margin(
+    points, offsets, margin, resolution=None, thickness=None
+):
+    """Expand or contract a structure in 3D.
+
+    The structure is filled on a grid with the given in-plane resolution
+    and the slice thickness of its contours, padded with enough slices
+    for the margin in z. The new contours are extracted on every slice
+    of the grid, so slices are added (removed) at both ends of the
+    structure when it is expanded (contracted) in z.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        ``(N, 3)`` array with all the points of the structure.
+    offsets : numpy.ndarray
+        Slice offsets of the structure.
+    margin : numpy.ndarray
+        Margins in x, y and z in mm, all of them positive (expansion) or
+        all of them negative (contraction).
+    resolution : float, optional
+        In-plane size of the voxels, in mm. By default, 0.5 mm or the
+        size that keeps 256 voxels along the largest in-plane extent of
+        the expanded structure, whichever is larger.
+    thickness : float, optional
+        Distance between slices. By default, the smallest distance
+        between the slices of the structure.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(M, 3)`` array with the new points.
+    numpy.ndarray
+        New slice offsets.
+
+    Raises
+    ------
+    ValueError
+        If the structure has no closed contours, or if it has a single
+        slice and the thickness is not given.
+
+    """
+    planes = contour_planes(points, offsets)
+    closed = np.diff(offsets) >= 3
+    if not closed.any():
+        raise ValueError("The structure needs closed planar contours")
+    z_values = np.unique(np.round(planes[closed], 3))
+    if thickness is None:
+        if len(z_values) < 2:
+            raise ValueError("The slice thickness could not be found")
+        thickness = float(np.min(np.diff(z_values)))
+    inside = np.repeat(closed, np.diff(offsets))
+    low, high = points[inside].min(axis=0), points[inside].max(axis=0)
+    extent = np.abs(margin)[::-1]
+    if resolution is None:
+        # The grid of large structures is coarser, so the time of the
+        # distance transform does not grow with their size.
+        size = np.max(high[:2] - low[:2] + 2 * np.abs(margin[:2]))
+        resolution = max(MIN_RESOLUTION, float(size) / GRID_VOXELS)
+    spacing = np.array([thickness, resolution, resolution])
+    pad = np.floor(extent / spacing + 1e-9).astype(int) + 1
+    x = np.arange(
+        low[0] - pad[2] * resolution,
+        high[0] + (pad[2] + 1) * resolution,
+        resolution,
+    )
+    y = np.arange(
+        low[1] - pad[1] * resolution,
+        high[1] + (pad[1] + 1) * resolution,
+        resolution,
+    )
+    n_planes = int(np.rint((z_values[-1] - z_values[0]) / thickness))
+    z = z_values[0] + thickness * np.arange(-pad[0], n_planes + pad[0] + 1)
+    mask = rasterize(points, offsets, x, y, z)
+    if np.all(margin >= 0):
+        mask = dilate(mask, spacing, extent)
+    else:
+        mask = ~dilate(~mask, spacing, extent)
+    return extract_contours(mask, x, y, z)
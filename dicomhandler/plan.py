@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Control points of a treatment plan.
+
+The beams of an RTPLAN are walked a single time and their control points
+are decoded into NumPy arrays with one row per control point, all the
+beams one after the other. The rows of each beam are delimited by
+offsets, as the slices in the contour store.
+
+The beam limiting devices (jaws and multileaf collimator) are found by
+their ``RTBeamLimitingDeviceType``. The values that DICOM allows to omit
+in the control points after the first one (angles, directions and device
+positions) are carried forward from the previous control point.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+MLC_TYPES = ("MLCX", "MLCY")
+
+JAW_X_TYPES = ("ASYMX", "X")
+
+JAW_Y_TYPES = ("ASYMY", "Y")
+
+# Position of the MLC in the sequences without device types: the third
+# device of the first control point and the only device of the others.
+LEGACY_MLC = 2
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def find_device(sequence, types, legacy=None):
+    """Find a beam limiting device by its type.
+
+    Parameters
+    ----------
+    sequence : pydicom.sequence.Sequence
+        BeamLimitingDeviceSequence of a beam or
+        BeamLimitingDevicePositionSequence of a control point.
+    types : tuple
+        Accepted values of ``RTBeamLimitingDeviceType``.
+    legacy : int, optional
+        Position of the device when no item of the sequence has a type.
+
+    Returns
+    -------
+    pydicom.dataset.Dataset or None
+        The device, or None if it is not in the sequence.
+
+    """
+    typed = False
+    for device in sequence:
+        kind = device.get("RTBeamLimitingDeviceType")
+        if kind is not None:
+            typed = True
+            if kind in types:
+                return device
+    if not typed and legacy is not None and legacy < len(sequence):
+        return sequence[legacy]
+    return None
+
+
+def _positions(device):
+    """Array of the LeafJawPositions of a device (None if missing)."""
+    if device is None or device.get("LeafJawPositions") is None:
+        return None
+    return np.array(device.LeafJawPositions, dtype=float)
+
+
+def _padded(rows, width):
+    """Stack rows of different length, filling with NaN."""
+    array = np.full((len(rows), width), np.nan)
+    for number, row in enumerate(rows):
+        if row is not None:
+            array[number, : len(row)] = row
+    return array
+
+
+# =============================================================================
+# PLAN ARRAYS
+# =============================================================================
+
+
+class PlanArrays:
+    """Decoded control points of a plan.
+
+    Parameters
+    ----------
+    dataset : pydicom.dataset.Dataset
+        Plan file (RTPLAN).
+
+    Attributes
+    ----------
+    offsets : numpy.ndarray
+        Offsets of the beams, the control points of the beam ``b`` are
+        the rows ``offsets[b]:offsets[b + 1]``.
+    beam : numpy.ndarray
+        Position of the beam of each control point in the BeamSequence.
+    control_point : numpy.ndarray
+        Position of each control point within its beam.
+    gantry_angle : numpy.ndarray
+        Gantry angle in degrees.
+    gantry_direction : numpy.ndarray
+        Gantry rotation direction, as found in the plan.
+    table : numpy.ndarray
+        Patient support (table) angle in degrees.
+    meterset : numpy.ndarray
+        Cumulative meterset weight (NaN if missing).
+    jaw_x, jaw_y : numpy.ndarray
+        ``(n_cp, 2)`` positions of the jaws in mm (NaN if missing).
+    bank_a, bank_b : numpy.ndarray
+        ``(n_cp, n_leaves)`` positions of the two banks of the MLC in mm,
+        padded with NaN for the beams with less leaves.
+    n_leaves : numpy.ndarray
+        Number of leaf pairs of the MLC of each beam.
+    boundaries : numpy.ndarray
+        ``(n_beams, n_leaves + 1)`` leaf position boundaries of the MLC
+        of each beam in mm, padded with NaN.
+    mlc_type : numpy.ndarray
+        Type of the MLC of each beam ('MLCX' or 'MLCY'). The MLC of the
+        beams without device types is taken as 'MLCX'.
+
+    All the arrays are read-only, so they can be shared by copies of
+    ``DicomInfo``.
+
+    """
+
+    def __init__(self, dataset):
+        beams = dataset.BeamSequence
+        offsets, boundaries, n_leaves, mlc_type = [0], [], [], []
+        columns = {
+            "gantry_angle": [],
+            "gantry_direction": [],
+            "table": [],
+            "meterset": [],
+            "jaw_x": [],
+            "jaw_y": [],
+            "mlc": [],
+        }
+        for beam in beams:
+            device = find_device(
+                beam.get("BeamLimitingDeviceSequence", []),
+                MLC_TYPES,
+                LEGACY_MLC,
+            )
+            boundary = None
+            if device is not None:
+                boundary = device.get("LeafPositionBoundaries")
+            kind = (
+                None
+                if device is None
+                else device.get("RTBeamLimitingDeviceType")
+            )
+            mlc_type.append("MLCY" if kind == "MLCY" else "MLCX")
+            boundaries.append(
+                None if boundary is None else np.array(boundary, float)
+            )
+            last = dict.fromkeys(columns)
+            for item, point in enumerate(beam.ControlPointSequence):
+                devices = point.get("BeamLimitingDevicePositionSequence", [])
+                decoded = {
+                    "gantry_angle": point.get("GantryAngle"),
+                    "gantry_direction": point.get("GantryRotationDirection"),
+                    "table": point.get("PatientSupportAngle"),
+                    "meterset": point.get("CumulativeMetersetWeight"),
+                    "jaw_x": _positions(find_device(devices, JAW_X_TYPES)),
+                    "jaw_y": _positions(find_device(devices, JAW_Y_TYPES)),
+                    "mlc": _positions(
+                        find_device(
+                            devices, MLC_TYPES, LEGACY_MLC if item == 0 else 0
+                        )
+                    ),
+                }
+                for key, value in decoded.items():
+                    if value is None and key != "meterset":
+                        value = last[key]
+                    last[key] = value
+                    columns[key].append(value)
+            offsets.append(len(columns["gantry_angle"]))
+            first = None
+            if offsets[-1] > offsets[-2]:
+                first = columns["mlc"][offsets[-2]]
+            n_leaves.append(0 if first is None else len(first) // 2)
+        self.offsets = np.array(offsets)
+        self.beam = np.repeat(np.arange(len(beams)), np.diff(self.offsets))
+        self.control_point = np.arange(self.offsets[-1]) - np.repeat(
+            self.offsets[:-1], np.diff(self.offsets)
+        )
+        for key in ("gantry_angle", "table", "meterset"):
+            setattr(
+                self,
+                key,
+                np.array(
+                    [np.nan if v is None else float(v) for v in columns[key]]
+                ),
+            )
+        self.gantry_direction = np.empty(self.offsets[-1], dtype=object)
+        self.gantry_direction[:] = columns["gantry_direction"]
+        self.jaw_x = _padded(columns["jaw_x"], 2)
+        self.jaw_y = _padded(columns["jaw_y"], 2)
+        self.n_leaves = np.array(n_leaves, dtype=int)
+        self.mlc_type = np.array(mlc_type, dtype=object)
+        width = int(self.n_leaves.max(initial=0))
+        mlc = columns["mlc"]
+        leaves = np.repeat(self.n_leaves, np.diff(self.offsets))
+        self.bank_a = _padded(
+            [
+                None if row is None else row[:count]
+                for row, count in zip(mlc, leaves)
+            ],
+            width,
+        )
+        self.bank_b = _padded(
+            [
+                None if row is None else row[count:][:count]
+                for row, count in zip(mlc, leaves)
+            ],
+            width,
+        )
+        lengths = [len(row) for row in boundaries if row is not None]
+        self.boundaries = _padded(boundaries, max(lengths, default=0))
+        for value in vars(self).values():
+            value.flags.writeable = False
+        self._exposed = {}
+
+    def __len__(self):
+        """Return the number of control points."""
+        return int(self.offsets[-1])
+
+    @property
+    def n_beams(self):
+        """Number of beams of the plan."""
+        return len(self.offsets) - 1
+
+    def mlc(self, beam):
+        """Positions of the MLC of a beam, as in ``LeafJawPositions``.
+
+        Parameters
+        ----------
+        beam : int
+            Position of the beam in the BeamSequence.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``(n_cp, 2 * n_leaves)`` array with the positions of the
+            bank A followed by the positions of the bank B.
+
+        """
+        rows = slice(self.offsets[beam], self.offsets[beam + 1])
+        count = self.n_leaves[beam]
+        return np.hstack(
+            [self.bank_a[rows, :count], self.bank_b[rows, :count]]
+        )
+
+    def leaf_widths(self, beam):
+        """Width of the leaves of the MLC of a beam, in mm.
+
+        Parameters
+        ----------
+        beam : int
+            Position of the beam in the BeamSequence.
+
+        Returns
+        -------
+        numpy.ndarray
+            Absolute difference between consecutive leaf boundaries.
+
+        """
+        boundary = self.boundaries[beam]
+        return np.abs(np.diff(boundary[~np.isnan(boundary)]))
+
+    def leaf_edges(self):
+        """Leaf position boundaries of every control point, in mm.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``(n_cp, n_leaves)`` lower boundary of each leaf of the beam
+            of each control point, padded with NaN as the banks.
+        numpy.ndarray
+            ``(n_cp, n_leaves)`` upper boundary of each leaf.
+
+        Raises
+        ------
+        ValueError
+            If the number of leaves of a beam does not match its leaf
+            position boundaries.
+
+        """
+        width = self.bank_a.shape[1]
+        lower = np.full((self.n_beams, width), np.nan)
+        upper = np.full((self.n_beams, width), np.nan)
+        for beam in range(self.n_beams):
+            boundary = self.boundaries[beam]
+            boundary = boundary[~np.isnan(boundary)]
+            if len(boundary) - 1 != self.n_leaves[beam]:
+                raise ValueError(
+                    "The number of leaves does not match the leaf "
+                    f"boundaries of the beam {beam + 1}"
+                )
+            count = len(boundary) - 1
+            lower[beam, :count] = np.minimum(boundary[:-1], boundary[1:])
+            upper[beam, :count] = np.maximum(boundary[:-1], boundary[1:])
+        return lower[self.beam], upper[self.beam]
+
+    def width_matrix(self):
+        """Width of the leaves of every control point, in mm.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``(n_cp, n_leaves)`` widths of the leaves of the beam of each
+            control point, padded with NaN as the banks.
+
+        Raises
+        ------
+        ValueError
+            If the number of leaves of a beam does not match its leaf
+            position boundaries.
+
+        """
+        lower, upper = self.leaf_edges()
+        return upper - lower
+
+    def leaf_gaps(self):
+        """Opening between the two banks of each leaf pair, in mm.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``(n_cp, n_leaves)`` absolute difference between the banks.
+
+        """
+        return np.abs(self.bank_b - self.bank_a)
+
+    def exposed_area(self, jaws=True):
+        """Area exposed by each leaf pair of every control point, in mm².
+
+        The opening between the two banks of each leaf pair is clipped
+        by the jaws along the direction of motion of the leaves, and the
+        band of the leaf by the jaws along the other direction. The jaws
+        missing in the plan do not clip. The result is computed once and
+        kept, so it can be reused by other metrics.
+
+        Parameters
+        ----------
+        jaws : bool, default=True
+            Clip the leaf openings with the jaws.
+
+        Returns
+        -------
+        numpy.ndarray
+            Read-only ``(n_cp, n_leaves)`` exposed area of each leaf
+            pair, padded with NaN as the banks.
+
+        Raises
+        ------
+        ValueError
+            If the number of leaves of a beam does not match its leaf
+            position boundaries.
+
+        """
+        if jaws not in self._exposed:
+            lower, upper = self.leaf_edges()
+            start = np.minimum(self.bank_a, self.bank_b)
+            stop = np.maximum(self.bank_a, self.bank_b)
+            if jaws:
+                along_x = (self.mlc_type == "MLCX")[self.beam][:, np.newaxis]
+                motion = np.where(along_x, self.jaw_x, self.jaw_y)
+                band = np.where(along_x, self.jaw_y, self.jaw_x)
+                start = np.fmax(start, motion[:, :1])
+                stop = np.fmin(stop, motion[:, 1:])
+                lower = np.fmax(lower, band[:, :1])
+                upper = np.fmin(upper, band[:, 1:])
+            with np.errstate(invalid="ignore"):
+                area = np.maximum(stop - start, 0.0) * np.maximum(
+                    upper - lower, 0.0
+                )
+            area[np.isnan(self.bank_a) | np.isnan(self.bank_b)] = np.nan
+            area.flags.writeable = False
+            self._exposed[jaws] = area
+        return self._exposed[jaws]
+
+    def aperture_area(self, jaws=True):
+        """Area of the MLC aperture of every control point, in mm².
+
+        The gap of each leaf pair is multiplied by the width of the leaf,
+        taken from the leaf position boundaries of its own beam, after
+        clipping both with the jaws (see ``exposed_area``).
+
+        Parameters
+        ----------
+        jaws : bool, default=True
+            Clip the leaf openings with the jaws.
+
+        Returns
+        -------
+        numpy.ndarray
+            Area of each control point.
+
+        Raises
+        ------
+        ValueError
+            If the number of leaves of a beam does not match its leaf
+            position boundaries.
+
+        """
+        return np.nansum(self.exposed_area(jaws), axis=1)
@@ -0,0 +1,712 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Conversion between planar contours and voxel masks.
+
+The contours of a structure are filled slice by slice with a scanline
+algorithm following the even-odd rule, so inner contours (holes) and
+several polygons per slice are supported. The masks are converted back
+to planar contours with marching squares. Both directions work on all
+the slices at once with NumPy.
+
+The masks of the structures on arbitrary grids (e.g. the dose grid) are
+cropped to their bounding boxes and kept in a cache, so a structure is
+never rasterized twice on the same grid. The masks are compared packed
+with 8 voxels per byte.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import collections
+import threading
+
+import numpy as np
+
+# =============================================================================
+# RASTERIZATION
+# =============================================================================
+
+
+def contour_planes(points, offsets):
+    """Return the z coordinate of each contour.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        ``(N, 3)`` array with all the points of the structure.
+    offsets : numpy.ndarray
+        Slice offsets of the structure.
+
+    Returns
+    -------
+    numpy.ndarray
+        z coordinate of the first point of each contour (NaN for the
+        empty contours).
+
+    """
+    lengths = np.diff(offsets)
+    z = np.full(len(lengths), np.nan)
+    z[lengths > 0] = points[offsets[:-1][lengths > 0], 2]
+    return z
+
+
+def nearest(axis, values):
+    """Position of the nearest coordinate of an ascending axis.
+
+    Parameters
+    ----------
+    axis : numpy.ndarray
+        Ascending coordinates.
+    values : numpy.ndarray
+        Coordinates to look up (NaN gives the last position).
+
+    Returns
+    -------
+    numpy.ndarray
+        Position in ``axis`` of the coordinate nearest to each value.
+
+    """
+    if len(axis) == 1:
+        return np.zeros(len(values), dtype=int)
+    right = np.clip(np.searchsorted(axis, values), 1, len(axis) - 1)
+    left = right - 1
+    closer = np.abs(values - axis[left]) <= np.abs(axis[right] - values)
+    return np.where(closer, left, right)
+
+
+def rasterize(points, offsets, x, y, z):
+    """Fill the contours of a structure on a voxel grid.
+
+    A voxel is inside the structure when its centre is inside an odd
+    number of contours of its slice. The contours with less than three
+    points and the contours that do not lie on a plane of the grid
+    (within half the smallest distance between planes) are ignored.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        ``(N, 3)`` array with all the points of the structure.
+    offsets : numpy.ndarray
+        Slice offsets of the structure.
+    x, y : numpy.ndarray
+        Ascending and evenly spaced coordinates of the voxel centres.
+    z : numpy.ndarray
+        Ascending coordinates of the planes of the grid.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean mask with shape ``(len(z), len(y), len(x))``.
+
+    """
+    mask = np.zeros((len(z), len(y), len(x) + 1), dtype=np.int8)
+    lengths = np.diff(offsets)
+    if len(z) == 0 or len(x) == 0 or len(y) == 0:
+        return mask[:, :, :-1].astype(bool)
+    dz = np.min(np.diff(z)) if len(z) > 1 else 1.0
+    planes = contour_planes(points, offsets)
+    plane = nearest(z, planes)
+    valid = (lengths >= 3) & np.isfinite(planes)
+    valid[valid] = np.abs(z[plane[valid]] - planes[valid]) <= dz / 2
+    if not valid.any():
+        return mask[:, :, :-1].astype(bool)
+
+    # Edges of the valid contours, each point joined with the next one
+    # and the last point with the first one.
+    contour = np.repeat(np.arange(len(lengths)), lengths)
+    selected = valid[contour]
+    index = np.arange(len(points))
+    following = index + 1
+    last = offsets[1:][lengths > 0] - 1
+    following[last] = offsets[:-1][lengths > 0]
+    start, stop = points[index[selected]], points[following[selected]]
+    edge_plane = plane[contour[selected]].astype(int)
+
+    # Rows crossed by each edge, with the half-open rule y0 <= y < y1.
+    dy = y[1] - y[0] if len(y) > 1 else 1.0
+    low = np.minimum(start[:, 1], stop[:, 1])
+    high = np.maximum(start[:, 1], stop[:, 1])
+    first = np.clip(np.ceil((low - y[0]) / dy), 0, len(y)).astype(int)
+    last = np.clip(np.ceil((high - y[0]) / dy), 0, len(y)).astype(int)
+    count = np.maximum(last - first, 0)
+    edge = np.repeat(np.arange(len(start)), count)
+    row = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    row += first[edge]
+
+    # Crossing of each edge with the rows and toggles of the parity.
+    y_row = y[row]
+    fraction = (y_row - start[edge, 1]) / (stop[edge, 1] - start[edge, 1])
+    x_cross = start[edge, 0] + fraction * (stop[edge, 0] - start[edge, 0])
+    dx = x[1] - x[0] if len(x) > 1 else 1.0
+    column = np.clip(np.ceil((x_cross - x[0]) / dx), 0, len(x)).astype(int)
+    np.add.at(mask, (edge_plane[edge], row, column), 1)
+    parity = np.bitwise_xor.accumulate(mask & 1, axis=2)
+    return parity[:, :, :-1].astype(bool)
+
+
+# =============================================================================
+# CONTOUR EXTRACTION
+# =============================================================================
+
+# Edges of a marching squares cell, numbered top (0), right (1),
+# bottom (2) and left (3), with the position of their midpoints as
+# (row, column) offsets from the top-left corner of the cell.
+_EDGE_MIDPOINTS = np.array([[0.0, 0.5], [0.5, 1.0], [1.0, 0.5], [0.5, 0.0]])
+
+# Corners of the cell: top-left, top-right, bottom-right, bottom-left.
+_CORNERS = np.array([[0.0, 0.0], [0.0, 1.0], [1.0, 1.0], [1.0, 0.0]])
+
+
+def _orient(edges, corner):
+    """Orient a segment with the inside corner ``corner`` on its left."""
+    entry, exit_ = _EDGE_MIDPOINTS[edges[0]], _EDGE_MIDPOINTS[edges[1]]
+    direction, relative = exit_ - entry, _CORNERS[corner] - entry
+    cross = direction[1] * relative[0] - direction[0] * relative[1]
+    return [edges[0], edges[1]] if cross > 0 else [edges[1], edges[0]]
+
+
+def _cell_table():
+    """Build the segments of the 16 cases of marching squares.
+
+    The edge ``e`` joins the corners ``e`` and ``e + 1``. Each segment
+    is a pair (entry edge, exit edge) oriented with the inside of the
+    structure on the same side. In the saddle cases, each inside corner
+    is cut off by its own segment.
+
+    """
+    entries, exits = np.full((16, 2), -1), np.full((16, 2), -1)
+    for case in range(16):
+        inside = [bool(case & (8 >> corner)) for corner in range(4)]
+        crossed = [
+            edge for edge in range(4) if inside[edge] != inside[(edge + 1) % 4]
+        ]
+        if len(crossed) == 4:
+            segments = [
+                _orient([(corner - 1) % 4, corner], corner)
+                for corner in range(4)
+                if inside[corner]
+            ]
+        elif crossed:
+            segments = [_orient(crossed, inside.index(True))]
+        else:
+            segments = []
+        for slot, (entry, exit_) in enumerate(segments):
+            entries[case, slot], exits[case, slot] = entry, exit_
+    return entries, exits
+
+
+_ENTRIES, _EXITS = _cell_table()
+
+
+def _cycles(successor):
+    """Order the elements of a permutation along its cycles.
+
+    Pointer jumping is used to find the smallest element of each cycle,
+    which is taken as its leader, and the position of every element
+    along the cycle starting at the leader.
+
+    Returns
+    -------
+    numpy.ndarray
+        Label (leader) of the cycle of each element.
+    numpy.ndarray
+        Order of the elements, cycle after cycle.
+
+    """
+    size = len(successor)
+    label, jump = np.arange(size), successor.copy()
+    for _ in range(int(np.ceil(np.log2(max(size, 2)))) + 1):
+        label = np.minimum(label, label[jump])
+        jump = jump[jump]
+    predecessor = np.empty(size, dtype=int)
+    predecessor[successor] = np.arange(size)
+    # Break each cycle before its leader and rank the elements by their
+    # distance to the end of the resulting list.
+    jump = successor.copy()
+    tails = predecessor[np.unique(label)]
+    jump[tails] = tails
+    distance = (jump != np.arange(size)).astype(int)
+    for _ in range(int(np.ceil(np.log2(max(size, 2)))) + 1):
+        distance = distance + distance[jump]
+        jump = jump[jump]
+    return label, np.lexsort((-distance, label))
+
+
+def extract_contours(mask, x, y, z):
+    """Convert a voxel mask into planar contours.
+
+    The contours follow the midpoints between inside and outside voxels
+    (marching squares). Collinear points are removed.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        Boolean mask with shape ``(len(z), len(y), len(x))``.
+    x, y, z : numpy.ndarray
+        Ascending and evenly spaced coordinates of the voxel centres.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(N, 3)`` array with the points of all the contours.
+    numpy.ndarray
+        Slice offsets of the contours, which are sorted by z.
+
+    """
+    padded = np.pad(mask.astype(np.uint8), ((0, 0), (1, 1), (1, 1)))
+    case = (
+        padded[:, :-1, :-1] * 8
+        + padded[:, :-1, 1:] * 4
+        + padded[:, 1:, 1:] * 2
+        + padded[:, 1:, :-1]
+    )
+    planes, rows, columns = np.nonzero((case > 0) & (case < 15))
+    cases = case[planes, rows, columns]
+    n_segments = (_ENTRIES >= 0).sum(axis=1)
+    count = n_segments[cases]
+    cell = np.repeat(np.arange(len(cases)), count)
+    slot = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    entry = _ENTRIES[cases[cell], slot]
+    exit_ = _EXITS[cases[cell], slot]
+    plane, row, column = planes[cell], rows[cell], columns[cell]
+    if len(entry) == 0:
+        return np.empty((0, 3)), np.zeros(1, dtype=int)
+
+    # Global identifier of the edges: horizontal edges (top and bottom)
+    # are even and vertical edges (left and right) are odd.
+    shape = np.array(padded.shape)
+
+    def edge_id(edge):
+        edge_row = row + (edge == 2)
+        edge_column = column + (edge == 1)
+        flat = (plane * shape[1] + edge_row) * shape[2] + edge_column
+        return flat * 2 + (edge % 2 == 1)
+
+    start_id, stop_id = edge_id(entry), edge_id(exit_)
+    order = np.argsort(start_id)
+    successor = order[np.searchsorted(start_id[order], stop_id)]
+    label, sequence = _cycles(successor)
+
+    # Coordinates of the midpoint of the entry edge of each segment,
+    # in the unpadded grid.
+    midpoint = _EDGE_MIDPOINTS[entry[sequence]]
+    i = row[sequence] + midpoint[:, 0] - 1
+    j = column[sequence] + midpoint[:, 1] - 1
+    label = label[sequence]
+
+    # Remove the collinear points of each cycle.
+    boundary = np.flatnonzero(np.diff(label)) + 1
+    starts = np.concatenate([[0], boundary])
+    stops = np.concatenate([boundary, [len(label)]])
+    position = np.arange(len(label))
+    group = np.repeat(np.arange(len(starts)), stops - starts)
+    previous = np.where(
+        position == starts[group], stops[group] - 1, position - 1
+    )
+    following = np.where(
+        position == stops[group] - 1, starts[group], position + 1
+    )
+    cross = (i - i[previous]) * (j[following] - j) - (j - j[previous]) * (
+        i[following] - i
+    )
+    lengths = np.bincount(group, weights=cross != 0).astype(int)
+    keep = (cross != 0) & (lengths >= 3)[group]
+    dx = x[1] - x[0] if len(x) > 1 else 1.0
+    dy = y[1] - y[0] if len(y) > 1 else 1.0
+    contour_points = np.column_stack(
+        [x[0] + j * dx, y[0] + i * dy, z[plane[sequence]]]
+    )[keep]
+    lengths = lengths[lengths >= 3]
+    return contour_points, np.concatenate([[0], np.cumsum(lengths)])
+
+
+# =============================================================================
+# GRIDS AND MASKS
+# =============================================================================
+
+# Memory used by default by the masks of a cache, in bytes.
+CACHE_BYTES = 256 * 2**20
+
+# Number of bits set in each byte.
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], np.uint8)
+
+# Tolerance of the z coordinates of the contours, which are compared
+# rounded to 0.001 mm.
+Z_TOLERANCE = 5e-4
+
+
+class Grid:
+    """Voxel grid on which the structures are rasterized.
+
+    Parameters
+    ----------
+    x, y : array_like
+        Evenly spaced coordinates of the voxel centres, in mm. They may
+        be ascending or descending.
+    z : array_like
+        Ascending or descending coordinates of the planes, in mm.
+
+    Attributes
+    ----------
+    x, y, z : numpy.ndarray
+        Read-only coordinates of the grid.
+    key : tuple
+        Hashable identity of the grid, equal for grids with the same
+        coordinates.
+
+    Raises
+    ------
+    ValueError
+        If an axis is empty or not monotonic, or if the x or y axis is
+        not evenly spaced.
+
+    """
+
+    def __init__(self, x, y, z):
+        axes = []
+        for name, axis in zip("xyz", (x, y, z)):
+            axis = np.array(axis, dtype=float).ravel()
+            steps = np.diff(axis)
+            if len(axis) == 0 or not (np.all(steps > 0) or np.all(steps < 0)):
+                raise ValueError(f"The {name} axis must be monotonic")
+            if name != "z" and not np.allclose(steps, steps[:1]):
+                raise ValueError(f"The {name} axis must be evenly spaced")
+            axis.flags.writeable = False
+            axes.append(axis)
+        self.x, self.y, self.z = axes
+        self.key = tuple(axis.tobytes() for axis in axes)
+
+    @classmethod
+    def regular(cls, low, high, spacing):
+        """Build a grid that covers a box.
+
+        Parameters
+        ----------
+        low, high : array_like
+            Lowest and highest x, y and z of the voxel centres, in mm.
+        spacing : float or array_like
+            Size of the voxels, the same along every axis or one per axis.
+
+        Returns
+        -------
+        Grid
+            Grid with ascending axes starting at ``low``.
+
+        """
+        low, high = np.asarray(low, float), np.asarray(high, float)
+        spacing = np.broadcast_to(np.asarray(spacing, float), 3)
+        counts = np.floor((high - low) / spacing + 1e-9).astype(int) + 1
+        return cls(
+            *(
+                start + step * np.arange(count)
+                for start, step, count in zip(low, spacing, counts)
+            )
+        )
+
+    @classmethod
+    def from_dose(cls, dose_grid):
+        """Build the grid of a ``dicomhandler.dose.DoseGrid``."""
+        return cls(dose_grid.x, dose_grid.y, dose_grid.z)
+
+    @property
+    def shape(self):
+        """Shape of the masks, ``(len(z), len(y), len(x))``."""
+        return len(self.z), len(self.y), len(self.x)
+
+    def __eq__(self, other):
+        """Return True if the grids have the same coordinates."""
+        return isinstance(other, Grid) and self.key == other.key
+
+    def __hash__(self):
+        """Hash of the coordinates."""
+        return hash(self.key)
+
+
+class VoxelMask:
+    """Mask of a structure on a grid, cropped to its bounding box.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        Boolean mask of the voxels in the box.
+    box : tuple
+        Slices of the frames, rows and columns of the grid in the box.
+    shape : tuple
+        Shape of the whole grid.
+
+    """
+
+    def __init__(self, values, box, shape):
+        values.flags.writeable = False
+        self.values = values
+        self.box = box
+        self.shape = shape
+        self._packed = None
+
+    @property
+    def count(self):
+        """Number of voxels inside the structure."""
+        return int(np.count_nonzero(self.values))
+
+    def full(self):
+        """Return the mask on the whole grid."""
+        mask = np.zeros(self.shape, dtype=bool)
+        mask[self.box] = self.values
+        return mask
+
+    def packed(self):
+        """Return the mask with 8 columns per byte.
+
+        The columns of the box are extended to multiples of 8, so the
+        bytes of the masks on the same grid are aligned.
+
+        Returns
+        -------
+        numpy.ndarray
+            Packed mask of the box, with shape ``(frames, rows, bytes)``.
+        tuple
+            Slices of the frames, rows and bytes of the grid in the box.
+
+        """
+        if self._packed is None:
+            frames, rows, columns = self.box
+            start = columns.start // 8 * 8
+            stop = max(start, -(-columns.stop // 8) * 8)
+            values = np.zeros(self.values.shape[:2] + (stop - start,), bool)
+            inside = slice(columns.start - start, columns.stop - start)
+            values[:, :, inside] = self.values
+            bits = np.packbits(values, axis=2)
+            bits.flags.writeable = False
+            self._packed = bits, (frames, rows, slice(start // 8, stop // 8))
+        return self._packed
+
+
+def intersection(mask1, mask2):
+    """Number of voxels inside two structures on the same grid.
+
+    Only the intersection of the boxes of the masks is compared, with
+    the packed masks (see ``VoxelMask.packed``).
+
+    Raises
+    ------
+    ValueError
+        If the masks are on grids of different shapes.
+
+    """
+    if mask1.shape != mask2.shape:
+        raise ValueError("The masks must be on the same grid")
+    bits1, box1 = mask1.packed()
+    bits2, box2 = mask2.packed()
+    crops1, crops2 = [], []
+    for span1, span2 in zip(box1, box2):
+        low = max(span1.start, span2.start)
+        high = min(span1.stop, span2.stop)
+        if high <= low:
+            return 0
+        crops1.append(slice(low - span1.start, high - span1.start))
+        crops2.append(slice(low - span2.start, high - span2.start))
+    common = np.bitwise_and(bits1[tuple(crops1)], bits2[tuple(crops2)])
+    return int(POPCOUNT[common].sum(dtype=np.int64))
+
+
+def _ascending(axis):
+    """Ascending version of an axis and whether it was flipped."""
+    flipped = len(axis) > 1 and axis[0] > axis[-1]
+    return (axis[::-1] if flipped else axis), flipped
+
+
+def _span(axis, low, high):
+    """Slice of an ascending axis with the coordinates in [low, high]."""
+    return slice(
+        int(np.searchsorted(axis, low, side="left")),
+        int(np.searchsorted(axis, high, side="right")),
+    )
+
+
+def structure_mask(points, offsets, grid, thickness=None):
+    """Rasterize a structure on a grid.
+
+    Each plane of the grid takes the contours of the nearest plane of
+    the structure, if it is closer than half the slice thickness, so
+    the structure fills the grid between its contours whatever the
+    distance between the planes of the grid. Only the contours with at
+    least three points are filled.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        ``(N, 3)`` array with all the points of the structure.
+    offsets : numpy.ndarray
+        Slice offsets of the structure.
+    grid : Grid
+        Grid of the mask.
+    thickness : float, optional
+        Slice thickness of the structure. By default, the smallest
+        distance between its planes or, with a single plane, between
+        the planes of the grid.
+
+    Returns
+    -------
+    VoxelMask
+        Mask cropped to the bounding box of the structure.
+
+    """
+    empty = VoxelMask(
+        np.zeros((0, 0, 0), dtype=bool), (slice(0, 0),) * 3, grid.shape
+    )
+    lengths = np.diff(offsets)
+    planes = contour_planes(points, offsets)
+    closed = (lengths >= 3) & np.isfinite(planes)
+    if not closed.any():
+        return empty
+    levels = np.unique(np.round(planes[closed], 3))
+    if thickness is None:
+        if len(levels) > 1:
+            thickness = np.min(np.diff(levels))
+        elif len(grid.z) > 1:
+            thickness = np.min(np.abs(np.diff(grid.z)))
+        else:
+            thickness = 0.0
+    (x, flip_x), (y, flip_y), (z, flip_z) = map(
+        _ascending, (grid.x, grid.y, grid.z)
+    )
+
+    # Planes of the grid covered by the structure and their nearest
+    # plane of the structure.
+    level = nearest(levels, z)
+    covered = np.abs(z - levels[level]) <= thickness / 2 + Z_TOLERANCE
+    if not covered.any():
+        return empty
+    first, last = np.flatnonzero(covered)[[0, -1]]
+    frames = slice(int(first), int(last) + 1)
+    low, high = level[frames].min(), level[frames].max()
+
+    # Closed contours of the planes used, cropped in x and y to the
+    # bounding box of their points.
+    used = closed & (np.round(planes, 3) >= levels[low])
+    used &= np.round(planes, 3) <= levels[high]
+    inside = np.repeat(used, lengths)
+    contour_points = points[inside]
+    contour_offsets = np.concatenate([[0], np.cumsum(lengths[used])])
+    lowest, highest = contour_points.min(axis=0), contour_points.max(axis=0)
+    columns = _span(x, lowest[0], highest[0])
+    rows = _span(y, lowest[1], highest[1])
+    if columns.start >= columns.stop or rows.start >= rows.stop:
+        return empty
+    stack = rasterize(
+        contour_points,
+        contour_offsets,
+        x[columns],
+        y[rows],
+        levels[slice(low, high + 1)],
+    )
+    values = stack[level[frames] - low] & covered[frames, None, None]
+
+    # Back to the orientation of the grid.
+    box = []
+    for axis, span, flipped in zip(
+        range(3), (frames, rows, columns), (flip_z, flip_y, flip_x)
+    ):
+        size = grid.shape[axis]
+        if flipped:
+            values = np.flip(values, axis)
+            span = slice(size - span.stop, size - span.start)
+        box.append(span)
+    return VoxelMask(np.ascontiguousarray(values), tuple(box), grid.shape)
+
+
+class MaskCache:
+    """Masks of structures on grids with least recently used eviction.
+
+    The masks are identified by the arrays of points and offsets of the
+    structure and by the grid. The arrays of the contour store are never
+    modified in place, so a moved or expanded structure gets new masks
+    and the copies of a store share the masks of the structures that
+    they do not modify. The cache is safe to use from several threads.
+
+    Parameters
+    ----------
+    max_bytes : int, default=CACHE_BYTES
+        Memory used by the masks. The least recently used masks are
+        evicted beyond it.
+
+    Attributes
+    ----------
+    nbytes : int
+        Memory used by the masks.
+    hits, misses : int
+        Number of masks found in the cache and rasterized.
+
+    """
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._masks = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of masks."""
+        return len(self._masks)
+
+    def __getstate__(self):
+        """Pickle (or deep copy) the cache empty, without its lock."""
+        return {"max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        """Build an empty cache."""
+        self.__init__(state["max_bytes"])
+
+    def get(self, points, offsets, grid, thickness=None):
+        """Return the mask of a structure, rasterizing it if needed.
+
+        Parameters
+        ----------
+        points : numpy.ndarray
+            ``(N, 3)`` array with all the points of the structure.
+        offsets : numpy.ndarray
+            Slice offsets of the structure.
+        grid : Grid
+            Grid of the mask.
+        thickness : float, optional
+            Slice thickness of the structure (see ``structure_mask``).
+
+        Returns
+        -------
+        VoxelMask
+            Mask cropped to the bounding box of the structure.
+
+        """
+        # The entries keep the arrays alive, so their ids are not reused.
+        key = (id(points), id(offsets), grid.key, thickness)
+        with self._lock:
+            entry = self._masks.get(key)
+            if entry is not None:
+                self._masks.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+        mask = structure_mask(points, offsets, grid, thickness)
+        with self._lock:
+            if key not in self._masks:
+                self.misses += 1
+                self._masks[key] = (points, offsets, mask)
+                self.nbytes += mask.values.nbytes
+            while self.nbytes > self.max_bytes and len(self._masks) > 1:
+                _, (_, _, evicted) = self._masks.popitem(last=False)
+                self.nbytes -= evicted.values.nbytes
+        return mask
+
+    def clear(self):
+        """Remove all the masks."""
+        with self._lock:
+            self._masks.clear()
+            self.nbytes = 0
@@ -1,12 +1,34 @@
 """Report to extract complementary information.
 
-Allows to compare distances from two structures.
+Allows to compare distances from two structures, point to point or
+from surface to surface, and their volumes. The metrics of all the
+structures at once (``report_all``, ``surface_distance`` and
+``overlap``) take the last ROI of a repeated name, as the methods of
+``DicomInfo``.
 
 """
+
 import numpy as np
 
 import pandas as pd
 
+from .raster import Grid, intersection
+from .spatial import PointIndex
+
+PARAMETERS = [
+    "Max radius",
+    "Min radius",
+    "Mean radius",
+    "STD radius",
+    "Variance radius",
+    "Max distance",
+    "Min distance",
+    "Mean distance",
+    "STD distance",
+    "Variance distance",
+    "Distance between center mass",
+]
+
 
 def report(dicom1, dicom2, struct):
     """Report metrics from structures.
@@ -46,51 +68,22 @@ def report(dicom1, dicom2, struct):
     >>> # Report for the original and displaced lesion.
     >>> rp(dicom, moved, 'tumor')
     """
-    all_values, radius, distance = [], [], []
+    all_values = []
     for _, file in enumerate([dicom1, dicom2]):
-        for item, name in enumerate(file.dicom_struct.StructureSetROISequence):
-            array = []
-            if name.ROIName == struct:
-                for _, contour in enumerate(
-                    file.dicom_struct.ROIContourSequence[item].ContourSequence
-                ):
-                    count = 0
-                    while count < int(len(contour.ContourData) / 3):
-                        array.append(
-                            [
-                                float(contour.ContourData[3 * count]),
-                                float(contour.ContourData[3 * count + 1]),
-                                float(contour.ContourData[3 * count + 2]),
-                            ]
-                        )
-                        count = count + 1
-                all_values.append(array)
+        store = file.contours
+        for item, name in enumerate(store.names):
+            if name == struct:
+                all_values.append(store.points(item))
     if len(all_values) == 0:
         raise ValueError("Wrong name or name must match between two DICOM")
-    elif len(all_values[0][:][:]) == len(all_values[1][:][:]):
-        centermass = np.mean(all_values, axis=1)
-        difference = np.array(all_values[0][:][:]) - np.array(
-            all_values[1][:][:]
-        )
-        for item, vector in enumerate(np.array(all_values[0][:][:])):
-            radius.append(np.linalg.norm(vector - centermass[0]))
-            distance.append(np.linalg.norm(difference[item]))
+    elif len(all_values[0]) == len(all_values[1]):
+        centermass = [np.mean(values, axis=0) for values in all_values[:2]]
+        radius = np.linalg.norm(all_values[0] - centermass[0], axis=1)
+        distance = np.linalg.norm(all_values[0] - all_values[1], axis=1)
     else:
         raise ValueError("Contours length differs")
     data = {
-        "Parameter": [
-            "Max radius",
-            "Min radius",
-            "Mean radius",
-            "STD radius",
-            "Variance radius",
-            "Max distance",
-            "Min distance",
-            "Mean distance",
-            "STD distance",
-            "Variance distance",
-            "Distance between center mass",
-        ],
+        "Parameter": PARAMETERS,
         "Value [mm]": [
             round(np.max(radius), 3),
             round(np.min(radius), 3),
@@ -106,3 +99,289 @@ def report(dicom1, dicom2, struct):
         ],
     }
     return pd.DataFrame(data)
+
+
+def _segment_statistics(values, starts, counts):
+    """Maximum, minimum, mean, STD and variance of consecutive segments."""
+    mean = np.add.reduceat(values, starts) / counts
+    variance = (
+        np.add.reduceat((values - np.repeat(mean, counts)) ** 2, starts)
+        / counts
+    )
+    return [
+        np.maximum.reduceat(values, starts),
+        np.minimum.reduceat(values, starts),
+        mean,
+        np.sqrt(variance),
+        variance,
+    ]
+
+
+def report_all(dicom1, dicom2, names=None):
+    """Report metrics from all the structures at once.
+
+    The same metrics of ``report`` are computed for every structure
+    with the same name in both objects. The points of all the structures
+    are concatenated and the metrics of every structure are reduced at
+    once, instead of searching the structures one by one.
+
+    Parameters
+    ----------
+    dicom1 : dicomhandler.dicom_info.DicomInfo
+        First object with structures.
+    dicom2 : dicomhandler.dicom_info.DicomInfo
+        Second object with structures.
+    names : list, default=None
+        Names of the structures. By default, all the structures with
+        the same name and number of points in both objects, skipping the
+        empty ones.
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        Long dataframe with the columns 'roi', 'Parameter' and
+        'Value [mm]', with the rows of ``report`` for each structure.
+
+    Raises
+    ------
+    ValueError
+        If a name of the list is not in both objects or the number of
+        points of a structure differs between them.
+
+    Examples
+    --------
+    >>> from dicomhandler.report import report_all
+    >>> report_all(dicom, moved)
+    >>> report_all(dicom, moved, ['tumor', 'brainstem'])
+    """
+    store1, store2 = dicom1.contours, dicom2.contours
+    items1, items2 = store1.index, store2.index
+    if names is None:
+        names = [
+            name
+            for name in items1
+            if name in items2
+            and 0
+            < store1.offsets(items1[name])[-1]
+            == store2.offsets(items2[name])[-1]
+        ]
+    pairs = []
+    for name in names:
+        if name not in items1 or name not in items2:
+            raise ValueError("Wrong name or name must match between two DICOM")
+        points1 = store1.points(items1[name])
+        points2 = store2.points(items2[name])
+        if len(points1) != len(points2) or len(points1) == 0:
+            raise ValueError("Contours length differs")
+        pairs.append((points1, points2))
+    if not pairs:
+        return pd.DataFrame(
+            {"roi": pd.Categorical([]), "Parameter": [], "Value [mm]": []}
+        )
+    counts = np.array([len(points1) for points1, _ in pairs])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    points1 = np.concatenate([points1 for points1, _ in pairs])
+    points2 = np.concatenate([points2 for _, points2 in pairs])
+    centermass1 = np.add.reduceat(points1, starts) / counts[:, None]
+    centermass2 = np.add.reduceat(points2, starts) / counts[:, None]
+    radius = np.linalg.norm(
+        points1 - np.repeat(centermass1, counts, axis=0), axis=1
+    )
+    distance = np.linalg.norm(points1 - points2, axis=1)
+    values = np.column_stack(
+        _segment_statistics(radius, starts, counts)
+        + _segment_statistics(distance, starts, counts)
+        + [np.linalg.norm(centermass1 - centermass2, axis=1)]
+    )
+    return pd.DataFrame(
+        {
+            "roi": pd.Categorical(np.repeat(names, len(PARAMETERS))),
+            "Parameter": PARAMETERS * len(names),
+            "Value [mm]": [round(value, 3) for value in values.ravel()],
+        }
+    )
+
+
+def _structure_points(dicom, struct):
+    """Points of the structure with a name, the last one if repeated."""
+    store = dicom.contours
+    if struct not in store.index:
+        raise ValueError("Wrong name or name must match between two DICOM")
+    points = store.points(store.index[struct])
+    if len(points) == 0:
+        raise ValueError(f"{struct} has no points")
+    return points
+
+
+def surface_distance(dicom1, dicom2, struct1, struct2=None, percentile=95):
+    """Report surface distances between two structures.
+
+    The distance from each point of a structure to the nearest point of
+    the other one is found with a spatial index (see
+    ``dicomhandler.spatial.PointIndex``), so the structures can have
+    different numbers of points, e.g. after a margin or a new
+    contouring. The surfaces are sampled by the points of the contours.
+
+    Parameters
+    ----------
+    dicom1 : dicomhandler.dicom_info.DicomInfo
+        First object with structures.
+    dicom2 : dicomhandler.dicom_info.DicomInfo
+        Second object with structures, can be the first one.
+    struct1 : str
+        Name of the structure of the first object.
+    struct2 : str, default=None
+        Name of the structure of the second object, by default the same
+        name.
+    percentile : float, default=95
+        Percentile of the distances of the percentile Hausdorff
+        distance.
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        Dataframe with the directed and symmetric Hausdorff distances,
+        the percentile Hausdorff distance and the mean surface distance.
+
+    Raises
+    ------
+    ValueError
+        If a name is wrong or a structure has no points.
+
+    Examples
+    --------
+    >>> from dicomhandler.report import surface_distance
+    >>> surface_distance(dicom, dicom.add_margin('tumor', 2.0), 'tumor')
+    >>> surface_distance(dicom, dicom, 'tumor', 'brainstem')
+    """
+    if struct2 is None:
+        struct2 = struct1
+    points1 = _structure_points(dicom1, struct1)
+    points2 = _structure_points(dicom2, struct2)
+    distance12 = PointIndex(points2).query(points1)
+    distance21 = PointIndex(points1).query(points2)
+    data = {
+        "Parameter": [
+            "Hausdorff distance 1 to 2",
+            "Hausdorff distance 2 to 1",
+            "Hausdorff distance",
+            f"{percentile}% Hausdorff distance",
+            "Mean surface distance",
+        ],
+        "Value [mm]": [
+            round(np.max(distance12), 3),
+            round(np.max(distance21), 3),
+            round(max(np.max(distance12), np.max(distance21)), 3),
+            round(
+                max(
+                    np.percentile(distance12, percentile),
+                    np.percentile(distance21, percentile),
+                ),
+                3,
+            ),
+            round(
+                (np.sum(distance12) + np.sum(distance21))
+                / (len(distance12) + len(distance21)),
+                3,
+            ),
+        ],
+    }
+    return pd.DataFrame(data)
+
+
+def overlap(dicom1, dicom2, pairs=None, spacing=1.0):
+    """Report the volumetric overlap of pairs of structures.
+
+    All the structures are rasterized once on a shared grid that covers
+    them (see ``DicomInfo.roi_mask``) and each pair is compared only in
+    the intersection of the boxes of its masks, with the masks packed
+    with 8 voxels per byte.
+
+    Parameters
+    ----------
+    dicom1 : dicomhandler.dicom_info.DicomInfo
+        First object with structures.
+    dicom2 : dicomhandler.dicom_info.DicomInfo
+        Second object with structures, can be the first one to compare
+        the structures of the same object.
+    pairs : list, default=None
+        Names of the structures to compare, a name for the structures
+        with the same name in both objects or a tuple (name1, name2).
+        By default, all the structures with the same name in both
+        objects.
+    spacing : float or list, default=1.0
+        Size of the voxels of the grid in mm, the same along every axis
+        or one per axis [x, y, z].
+
+    Returns
+    -------
+    pandas.core.frame.DataFrame
+        Dataframe with the names of each pair, the volumes of the
+        structures and of their intersection in cm3, the Dice and
+        Jaccard indices and the ratio between the second volume and the
+        first one.
+
+    Raises
+    ------
+    ValueError
+        If a name is not in its object.
+
+    Examples
+    --------
+    >>> from dicomhandler.report import overlap
+    >>> overlap(dicom, moved)
+    >>> overlap(dicom, dicom, [('PTV', 'Brainstem'), ('PTV', 'Chiasm')])
+    """
+    store1, store2 = dicom1.contours, dicom2.contours
+    if pairs is None:
+        pairs = [name for name in store1.names if name in store2.index]
+        pairs = list(dict.fromkeys(pairs))
+    pairs = [(pair, pair) if isinstance(pair, str) else pair for pair in pairs]
+    for name1, name2 in pairs:
+        if name1 not in store1.index or name2 not in store2.index:
+            raise ValueError("Wrong name or name must match between two DICOM")
+    columns = [
+        "roi1",
+        "roi2",
+        "volume1",
+        "volume2",
+        "intersection",
+        "Dice",
+        "Jaccard",
+        "volume ratio",
+    ]
+    if not pairs:
+        return pd.DataFrame(columns=columns)
+    names1 = dict.fromkeys(name1 for name1, _ in pairs)
+    names2 = dict.fromkeys(name2 for _, name2 in pairs)
+    points = np.concatenate(
+        [store1.points(store1.index[name]) for name in names1]
+        + [store2.points(store2.index[name]) for name in names2]
+    )
+    if len(points) == 0:
+        low = high = np.zeros(3)
+    else:
+        low, high = points.min(axis=0), points.max(axis=0)
+    spacing = np.broadcast_to(np.asarray(spacing, float), 3)
+    grid = Grid.regular(low, high + spacing, spacing)
+    voxel = np.prod(spacing) / 1000.0
+    rows = []
+    for name1, name2 in pairs:
+        mask1 = dicom1.roi_mask(name1, grid)
+        mask2 = dicom2.roi_mask(name2, grid)
+        count1, count2 = mask1.count, mask2.count
+        common = intersection(mask1, mask2)
+        union = count1 + count2 - common
+        rows.append(
+            [
+                name1,
+                name2,
+                count1 * voxel,
+                count2 * voxel,
+                common * voxel,
+                2 * common / (count1 + count2) if union else np.nan,
+                common / union if union else np.nan,
+                count2 / count1 if count1 else np.nan,
+            ]
+        )
+    return pd.DataFrame(rows, columns=columns)
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Scan of directories with DICOM radiotherapy files.
+
+Only the header tags needed to match the files are read, with a pool of
+threads, so large archives are sorted quickly. The structures (RS),
+plans (RP) and doses (RD) are grouped by patient and by the references
+between them: a plan references its structure set and a dose references
+its plan. The files that can not be read are reported instead of
+stopping the scan.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import pydicom
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+MODALITIES = ("RTSTRUCT", "RTPLAN", "RTDOSE")
+
+# Size of the values that are skipped instead of read.
+DEFER_SIZE = "1 KB"
+
+# Group of the ROIs and contours of the structure sets, after all the
+# tags of HEADER_TAGS that a structure set has.
+ROI_GROUP = 0x3006
+
+PIXEL_DATA = pydicom.tag.Tag("PixelData")
+
+HEADER_TAGS = [
+    "PatientID",
+    "Modality",
+    "SOPInstanceUID",
+    "StudyInstanceUID",
+    "SeriesInstanceUID",
+    "ReferencedStructureSetSequence",
+    "ReferencedRTPlanSequence",
+    "DoseSummationType",
+]
+
+COLUMNS = [
+    "path",
+    "PatientID",
+    "Modality",
+    "SOPInstanceUID",
+    "StudyInstanceUID",
+    "SeriesInstanceUID",
+    "ReferencedStructureSet",
+    "ReferencedRTPlan",
+    "DoseSummationType",
+]
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def _referenced_uid(dataset, keyword):
+    """First ReferencedSOPInstanceUID of a reference sequence."""
+    sequence = dataset.get(keyword)
+    if not sequence:
+        return None
+    return sequence[0].get("ReferencedSOPInstanceUID")
+
+
+def _header_end(tag, vr, length):
+    """Stop before the contours of a structure set or the pixels."""
+    return tag.group == ROI_GROUP or tag >= PIXEL_DATA
+
+
+def read_header(path, force=False):
+    """Read the tags of a file needed to group it.
+
+    The file is read up to the ROIs of the structure sets or the pixels
+    of the doses, and the large values before them are skipped, so the
+    contours of the structure sets, stored in sequences of undefined
+    length that can not be skipped, are never read.
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        Path of the file.
+    force : bool, default=False
+        Read the file even without a DICOM File Meta Information header.
+
+    Returns
+    -------
+    dict
+        Path, PatientID, Modality, SOP, study and series UIDs, UIDs of
+        the referenced structure set and plan and dose summation type.
+
+    Raises
+    ------
+    ValueError
+        If the file has no PatientID or Modality.
+
+    """
+    with open(path, "rb") as fp:
+        dataset = pydicom.filereader.read_partial(
+            fp,
+            stop_when=_header_end,
+            defer_size=DEFER_SIZE,
+            force=force,
+            specific_tags=[pydicom.tag.Tag(tag) for tag in HEADER_TAGS],
+        )
+    for keyword in ("PatientID", "Modality"):
+        if dataset.get(keyword) in (None, ""):
+            raise ValueError(f"Missing {keyword}")
+    return {
+        "path": pathlib.Path(path),
+        "PatientID": str(dataset.PatientID),
+        "Modality": str(dataset.Modality),
+        "SOPInstanceUID": dataset.get("SOPInstanceUID"),
+        "StudyInstanceUID": dataset.get("StudyInstanceUID"),
+        "SeriesInstanceUID": dataset.get("SeriesInstanceUID"),
+        "ReferencedStructureSet": _referenced_uid(
+            dataset, "ReferencedStructureSetSequence"
+        ),
+        "ReferencedRTPlan": _referenced_uid(
+            dataset, "ReferencedRTPlanSequence"
+        ),
+        "DoseSummationType": dataset.get("DoseSummationType"),
+    }
+
+
+def group_headers(headers):
+    """Group the files of each patient.
+
+    Every plan is grouped with the structure set that it references and
+    with one of the doses that reference it, the dose of the whole plan
+    if there is one. The files left of a patient are grouped together if
+    there is at most one of each modality and one by one otherwise.
+
+    Parameters
+    ----------
+    headers : list
+        Headers of the files (see ``read_header``).
+
+    Returns
+    -------
+    list
+        Groups of headers, each one with at most one file of each
+        modality.
+
+    """
+    patients = {}
+    for header in headers:
+        patients.setdefault(header["PatientID"], []).append(header)
+    groups = []
+    for files in patients.values():
+        by_uid = {
+            header["SOPInstanceUID"]: header
+            for header in files
+            if header["SOPInstanceUID"] is not None
+        }
+        used = set()
+        for plan in [h for h in files if h["Modality"] == "RTPLAN"]:
+            group = [plan]
+            struct = by_uid.get(plan["ReferencedStructureSet"])
+            if struct is not None and struct["Modality"] == "RTSTRUCT":
+                group.append(struct)
+            doses = [
+                header
+                for header in files
+                if header["Modality"] == "RTDOSE"
+                and plan["SOPInstanceUID"] is not None
+                and header["ReferencedRTPlan"] == plan["SOPInstanceUID"]
+                and header["path"] not in used
+            ]
+            doses.sort(key=lambda dose: dose["DoseSummationType"] != "PLAN")
+            group += doses[:1]
+            if len(group) > 1:
+                used.update(header["path"] for header in group)
+                groups.append(group)
+        left = [header for header in files if header["path"] not in used]
+        modalities = [header["Modality"] for header in left]
+        if len(modalities) == len(set(modalities)):
+            groups.append(left)
+        else:
+            groups += [[header] for header in left]
+    return [group for group in groups if group]
+
+
+# =============================================================================
+# DIRECTORY SCAN
+# =============================================================================
+
+
+class DirectoryScan:
+    """Files of a directory grouped by patient.
+
+    The headers are read when the object is built. The ``DicomInfo``
+    objects are built one by one while iterating.
+
+    Parameters
+    ----------
+    directory : str or pathlib.Path
+        Directory with the DICOM files.
+    loader : callable
+        Function that builds an object from the paths of a group, such
+        as ``DicomInfo.from_files``.
+    pattern : str, default="*.dcm"
+        Pattern of the names of the files.
+    recursive : bool, default=True
+        Search the files in the subdirectories too.
+    workers : int, default=None
+        Number of threads that read the headers (see
+        ``concurrent.futures.ThreadPoolExecutor``).
+    force : bool, default=False
+        Read the files even without a DICOM File Meta Information header.
+
+    Attributes
+    ----------
+    headers : pandas.DataFrame
+        Header tags of the radiotherapy files, one row per file.
+    groups : list
+        Paths of the files of each group.
+    bad_files : pandas.DataFrame
+        Path and error of the files that could not be read or loaded.
+
+    Other modalities (e.g. CT or MR images) are ignored.
+
+    """
+
+    def __init__(
+        self,
+        directory,
+        loader,
+        pattern="*.dcm",
+        recursive=True,
+        workers=None,
+        force=False,
+    ):
+        directory = pathlib.Path(directory)
+        if not directory.is_dir():
+            raise ValueError(f"{directory} is not a directory")
+        search = directory.rglob if recursive else directory.glob
+        paths = sorted(path for path in search(pattern) if path.is_file())
+        self._loader = loader
+        self._errors = []
+
+        def read(path):
+            try:
+                return read_header(path, force)
+            except Exception as error:
+                self._errors.append((path, f"{type(error).__name__}: {error}"))
+                return None
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            headers = [
+                header
+                for header in executor.map(read, paths)
+                if header is not None and header["Modality"] in MODALITIES
+            ]
+        self.headers = pd.DataFrame(headers, columns=COLUMNS)
+        self.groups = [
+            [header["path"] for header in group]
+            for group in group_headers(headers)
+        ]
+
+    @property
+    def bad_files(self):
+        """Path and error of the files that could not be used."""
+        return pd.DataFrame(sorted(self._errors), columns=["path", "error"])
+
+    def __len__(self):
+        """Return the number of groups."""
+        return len(self.groups)
+
+    def __iter__(self):
+        """Build the objects of the groups one by one.
+
+        The groups that can not be loaded are added to ``bad_files``.
+
+        """
+        for group in self.groups:
+            try:
+                yield self._loader(*group)
+            except Exception as error:
+                message = f"{type(error).__name__}: {error}"
+                self._errors += [(path, message) for path in group]
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Monte Carlo simulation of setup errors.
+
+Random rigid setup errors are sampled from normal distributions of the
+rotations and translations, and composed into one homogeneous matrix
+per sample. The volume of a structure is represented by the centres of
+the voxels of its mask on a regular grid, which are moved by all the
+matrices at once, in chunks, and looked up in the mask of a second
+structure (e.g. the PTV) to measure how much of the moved structure it
+covers.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import numpy as np
+
+from . import transforms
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Maximum number of moved points looked up at once.
+CHUNK_POINTS = 2**22
+
+# Columns of the errors of each sample.
+ERRORS = ("roll", "pitch", "yaw", "x", "y", "z")
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def sample_errors(count, translation, rotation, generator):
+    """Sample random rigid setup errors.
+
+    Parameters
+    ----------
+    count : int
+        Number of samples.
+    translation : array_like
+        Standard deviation of the x, y and z shifts in mm.
+    rotation : array_like
+        Standard deviation of the roll, pitch and yaw in degrees.
+    generator : numpy.random.Generator
+        Source of the random numbers.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(count, 6)`` array with the errors of ``ERRORS`` of each
+        sample.
+
+    """
+    deviations = np.concatenate(
+        (np.broadcast_to(rotation, 3), np.broadcast_to(translation, 3))
+    )
+    return generator.normal(size=(count, 6)) * deviations
+
+
+def voxel_centres(mask, grid):
+    """Coordinates of the centres of the voxels inside a mask.
+
+    Parameters
+    ----------
+    mask : dicomhandler.raster.VoxelMask
+        Mask of a structure.
+    grid : dicomhandler.raster.Grid
+        Grid of the mask.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(N, 3)`` array with the x, y and z of each voxel.
+
+    """
+    frames, rows, columns = np.nonzero(mask.values)
+    return np.column_stack(
+        (
+            grid.x[columns + mask.box[2].start],
+            grid.y[rows + mask.box[1].start],
+            grid.z[frames + mask.box[0].start],
+        )
+    )
+
+
+def coverage(matrices, points, mask, grid):
+    """Fraction of some points inside a mask after each movement.
+
+    The points are moved by chunks of matrices, of at most
+    ``CHUNK_POINTS`` moved points, and each moved point takes the voxel
+    of the mask nearest to it. The conversion to voxels is part of the
+    matrices, and the mask is padded with one empty voxel on each side,
+    so the points outside the mask are clipped to the padding. The
+    positions are computed in single precision, more than enough for
+    the position of a voxel.
+
+    Parameters
+    ----------
+    matrices : numpy.ndarray
+        ``(K, 4, 4)`` array with the matrix of each movement.
+    points : numpy.ndarray
+        ``(N, 3)`` array with the points, e.g. from ``voxel_centres``.
+    mask : dicomhandler.raster.VoxelMask
+        Mask of the covering structure.
+    grid : dicomhandler.raster.Grid
+        Grid of the mask, regular and ascending (see
+        ``dicomhandler.raster.Grid.regular``).
+
+    Returns
+    -------
+    numpy.ndarray
+        Fraction of the points inside the mask for each matrix, NaN if
+        there are no points.
+
+    """
+    if len(points) == 0:
+        return np.full(len(matrices), np.nan)
+    if mask.values.size == 0:
+        return np.zeros(len(matrices))
+    result = np.empty(len(matrices))
+    padded = np.pad(mask.values, 1).ravel()
+    shape = np.array(mask.values.shape) + 2
+    # Matrix from the patient coordinates to the position in the padded
+    # mask, plus one half, of the frame, row and column.
+    voxels = np.zeros((4, 4))
+    for axis, (coordinates, span) in enumerate(
+        zip((grid.z, grid.y, grid.x), mask.box)
+    ):
+        step = coordinates[1] - coordinates[0] if len(coordinates) > 1 else 1
+        voxels[axis, 2 - axis] = 1 / step
+        voxels[axis, 3] = 1.5 - span.start - coordinates[0] / step
+    voxels[3, 3] = 1.0
+    matrices = (voxels @ matrices).astype(np.float32)
+    points = points.astype(np.float32)
+    chunk = max(1, CHUNK_POINTS // len(points))
+    for first in range(0, len(matrices), chunk):
+        last = first + chunk
+        moved = transforms.apply_batch(matrices[first:last], points)
+        for axis in range(3):
+            np.clip(moved[:, axis], 0, shape[axis] - 1, out=moved[:, axis])
+        frame, row, column = moved.astype(np.int32).transpose(1, 0, 2)
+        flat = (frame * shape[1] + row) * shape[2] + column
+        result[first:last] = np.mean(padded[flat], axis=1)
+    return result
@@ -0,0 +1,530 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Nearest-neighbour queries on point clouds.
+
+The points are binned in a uniform grid of cubic cells, sorted by cell,
+so the points of a cell are a contiguous range found by a binary search.
+The nearest point of each query is searched in the cells around its
+cell, from the nearest ones and all the queries at once, until no
+unexplored cell can hold a closer point. The queries that are far from
+every point are answered by a coarser grid of the same points, so only
+a few rings of cells are searched on each grid.
+
+The smallest distance between two clouds is found with an octree of
+each cloud, its points sorted along a Z-order curve so the points of any
+cell at any level are a contiguous range. Both trees are descended at
+once, level after level, keeping only the pairs of cells with bounding
+boxes closer than the closest pair of points found so far.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import functools
+
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Rings of cells searched around each cell before moving to a coarser
+# grid.
+RINGS = 4
+
+# Ratio between the cell sizes of a grid and its coarser grid.
+COARSENING = 4
+
+# Maximum number of pairs of cells searched at once.
+CHUNK_PAIRS = 2**18
+
+# Maximum number of distances computed at once.
+CHUNK_CANDIDATES = 2**22
+
+# Levels of the octrees, the cells of the last one are 2**-DEPTH times
+# the size of the cloud.
+DEPTH = 21
+
+# Largest number of pairs of points compared without descending the
+# octrees further.
+BRUTE_FORCE_PAIRS = 2**14
+
+# Mean number of pairs of points of the pairs of cells below which the
+# octrees are not descended further.
+LEAF = 16
+
+# Maximum number of cells of a grid.
+MAX_CELLS = 2**24
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+@functools.lru_cache(maxsize=None)
+def levels(rings):
+    """Offsets of the cells around a cell, from the nearest ones.
+
+    The offsets within a Chebyshev distance ``rings`` are grouped by the
+    squared gap between the cells, in cells, e.g. 1 for ``(2, 1, 0)``.
+    The central cell is the first group.
+
+    Returns
+    -------
+    tuple
+        Pairs with the squared gap and the ``(K, 3)`` array of offsets.
+
+    """
+    axis = np.arange(-rings, rings + 1)
+    offsets = np.stack(np.meshgrid(axis, axis, axis, indexing="ij"), -1)
+    offsets = offsets.reshape(-1, 3)
+    gaps = np.sum(np.maximum(np.abs(offsets) - 1, 0) ** 2, axis=1)
+    center = np.all(offsets == 0, axis=1)
+    result = [(0, offsets[center])]
+    for gap in np.unique(gaps):
+        result.append((int(gap), offsets[(gaps == gap) & ~center]))
+    return tuple(result)
+
+
+def cell_size(points):
+    """Default size of the cells of a grid of points, in mm.
+
+    The points are assumed to sample surfaces (e.g. contours), so the
+    cells are twice the mean spacing of the points spread over the
+    faces of their bounding box.
+
+    """
+    extent = np.ptp(points, axis=0)
+    area = 2 * (extent[0] * extent[1] + extent[1] * extent[2])
+    area += 2 * extent[2] * extent[0]
+    if area > 0:
+        return 2 * np.sqrt(area / len(points))
+    if extent.max() > 0:
+        return extent.max() / len(points)
+    return 1.0
+
+
+def _interleave(cells):
+    """Z-order codes of some cells, from their ``DEPTH`` bits per axis."""
+    codes = np.zeros(len(cells), dtype=np.uint64)
+    cells = cells.astype(np.uint64)
+    for axis, shift in enumerate((2, 1, 0)):
+        spread = cells[:, axis]
+        # Three zero bits are put between the bits of each coordinate.
+        for mask, step in (
+            (0x1F00000000FFFF, 32),
+            (0x1F0000FF0000FF, 16),
+            (0x100F00F00F00F00F, 8),
+            (0x10C30C30C30C30C3, 4),
+            (0x1249249249249249, 2),
+        ):
+            spread = (spread | (spread << np.uint64(step))) & np.uint64(mask)
+        codes |= spread << np.uint64(shift)
+    return codes
+
+
+def _pairs(first1, count1, first2, count2):
+    """All the pairs of two ranges of positions, for each pair of ranges.
+
+    Returns
+    -------
+    numpy.ndarray
+        Position in the first range of each pair.
+    numpy.ndarray
+        Position in the second range of each pair.
+
+    """
+    sizes = count1 * count2
+    starts = np.cumsum(sizes) - sizes
+    owner = np.repeat(np.arange(len(sizes)), sizes)
+    local = np.arange(len(owner)) - starts[owner]
+    width = count2[owner]
+    return first1[owner] + local // width, first2[owner] + local % width
+
+
+def _nearest_pair(points1, level1, points2, level2, cells1, cells2):
+    """Smallest squared distance between the points of pairs of cells."""
+    starts1, counts1 = level1[:2]
+    starts2, counts2 = level2[:2]
+    work = np.cumsum(counts1[cells1] * counts2[cells2])
+    # The pairs of cells are compared in chunks of about CHUNK_PAIRS
+    # pairs of points.
+    bounds = np.searchsorted(
+        work, np.arange(CHUNK_PAIRS, work[-1], CHUNK_PAIRS), side="right"
+    )
+    best = np.inf
+    for chunk1, chunk2 in zip(
+        np.split(cells1, bounds), np.split(cells2, bounds)
+    ):
+        if len(chunk1) == 0:
+            continue
+        first, second = _pairs(
+            starts1[chunk1], counts1[chunk1], starts2[chunk2], counts2[chunk2]
+        )
+        squared = np.sum((points1[first] - points2[second]) ** 2, axis=1)
+        best = min(best, squared.min())
+    return best
+
+
+def min_distance(tree1, tree2, bound=np.inf):
+    """Smallest distance between the points of two octrees.
+
+    Both trees are descended at once. The children of each pair of
+    cells that remains are paired, the first points of each new pair
+    lower the bound of the distance and the pairs of cells with boxes
+    farther than the bound are discarded. The points of the last pairs
+    are compared directly.
+
+    Parameters
+    ----------
+    tree1, tree2 : Octree
+        Octrees of the clouds of points.
+    bound : float, default=numpy.inf
+        Largest distance of interest in mm.
+
+    Returns
+    -------
+    float
+        Smallest distance in mm, or infinity if it is larger than
+        ``bound``.
+
+    Examples
+    --------
+    >>> min_distance(Octree(points1), Octree(points2))
+
+    """
+    bound = bound**2
+    found = np.inf
+    cells1, cells2 = np.zeros(1, dtype=int), np.zeros(1, dtype=int)
+    level1, level2 = tree1.level(0), tree2.level(0)
+    depth = 0
+    work = len(tree1) * len(tree2)
+    # The trees are descended while their cells have several points.
+    while depth < DEPTH and work > max(BRUTE_FORCE_PAIRS, LEAF * len(cells1)):
+        depth += 1
+        level1, level2 = tree1.level(depth), tree2.level(depth)
+        starts1, _, low1, high1, first1, children1, _ = level1
+        starts2, _, low2, high2, first2, children2, _ = level2
+        cells1, cells2 = _pairs(
+            first1[cells1],
+            children1[cells1],
+            first2[cells2],
+            children2[cells2],
+        )
+        gaps = np.maximum(low1[cells1] - high2[cells2], 0)
+        gaps += np.maximum(low2[cells2] - high1[cells1], 0)
+        gaps = np.sum(gaps**2, axis=1)
+        samples = tree1.points[starts1[cells1]] - tree2.points[starts2[cells2]]
+        found = min(found, np.sum(samples**2, axis=1).min())
+        near = gaps <= min(found, bound)
+        cells1, cells2 = cells1[near], cells2[near]
+        work = np.sum(level1[1][cells1] * level2[1][cells2])
+    if len(cells1) > 0:
+        found = min(
+            found,
+            _nearest_pair(
+                tree1.points, level1, tree2.points, level2, cells1, cells2
+            ),
+        )
+    return float(np.sqrt(found)) if found <= bound else np.inf
+
+
+# =============================================================================
+# OCTREE
+# =============================================================================
+
+
+class Octree:
+    """Octree of a cloud of points for distances between clouds.
+
+    The cells of each level are half the size of the cells of the level
+    before, from a single cell with all the points. The levels are built
+    when they are first used.
+
+    Parameters
+    ----------
+    points : array_like
+        ``(N, 3)`` array with the points, in mm.
+
+    Raises
+    ------
+    ValueError
+        If there are no points.
+
+    Examples
+    --------
+    >>> tree = Octree(points)
+    >>> min_distance(tree, Octree(other_points))
+
+    """
+
+    def __init__(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(points) == 0:
+            raise ValueError("The octree needs at least one point")
+        low = points.min(axis=0)
+        size = max(np.ptp(points, axis=0).max(), 1e-9)
+        last = 2**DEPTH - 1
+        cells = np.clip(np.floor((points - low) / size * 2**DEPTH), 0, last)
+        codes = _interleave(cells)
+        order = np.argsort(codes, kind="stable")
+        self.points = points[order]
+        self._codes = codes[order]
+        self._levels = [None] * (DEPTH + 1)
+
+    def __len__(self):
+        """Return the number of points."""
+        return len(self.points)
+
+    def level(self, depth):
+        """Cells of a level of the octree.
+
+        Parameters
+        ----------
+        depth : int
+            Level, from 0 to ``DEPTH``.
+
+        Returns
+        -------
+        tuple
+            Position of the first point of each cell, number of points
+            of each cell, ``(C, 3)`` arrays with the lower and upper
+            bounds of the points of each cell and, for each cell of the
+            level before, position of its first child and number of
+            children.
+
+        """
+        if self._levels[depth] is None:
+            keys = self._codes >> np.uint64(3 * (DEPTH - depth))
+            keys, starts, counts = np.unique(
+                keys, return_index=True, return_counts=True
+            )
+            if depth == 0:
+                first = children = np.zeros(0, dtype=int)
+            else:
+                parents = self.level(depth - 1)[6]
+                first = np.searchsorted(keys >> np.uint64(3), parents)
+                children = np.diff(np.append(first, len(keys)))
+            self._levels[depth] = (
+                starts,
+                counts,
+                np.minimum.reduceat(self.points, starts),
+                np.maximum.reduceat(self.points, starts),
+                first,
+                children,
+                keys,
+            )
+        return self._levels[depth]
+
+
+# =============================================================================
+# POINT INDEX
+# =============================================================================
+
+
+class PointIndex:
+    """Uniform grid of points for nearest-neighbour queries.
+
+    Parameters
+    ----------
+    points : array_like
+        ``(N, 3)`` array with the points, in mm.
+    size : float, default=None
+        Size of the cells in mm. By default, ``cell_size(points)``,
+        enlarged if the table of cells would have more than
+        ``MAX_CELLS`` cells.
+
+    Raises
+    ------
+    ValueError
+        If there are no points.
+
+    Examples
+    --------
+    >>> index = PointIndex(points)
+    >>> index.query(other_points)  # Distance to the nearest point.
+
+    """
+
+    def __init__(self, points, size=None):
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(points) == 0:
+            raise ValueError("The index needs at least one point")
+        self.size = float(size) if size is not None else cell_size(points)
+        self.low = points.min(axis=0)
+        extent = np.ptp(points, axis=0)
+        while np.prod(extent // self.size + 1 + 2 * RINGS) > MAX_CELLS:
+            self.size *= 2
+        cells = np.floor((points - self.low) / self.size).astype(np.int64)
+        self.shape = cells.max(axis=0) + 1
+        # The table of cells has RINGS empty cells around the grid, so
+        # the rings around any cell of the grid stay within the table.
+        self._table = tuple(int(axis) + 2 * RINGS for axis in self.shape)
+        keys = np.ravel_multi_index(tuple((cells + RINGS).T), self._table)
+        order = np.argsort(keys, kind="stable")
+        self.points = points[order]
+        self._coordinates = np.ascontiguousarray(self.points.T)
+        # Number of points of each cell and position of the first one.
+        self._counts = np.bincount(keys, minlength=np.prod(self._table))
+        self._starts = np.cumsum(self._counts) - self._counts
+        self._coarse = None
+
+    def __len__(self):
+        """Return the number of points."""
+        return len(self.points)
+
+    def coarse(self):
+        """Grid of the same points with larger cells."""
+        if self._coarse is None:
+            self._coarse = PointIndex(self.points, self.size * COARSENING)
+        return self._coarse
+
+    def _search(self, queries, best, groups, cells, offsets):
+        """Update the squared distances with the points of some cells.
+
+        Parameters
+        ----------
+        queries : numpy.ndarray
+            ``(3, M)`` array with the query points, sorted by cell.
+        best : numpy.ndarray
+            Squared distance to the nearest point found so far, updated
+            in place.
+        groups : numpy.ndarray
+            ``(G, 3)`` array with the first query, the number of queries
+            and the key of each searched cell of queries.
+        cells : numpy.ndarray
+            ``(G, 3)`` array with the cell of each group.
+        offsets : numpy.ndarray
+            ``(K, 3)`` array with the offsets of the searched cells.
+
+        """
+        steps = np.ravel_multi_index(
+            tuple((offsets + RINGS).T), self._table
+        ) - np.ravel_multi_index((RINGS, RINGS, RINGS), self._table)
+        keys = groups[:, 2, None] + steps
+        counts = self._counts[keys]
+        pair_group, pair_offset = np.nonzero(counts)
+        if len(pair_group) == 0:
+            return
+        keys = keys[pair_group, pair_offset]
+        counts = counts[pair_group, pair_offset]
+        neighbours = cells[pair_group] + offsets[pair_offset]
+        # One row per query of each pair of cells.
+        sizes = groups[pair_group, 1]
+        first = np.cumsum(sizes) - sizes
+        rows = np.repeat(groups[pair_group, 0] - first, sizes) + np.arange(
+            sizes.sum()
+        )
+        # The rows of the cells farther than the nearest point found are
+        # skipped.
+        gaps = np.zeros(len(rows))
+        for axis in range(3):
+            lower = np.repeat(
+                self.low[axis] + self.size * neighbours[:, axis], sizes
+            )
+            delta = np.maximum(lower - queries[axis, rows], 0)
+            delta += np.maximum(queries[axis, rows] - lower - self.size, 0)
+            gaps += delta * delta
+        near = gaps < best[rows]
+        rows = rows[near]
+        if len(rows) == 0:
+            return
+        row_counts = np.repeat(counts, sizes)[near]
+        row_starts = np.repeat(self._starts[keys], sizes)[near]
+        # The rows are split in blocks of about CHUNK_CANDIDATES points.
+        ends = np.cumsum(row_counts)
+        splits = np.searchsorted(
+            ends, np.arange(CHUNK_CANDIDATES, ends[-1], CHUNK_CANDIDATES)
+        )
+        bounds = np.unique(np.concatenate(([0], splits + 1, [len(rows)])))
+        for low, high in zip(bounds[:-1], bounds[1:]):
+            lengths = row_counts[low:high]
+            first = np.cumsum(lengths) - lengths
+            candidates = np.repeat(
+                row_starts[low:high] - first, lengths
+            ) + np.arange(lengths.sum())
+            squared = np.zeros(len(candidates))
+            for axis in range(3):
+                delta = self._coordinates[axis].take(candidates)
+                delta -= np.repeat(queries[axis, rows[low:high]], lengths)
+                delta *= delta
+                squared += delta
+            np.minimum.at(
+                best, rows[low:high], np.minimum.reduceat(squared, first)
+            )
+
+    def _query(self, queries):
+        """Squared distance from each query to the nearest point."""
+        cells = np.floor((queries - self.low) / self.size).astype(np.int64)
+        # The clamped cells keep the bound of the rings: the cells beyond
+        # the ring r are at least r cells away from the query.
+        cells = np.clip(cells, 0, self.shape - 1)
+        keys = np.ravel_multi_index(tuple((cells + RINGS).T), self._table)
+        order = np.argsort(keys, kind="stable")
+        queries = np.ascontiguousarray(queries[order].T)
+        keys, starts, sizes = np.unique(
+            keys[order], return_index=True, return_counts=True
+        )
+        groups = np.column_stack((starts, sizes, keys))
+        cells = cells[order][starts]
+        best = np.full(len(order), np.inf)
+        bound = np.full(len(groups), np.inf)
+        active = np.arange(len(groups))
+        # The rings cover the whole grid from any of its cells.
+        complete = self.shape.max() - 1 <= RINGS
+        for gap, offsets in levels(RINGS):
+            # The cells beyond the rings are at least RINGS cells away.
+            if not complete and gap >= RINGS**2:
+                break
+            active = active[bound[active] > gap * self.size**2]
+            if len(active) == 0:
+                break
+            step = max(1, CHUNK_PAIRS // len(offsets))
+            for first in range(0, len(active), step):
+                last = first + step
+                chunk = active[first:last]
+                self._search(
+                    queries, best, groups[chunk], cells[chunk], offsets
+                )
+            bound[active] = np.maximum.reduceat(best, starts)[active]
+        if not complete:
+            active = active[bound[active] > (RINGS * self.size) ** 2]
+            if len(active):
+                sizes = groups[active, 1]
+                first = np.cumsum(sizes) - sizes
+                pending = np.repeat(
+                    groups[active, 0] - first, sizes
+                ) + np.arange(sizes.sum())
+                best[pending] = np.minimum(
+                    best[pending], self.coarse()._query(queries[:, pending].T)
+                )
+        result = np.empty(len(order))
+        result[order] = best
+        return result
+
+    def query(self, points):
+        """Distance from some points to the nearest point of the index.
+
+        Parameters
+        ----------
+        points : array_like
+            ``(M, 3)`` array with the query points, in mm.
+
+        Returns
+        -------
+        numpy.ndarray
+            Distance from each query point to its nearest point, in mm.
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        if len(points) == 0:
+            return np.empty(0)
+        return np.sqrt(self._query(points))
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# =============================================================================
+# DOCS
+# =============================================================================
+
+"""Rigid transformations of structures.
+
+The rotations (roll, pitch and yaw) and translations (x, y and z) are
+represented by 4x4 homogeneous matrices. A chain of movements around an
+origin is composed into a single matrix, which is applied to the whole
+``(N, 3)`` block of points of a structure at once.
+
+"""
+
+# =============================================================================
+# IMPORTS
+# =============================================================================
+
+import numpy as np
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+ROTATIONS = ("roll", "pitch", "yaw")
+
+TRANSLATIONS = ("x", "y", "z")
+
+
+# =============================================================================
+# FUNCTIONS
+# =============================================================================
+
+
+def check_step(key, value):
+    """Validate a single movement.
+
+    Parameters
+    ----------
+    key : str
+        Direction of rotation ('roll', 'pitch' or 'yaw') or
+        direction of translation ('x', 'y' or 'z').
+    value : float or int
+        Angle in degrees (maximum 360º) or shift in mm (maximum 1000 mm).
+
+    Raises
+    ------
+    TypeError
+        If the value is not float or int.
+    ValueError
+        If the key is not valid or the value is out of range.
+
+    """
+    if not isinstance(value, (int, float)):
+        raise TypeError("The value of the movement must be float or int")
+    elif not (
+        (key in ROTATIONS and abs(value) < 360)
+        or (key in TRANSLATIONS and abs(value) < 1000)
+    ):
+        raise ValueError("Choose a correct key or a valid value")
+
+
+def step_matrix(key, value):
+    """Build the homogeneous matrix of a single movement at the origin.
+
+    Parameters
+    ----------
+    key : str
+        Direction of rotation ('roll', 'pitch' or 'yaw') or
+        direction of translation ('x', 'y' or 'z').
+    value : float or int
+        Angle in degrees or shift in mm.
+
+    Returns
+    -------
+    numpy.ndarray
+        4x4 matrix of the movement.
+
+    """
+    matrix = np.eye(4)
+    if key in TRANSLATIONS:
+        matrix[TRANSLATIONS.index(key), 3] = value
+        return matrix
+    delta = np.radians(value)
+    cos, sin = np.cos(delta), np.sin(delta)
+    if key == "roll":
+        matrix[1:3, 1:3] = [[cos, -sin], [sin, cos]]
+    elif key == "pitch":
+        matrix[0, 0], matrix[0, 2] = cos, sin
+        matrix[2, 0], matrix[2, 2] = -sin, cos
+    else:
+        matrix[0:2, 0:2] = [[cos, -sin], [sin, cos]]
+    return matrix
+
+
+def compose(steps, origin=(0.0, 0.0, 0.0)):
+    """Compose a chain of movements around an origin.
+
+    The movements are applied in the given order, so the first step is
+    the right-most factor of the product.
+
+    Parameters
+    ----------
+    steps : list
+        List of ``(key, value)`` pairs.
+    origin : list, default=(0.0, 0.0, 0.0)
+        Point [x, y, z] around which the rotations are performed.
+
+    Returns
+    -------
+    numpy.ndarray
+        4x4 matrix equivalent to the whole chain.
+
+    """
+    point2iso, iso2point = np.eye(4), np.eye(4)
+    point2iso[:3, 3] = -np.asarray(origin, dtype=float)
+    iso2point[:3, 3] = np.asarray(origin, dtype=float)
+    matrix = np.eye(4)
+    for key, value in steps:
+        matrix = step_matrix(key, value) @ matrix
+    return iso2point @ matrix @ point2iso
+
+
+def apply(matrix, points):
+    """Apply a homogeneous matrix to an ``(N, 3)`` block of points.
+
+    Parameters
+    ----------
+    matrix : numpy.ndarray
+        4x4 homogeneous matrix.
+    points : numpy.ndarray
+        ``(N, 3)`` array of points.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(N, 3)`` array with the moved points.
+
+    """
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def compose_batch(values, origin=(0.0, 0.0, 0.0)):
+    """Compose many rigid movements around an origin at once.
+
+    Each movement is a roll, a pitch and a yaw, in this order, followed
+    by a translation, as the chain ``[('roll', roll), ('pitch', pitch),
+    ('yaw', yaw), ('x', x), ('y', y), ('z', z)]`` of ``compose``.
+
+    Parameters
+    ----------
+    values : array_like
+        ``(K, 6)`` array with the roll, pitch and yaw in degrees and the
+        x, y and z shifts in mm of each movement.
+    origin : list, default=(0.0, 0.0, 0.0)
+        Point [x, y, z] around which the rotations are performed.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(K, 4, 4)`` array with the matrix of each movement.
+
+    """
+    values = np.asarray(values, dtype=float).reshape(-1, 6)
+    origin = np.asarray(origin, dtype=float)
+    radians = np.radians(values[:, :3])
+    cos, sin = np.cos(radians), np.sin(radians)
+    count = len(values)
+    rotation = np.eye(3)
+    # Roll around x, pitch around y and yaw around z, as step_matrix.
+    for angle, (first, second) in enumerate(((1, 2), (2, 0), (0, 1))):
+        step = np.tile(np.eye(3), (count, 1, 1))
+        step[:, first, first] = step[:, second, second] = cos[:, angle]
+        step[:, first, second] = -sin[:, angle]
+        step[:, second, first] = sin[:, angle]
+        rotation = step @ rotation
+    matrices = np.zeros((count, 4, 4))
+    matrices[:, :3, :3] = rotation
+    matrices[:, :3, 3] = origin + values[:, 3:] - rotation @ origin
+    matrices[:, 3, 3] = 1.0
+    return matrices
+
+
+def apply_batch(matrices, points):
+    """Apply many homogeneous matrices to an ``(N, 3)`` block of points.
+
+    Parameters
+    ----------
+    matrices : numpy.ndarray
+        ``(K, 4, 4)`` array of homogeneous matrices.
+    points : numpy.ndarray
+        ``(N, 3)`` array of points.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``(K, 3, N)`` array with the x, y and z of the points moved by
+        each matrix, of the type of the points.
+
+    """
+    homogeneous = np.vstack((points.T, np.ones(len(points), points.dtype)))
+    # A single product of the (3K, 4) rows of all the matrices.
+    rows = matrices[:, :3].reshape(-1, 4)
+    return (rows @ homogeneous).reshape(len(matrices), 3, len(points))
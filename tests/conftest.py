@@ -6,6 +6,12 @@ from dicomhandler.dicom_info import DicomInfo
 
 import joblib
 
+import numpy as np
+
+import pydicom
+from pydicom.dataset import FileDataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
 import pytest
 
 PATH = pathlib.Path(os.path.abspath(os.path.dirname(__file__)))
@@ -283,3 +289,165 @@ def load_buff():
         return joblib.load(DATA_PATH / path)
 
     return make
+
+
+# This function returns a beam limiting device of a plan.
+def limiting_device(kind, positions=None, boundaries=None):
+    item = pydicom.dataset.Dataset()
+    item.RTBeamLimitingDeviceType = kind
+    if positions is not None:
+        item.LeafJawPositions = positions
+    if boundaries is not None:
+        item.LeafPositionBoundaries = boundaries
+    return item
+
+
+# This fixture returns a plan with typed devices in a non standard
+# order: an arc whose control points after the first one only have the
+# MLC and the meterset, and a static beam with a different MLC.
+@pytest.fixture()
+def plan_dataset():
+    plan = pydicom.dataset.Dataset()
+    plan.PatientName = "Mike Wazowski"
+    plan.PatientID = "0"
+    plan.PatientBirthDate = "20000101"
+    plan.Modality = "RTPLAN"
+    arc = pydicom.dataset.Dataset()
+    arc.BeamLimitingDeviceSequence = [
+        limiting_device("MLCX", boundaries=[-10.0, -5.0, 0.0, 10.0]),
+        limiting_device("ASYMY"),
+        limiting_device("ASYMX"),
+    ]
+    first = pydicom.dataset.Dataset()
+    first.GantryAngle = 180.0
+    first.GantryRotationDirection = "CW"
+    first.PatientSupportAngle = 90.0
+    first.CumulativeMetersetWeight = 0.0
+    first.BeamLimitingDevicePositionSequence = [
+        limiting_device("ASYMY", [-8.0, 9.0]),
+        limiting_device("MLCX", [-1.0, -2.0, -3.0, 1.0, 2.0, 3.0]),
+        limiting_device("ASYMX", [-5.0, 6.0]),
+    ]
+    second = pydicom.dataset.Dataset()
+    second.GantryAngle = 190.0
+    second.CumulativeMetersetWeight = 1.0
+    second.BeamLimitingDevicePositionSequence = [
+        limiting_device("MLCX", [-4.0, -5.0, -6.0, 4.0, 5.0, 6.0]),
+    ]
+    arc.ControlPointSequence = [first, second]
+    static = pydicom.dataset.Dataset()
+    static.BeamLimitingDeviceSequence = [
+        limiting_device("X"),
+        limiting_device("Y"),
+        limiting_device("MLCX", boundaries=[0.0, 2.5, 5.0]),
+    ]
+    point = pydicom.dataset.Dataset()
+    point.GantryAngle = 0.0
+    point.GantryRotationDirection = "NONE"
+    point.PatientSupportAngle = 0.0
+    point.BeamLimitingDevicePositionSequence = [
+        limiting_device("X", [-2.0, 2.0]),
+        limiting_device("Y", [-3.0, 3.0]),
+        limiting_device("MLCX", [-1.0, -1.0, 1.0, 1.0]),
+    ]
+    static.ControlPointSequence = [point]
+    plan.BeamSequence = [arc, static]
+    return plan
+
+
+# This function returns a structure file (RTSTRUCT) with a list of
+# contours, each one an (N, 3) array, for every ROI name.
+def struct_dataset(rois):
+    struct = pydicom.dataset.Dataset()
+    struct.PatientName = "Mike Wazowski"
+    struct.PatientID = "0"
+    struct.PatientBirthDate = "20000101"
+    struct.Modality = "RTSTRUCT"
+    struct.StructureSetROISequence = []
+    struct.ROIContourSequence = []
+    for number, (name, contours) in enumerate(rois.items()):
+        roi = pydicom.dataset.Dataset()
+        roi.ROIName = name
+        roi.ROINumber = number + 1
+        roi_contour = pydicom.dataset.Dataset()
+        roi_contour.ReferencedROINumber = number + 1
+        roi_contour.ContourSequence = []
+        for data in contours:
+            contour = pydicom.dataset.Dataset()
+            contour.ContourGeometricType = "CLOSED_PLANAR"
+            contour.NumberOfContourPoints = len(data)
+            data = np.asarray(data, dtype=float)
+            contour.ContourData = data.ravel().tolist()
+            roi_contour.ContourSequence.append(contour)
+        struct.StructureSetROISequence.append(roi)
+        struct.ROIContourSequence.append(roi_contour)
+    return struct
+
+
+# This fixture returns the function that builds a structure file from
+# the contours of its ROIs.
+@pytest.fixture(scope="session")
+def struct_builder():
+    return struct_dataset
+
+
+# This function writes a dataset as a DICOM file.
+def write_dicom(dataset, path):
+    meta = FileMetaDataset()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    meta.MediaStorageSOPClassUID = generate_uid()
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    file = FileDataset(str(path), {}, file_meta=meta, preamble=b"\0" * 128)
+    file.update(dataset)
+    file.is_little_endian = True
+    file.is_implicit_VR = False
+    file.save_as(str(path), write_like_original=False)
+    return path
+
+
+# This fixture returns the function that writes a dataset as a DICOM
+# file.
+@pytest.fixture(scope="session")
+def dicom_writer():
+    return write_dicom
+
+
+# This fixture returns a dose file (RTDOSE) with a grid of 4 frames of
+# 3 x 5 voxels, whose dose is the index of the voxel times the scaling.
+@pytest.fixture()
+def dose_dataset():
+    dose = pydicom.dataset.Dataset()
+    dose.PatientName = "Mike Wazowski"
+    dose.PatientID = "0"
+    dose.PatientBirthDate = "20000101"
+    dose.Modality = "RTDOSE"
+    dose.Rows = 3
+    dose.Columns = 5
+    dose.NumberOfFrames = 4
+    dose.BitsAllocated = 32
+    dose.BitsStored = 32
+    dose.HighBit = 31
+    dose.PixelRepresentation = 0
+    dose.SamplesPerPixel = 1
+    dose.PhotometricInterpretation = "MONOCHROME2"
+    dose.DoseGridScaling = 0.5
+    dose.DoseUnits = "GY"
+    dose.ImagePositionPatient = [-10.0, -20.0, -30.0]
+    dose.ImageOrientationPatient = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+    dose.PixelSpacing = [2.0, 1.0]
+    dose.GridFrameOffsetVector = [0.0, 3.0, 6.0, 9.0]
+    dose.PixelData = np.arange(60, dtype="<u4").tobytes()
+    return dose
+
+
+# This fixture writes the structure and plan files of a patient and a
+# dose file in a temporary directory and returns their paths.
+@pytest.fixture()
+def dicom_files(tmp_path, dose_dataset):
+    struct = joblib.load(DATA_PATH / "test_struct_to_csv" / "patient_0_s.gz")
+    plan = joblib.load(DATA_PATH / "test_struct_to_csv" / "patient_0_p.gz")
+    return {
+        "RTSTRUCT": write_dicom(struct, tmp_path / "rs.dcm"),
+        "RTPLAN": write_dicom(plan, tmp_path / "rp.dcm"),
+        "RTDOSE": write_dicom(dose_dataset, tmp_path / "rd.dcm"),
+    }
@@ -1,3 +1,11 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler import margins as margins_module
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.margins import radial_margin
+
+import numpy as np
+
 from pydicom.multival import MultiValue
 
 import pytest
@@ -96,3 +104,128 @@ def test_add_margin(di_1p_fixt, struct, margin, index, expected):
     )
     assert len(x) == len(expected)
     assert all([abs(xi - yi) <= 0.00001 for xi, yi in zip(x, expected)])
+
+
+@pytest.mark.parametrize(
+    "margin, expected_offsets",
+    [(1.0, [0, 4, 6]), (-1.0, [0, 1, 3]), (0.0, [0, 1, 3])],
+)
+# These tests verify the offsets of a structure with a single point
+# contour and a two points contour after the margin.
+def test_radial_margin_offsets(margin, expected_offsets):
+    points = np.array([[1.0, 1.0, 0.0], [0.0, 0.0, 0.0], [2.0, 2.0, 0.0]])
+    new_points, offsets = radial_margin(points, np.array([0, 1, 3]), margin)
+    assert list(offsets) == expected_offsets
+    assert new_points.shape == (expected_offsets[-1], 3)
+
+
+# These tests verify that a sweep gives the same structures as
+# add_margin for each margin, with the fixture structures and with the
+# points on the centre of mass or at a tie between the candidates.
+@pytest.mark.parametrize(
+    "struct", ["space1", "space2", "space3", "space4", "space6"]
+)
+def test_margin_sweep(di_1p_fixt, struct):
+    dicom_info1 = di_1p_fixt("patient_2_s.gz", "test_add_margin")
+    margins = [-1.0, -0.05, 0.0, 0.03, 0.5, 1.0, 2.5]
+    sweep = dicom_info1.margin_sweep(struct, margins)
+    assert len(sweep) == len(margins)
+    for margin, swept in zip(margins, sweep):
+        expected = dicom_info1.add_margin(struct, margin)
+        for roi, other in zip(
+            swept.dicom_struct.ROIContourSequence,
+            expected.dicom_struct.ROIContourSequence,
+        ):
+            for contour, other_contour in zip(
+                roi.ContourSequence, other.ContourSequence
+            ):
+                assert list(contour.ContourData) == list(
+                    other_contour.ContourData
+                )
+
+
+# These tests verify that the sweep selects the structures by part of
+# their names, as add_margin, and adds the volumes of all of them.
+def test_margin_sweep_names(struct_builder):
+    square = [[-5, -5], [5, -5], [5, 5], [-5, 5]]
+    struct = struct_builder(
+        {
+            name: [[[x + shift, y, z] for x, y in square] for z in (0, 2)]
+            for name, shift in [("PTV 1", 0), ("CTV", 20), ("PTV 2", 40)]
+        }
+    )
+    dicom_info1 = DicomInfo(struct)
+    margins = [-1.0, 2.0]
+    sweep, volumes = dicom_info1.margin_sweep("PTV", margins, volume=True)
+    for margin, swept in zip(margins, sweep):
+        expected = dicom_info1.add_margin("PTV", margin)
+        for item in range(3):
+            np.testing.assert_array_equal(
+                swept.contours.points(item), expected.contours.points(item)
+            )
+        frame = swept.geometry(["PTV 1", "PTV 2"])
+        assert volumes[margin] == pytest.approx(frame["volume"].sum())
+    np.testing.assert_array_equal(
+        sweep[0].contours.points(1), dicom_info1.contours.points(1)
+    )
+
+
+# These tests verify the sweep of many margins in several chunks.
+def test_radial_sweep_chunks(monkeypatch):
+    angles = np.linspace(0, 2 * np.pi, 40, endpoint=False)
+    ring = np.column_stack((np.cos(angles), np.sin(angles), np.zeros(40)))
+    points = np.concatenate((ring * 10, ring * 5 + [0, 0, 2], [[1, 1, 4]]))
+    offsets = np.array([0, 40, 80, 81])
+    margins = np.linspace(-3, 3, 13)
+    expected = margins_module.radial_sweep(points, offsets, margins)
+    monkeypatch.setattr(margins_module, "CHUNK_POINTS", 100)
+    chunked = margins_module.radial_sweep(points, offsets, margins)
+    for margin, (new_points, new_offsets), (points2, offsets2) in zip(
+        margins, expected, chunked
+    ):
+        single = radial_margin(points, offsets, margin)
+        np.testing.assert_array_equal(new_points, single[0])
+        np.testing.assert_array_equal(new_offsets, single[1])
+        np.testing.assert_array_equal(points2, single[0])
+        np.testing.assert_array_equal(offsets2, single[1])
+
+
+# These tests verify the volumes of the sweep.
+def test_margin_sweep_volume(struct_builder):
+    square = [[-5, -5], [5, -5], [5, 5], [-5, 5]]
+    struct = struct_builder(
+        {"box": [[[x, y, z] for x, y in square] for z in (0, 2, 4)]}
+    )
+    dicom_info1 = DicomInfo(struct)
+    margins = [-1.0, 0.0, 1.0]
+    sweep, volumes = dicom_info1.margin_sweep("box", margins, volume=True)
+    assert volumes.name == "volume"
+    assert volumes.index.name == "margin"
+    assert list(volumes.index) == margins
+    for margin, swept in zip(margins, sweep):
+        expected = swept.geometry(["box"]).loc[0, "volume"]
+        assert volumes[margin] == pytest.approx(expected)
+    assert volumes.is_monotonic_increasing
+    assert dicom_info1.geometry(["box"]).loc[0, "volume"] == (
+        pytest.approx(volumes[0.0])
+    )
+
+
+@pytest.mark.parametrize(
+    "struct, margins, expected",
+    [
+        ("space1", [1.0, 2], does_not_raise()),
+        ("space1", 1.0, does_not_raise()),
+        ("space1", ["1.0"], pytest.raises(TypeError)),
+        ("space1", [], pytest.raises(ValueError)),
+        ("space5", [1.0], pytest.raises(ValueError)),
+        ("space", [1.0], pytest.raises(ValueError)),
+        ("nothing", [1.0], pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the sweep raises/doesn't raise errors
+# in the correct way.
+def test_margin_sweep_raises(di_1p_fixt, struct, margins, expected):
+    with expected:
+        dicom_info1 = di_1p_fixt("patient_2_s.gz", "test_add_margin")
+        dicom_info1.margin_sweep(struct, margins)
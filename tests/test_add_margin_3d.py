@@ -0,0 +1,157 @@
+import time
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler.dicom_info import DicomInfo
+
+import numpy as np
+
+import pydicom
+from pydicom.multival import MultiValue
+
+import pytest
+
+
+# This fixture returns a structure file with a sphere of radius 10 mm,
+# contoured every 2 mm, and a structure with a single point.
+@pytest.fixture()
+def sphere():
+    struct = pydicom.dataset.Dataset()
+    struct.PatientName = "Mike Wazowski"
+    struct.PatientID = "0"
+    struct.PatientBirthDate = "20000101"
+    struct.Modality = "RTSTRUCT"
+    roi_sphere = pydicom.dataset.Dataset()
+    roi_sphere.ROIName = "sphere"
+    roi_point = pydicom.dataset.Dataset()
+    roi_point.ROIName = "point"
+    contours_sphere = pydicom.dataset.Dataset()
+    contours_sphere.ContourSequence = []
+    angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+    for z in np.arange(-9.0, 10.0, 2.0):
+        radius = np.sqrt(100.0 - z**2)
+        contour = pydicom.dataset.Dataset()
+        contour.ContourGeometricType = "CLOSED_PLANAR"
+        contour.NumberOfContourPoints = 64
+        contour.ContourData = MultiValue(
+            float,
+            np.column_stack(
+                [
+                    radius * np.cos(angles),
+                    radius * np.sin(angles),
+                    np.full(64, z),
+                ]
+            )
+            .ravel()
+            .tolist(),
+        )
+        contours_sphere.ContourSequence.append(contour)
+    contours_point = pydicom.dataset.Dataset()
+    point = pydicom.dataset.Dataset()
+    point.ContourData = MultiValue(float, [0.0, 0.0, 0.0])
+    contours_point.ContourSequence = [point]
+    struct.StructureSetROISequence = [roi_sphere, roi_point]
+    struct.ROIContourSequence = [contours_sphere, contours_point]
+    return DicomInfo(struct)
+
+
+# This fixture returns a structure file with a body-sized elliptic
+# cylinder of 300 x 200 mm and 150 slices every 2 mm.
+@pytest.fixture()
+def body():
+    struct = pydicom.dataset.Dataset()
+    struct.PatientName = "Mike Wazowski"
+    struct.PatientID = "0"
+    struct.PatientBirthDate = "20000101"
+    struct.Modality = "RTSTRUCT"
+    roi = pydicom.dataset.Dataset()
+    roi.ROIName = "body"
+    contours = pydicom.dataset.Dataset()
+    contours.ContourSequence = []
+    angles = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+    for z in np.arange(0.0, 300.0, 2.0):
+        contour = pydicom.dataset.Dataset()
+        contour.ContourGeometricType = "CLOSED_PLANAR"
+        contour.NumberOfContourPoints = 200
+        contour.ContourData = MultiValue(
+            float,
+            np.column_stack(
+                [
+                    150.0 * np.cos(angles),
+                    100.0 * np.sin(angles),
+                    np.full(200, z),
+                ]
+            )
+            .ravel()
+            .tolist(),
+        )
+        contours.ContourSequence.append(contour)
+    struct.StructureSetROISequence = [roi]
+    struct.ROIContourSequence = [contours]
+    return DicomInfo(struct)
+
+
+def points_of(dicom_info, index):
+    sequence = dicom_info.dicom_struct.ROIContourSequence[index]
+    return [
+        np.reshape(np.array(contour.ContourData), (-1, 3))
+        for contour in sequence.ContourSequence
+    ]
+
+
+@pytest.mark.parametrize(
+    "struct, margin, expected",
+    [
+        ("sphere", 1, pytest.raises(TypeError)),
+        ("sphere", [1.0, 1.0], pytest.raises(TypeError)),
+        ("sphere", [1.0, -1.0, 1.0], pytest.raises(ValueError)),
+        ("sphere1", 1.0, pytest.raises(ValueError)),
+        ("point", 1.0, pytest.raises(ValueError)),
+        ("sphere", [1.0, 2.0, 3.0], does_not_raise()),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(sphere, struct, margin, expected):
+    with expected:
+        sphere.add_margin_3d(struct, margin)
+
+
+@pytest.mark.parametrize(
+    "margin, radius, z_max",
+    [(3.0, 13.0, 11.0), (-3.0, 7.0, 7.0), ([2.0, 2.0, 6.0], 12.0, 15.0)],
+)
+# These tests verify the radius of the sphere in the axial plane and
+# the slices added or removed by the margin.
+def test_add_margin_3d_sphere(sphere, margin, radius, z_max):
+    contours = points_of(sphere.add_margin_3d("sphere", margin), 0)
+    points = np.concatenate(contours)
+    central = points[np.abs(points[:, 2]) < 1.5]
+    distances = np.linalg.norm(central[:, :2], axis=1)
+    assert np.all(np.abs(distances - radius) <= 0.5)
+    assert points[:, 2].max() == pytest.approx(z_max)
+    assert points[:, 2].min() == pytest.approx(-z_max)
+    assert len(contours) == round(z_max) + 1
+
+
+# This test verifies that the rebuilt contours keep the attributes of
+# the original contours.
+def test_add_margin_3d_items(sphere):
+    moved = sphere.add_margin_3d("sphere", 3.0)
+    sequence = moved.dicom_struct.ROIContourSequence[0].ContourSequence
+    for contour in sequence:
+        assert contour.ContourGeometricType == "CLOSED_PLANAR"
+        assert contour.NumberOfContourPoints * 3 == len(contour.ContourData)
+    assert len(sphere.dicom_struct.ROIContourSequence[0].ContourSequence) == 10
+
+
+# This test verifies that the margin of a body-sized structure is
+# computed in a few seconds, with the precision of its coarser grid.
+def test_add_margin_3d_large(body):
+    start = time.perf_counter()
+    contours = points_of(body.add_margin_3d("body", 5.0), 0)
+    assert time.perf_counter() - start < 5.0
+    assert len(contours) == 154
+    points = np.concatenate(contours)
+    central = points[points[:, 2] == 150.0]
+    assert np.abs(central[:, 0]).max() == pytest.approx(155.0, abs=1.0)
+    assert np.abs(central[:, 1]).max() == pytest.approx(105.0, abs=1.0)
@@ -150,3 +150,19 @@ def test_anonymize_warning(request):
     with pytest.warns(UserWarning):
         di = request.getfixturevalue("dicom_info_empty")
         di.anonymize()
+
+
+# This test verifies that the original datasets are not modified and
+# that the elements which are not anonymized are shared.
+def test_anonymize_copy_on_write(di_1p_fixt):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    original = dicom_info.dicom_struct
+    name = original.PatientName
+    anonymized = dicom_info.anonymize()
+    assert anonymized.dicom_struct is not original
+    assert anonymized.dicom_struct.PatientName == "PatientName"
+    assert original.PatientName == name
+    assert (
+        anonymized.dicom_struct["ROIContourSequence"]
+        is original["ROIContourSequence"]
+    )
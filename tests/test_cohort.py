@@ -0,0 +1,126 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler.cohort import Cohort, file_name
+
+import pandas as pd
+
+import pytest
+
+
+# This fixture writes the files of three patients and returns their
+# groups, with a fourth group whose file does not exist.
+@pytest.fixture()
+def groups(tmp_path, patients, dicom_writer):
+    struct = patients("patient_0_s.gz", "test_struct_to_csv")
+    plan = patients("patient_0_p.gz", "test_struct_to_csv")
+    groups = []
+    for patient in ["A", "B", "C"]:
+        directory = tmp_path / patient
+        directory.mkdir()
+        struct.PatientID = plan.PatientID = patient
+        groups.append(
+            [
+                dicom_writer(struct, directory / "rs.dcm"),
+                dicom_writer(plan, directory / "rp.dcm"),
+            ]
+        )
+    groups.append([tmp_path / "missing.dcm"])
+    return groups
+
+
+# Test the concatenated report, with and without a pool of processes.
+@pytest.mark.parametrize("workers, chunksize", [(1, 1), (2, 1), (2, 3)])
+def test_to_dataframe(groups, workers, chunksize):
+    cohort = Cohort(groups, workers=workers, chunksize=chunksize)
+    frame = cohort.to_dataframe("summarize_to_dataframe", area=True)
+    assert list(frame.columns[:2]) == ["patient", "group"]
+    assert frame["patient"].dtype == "category"
+    assert list(frame["patient"].unique()) == ["A", "B", "C"]
+    assert list(frame["group"].unique()) == [0, 1, 2]
+    single = frame[frame["group"] == 0].drop(columns=["patient", "group"])
+    expected = Cohort(groups[:1], workers=1).to_dataframe(area=True)
+    pd.testing.assert_frame_equal(
+        single.reset_index(drop=True),
+        expected.drop(columns=["patient", "group"]),
+    )
+    errors = cohort.errors
+    assert list(errors["group"]) == [3]
+    assert errors["error"][0].startswith("FileNotFoundError")
+
+
+# Test that the files of each group are written.
+def test_to_csv(groups, tmp_path):
+    cohort = Cohort(groups, workers=2)
+    paths = cohort.to_csv(
+        "struct_to_csv", tmp_path / "output", suffix=".csv.gz", layout="long"
+    )
+    assert [path.name for path in paths] == [
+        "A_0.csv.gz",
+        "B_1.csv.gz",
+        "C_2.csv.gz",
+    ]
+    frame = pd.read_csv(paths[1])
+    assert list(frame.columns[:3]) == ["roi", "slice", "point"]
+    assert len(cohort.errors) == 1
+    paths = cohort.to_csv("mlc_to_csv", tmp_path / "mlc", suffix=".csv.gz")
+    assert [path.name for path in paths] == [
+        "A_0.csv.gz",
+        "B_1.csv.gz",
+        "C_2.csv.gz",
+    ]
+    assert len(pd.read_csv(paths[0], index_col=0).columns) > 0
+    assert len(cohort.errors) == 1
+
+
+# Test that the errors of the methods are collected.
+def test_errors(groups):
+    cohort = Cohort(groups[:2], workers=1)
+    frame = cohort.to_dataframe("mlc_to_csv")
+    assert frame.empty
+    assert list(frame.columns) == ["patient", "group"]
+    assert len(cohort.errors) == 4
+    assert cohort.errors["error"][0].startswith("TypeError")
+
+
+# Test the names of the output files.
+@pytest.mark.parametrize(
+    "patient, group, suffix, expected",
+    [
+        ("0", 3, ".csv", "0_3.csv"),
+        ("A/B C", 0, ".txt", "A_B_C_0.txt"),
+        (".A.1", 1, ".csv", "A.1_1.csv"),
+        ("...", 2, ".csv", "patient_6eae3a5b062c_2.csv"),
+        ("*/*", 0, ".csv.gz", "patient_facb855c9cef_0.csv.gz"),
+    ],
+)
+def test_file_name(patient, group, suffix, expected):
+    assert file_name(patient, group, suffix) == expected
+
+
+# Test that the names of the output files are accepted by the writers.
+@pytest.mark.parametrize("patient", ["0", ".A", "..", "*/*", ""])
+def test_file_name_written(di_1p_fixt, tmp_path, patient):
+    dicom_info = di_1p_fixt("patient_0_s.gz", "test_struct_to_csv")
+    path = tmp_path / file_name(patient, 0)
+    dicom_info.struct_to_csv(path)
+    assert path.exists()
+
+
+# Test the validation of the arguments.
+@pytest.mark.parametrize(
+    "kwargs, method, expectation",
+    [
+        ({}, "to_dataframe", does_not_raise()),
+        ({"workers": 0}, None, pytest.raises(ValueError)),
+        ({"chunksize": 0}, None, pytest.raises(ValueError)),
+        ({}, "unknown", pytest.raises(ValueError)),
+        ({}, "summarize_to_dataframe", pytest.raises(ValueError)),
+    ],
+)
+def test_raises(groups, kwargs, method, expectation):
+    with expectation:
+        cohort = Cohort(groups[:1], **kwargs)
+        if method == "to_dataframe":
+            cohort.to_dataframe()
+        elif method is not None:
+            cohort.to_csv(method, "output")
@@ -0,0 +1,157 @@
+from dicomhandler.contours import ContourStore, contour_array, contour_rows
+from dicomhandler.dicom_info import DicomInfo
+
+import numpy as np
+
+import pydicom
+from pydicom.multival import MultiValue
+
+import pytest
+
+
+@pytest.fixture()
+def struct_dataset():
+    struct = pydicom.dataset.Dataset()
+    struct.PatientName = "Mike Wazowski"
+    struct.PatientID = "0"
+    struct.PatientBirthDate = "20000101"
+    struct.Modality = "RTSTRUCT"
+    rois, roi_contours = [], []
+    for number, (name, slices) in enumerate(
+        [
+            ("square", [[0.0, 0.0, 0.0, 1.0, 0.0, 0.0], [0.0, 1.0, 1.0]]),
+            ("wrong", [[0.0, 0.0, 0.0, 1.0]]),
+        ]
+    ):
+        roi = pydicom.dataset.Dataset()
+        roi.ROIName = name
+        roi.ROINumber = number + 10
+        rois.append(roi)
+        roi_contour = pydicom.dataset.Dataset()
+        roi_contour.ContourSequence = []
+        for data in slices:
+            contour = pydicom.dataset.Dataset()
+            contour.ContourData = MultiValue(float, data)
+            contour.NumberOfContourPoints = len(data) // 3
+            roi_contour.ContourSequence.append(contour)
+        roi_contours.append(roi_contour)
+    struct.StructureSetROISequence = rois
+    struct.ROIContourSequence = roi_contours
+    return struct
+
+
+# These tests verify that the raw DS bytes and converted values are
+# parsed in the same way, without the empty values.
+@pytest.mark.parametrize(
+    "raw, expected",
+    [
+        (b"1.5\\-2\\3e1 ", [1.5, -2.0, 30.0]),
+        (b"1.5\\-2\\3e1\\", [1.5, -2.0, 30.0]),
+        (b"1\\\\2\\ \\3", [1.0, 2.0, 3.0]),
+        (b"\\", []),
+    ],
+)
+def test_contour_array_raw(raw, expected):
+    contour = pydicom.dataset.Dataset()
+    contour[0x30060050] = pydicom.dataelem.RawDataElement(
+        pydicom.tag.Tag(0x30060050), "DS", len(raw), raw, 0, True, True
+    )
+    assert np.array_equal(contour_array(contour), expected)
+    contour.ContourData
+    assert np.array_equal(contour_array(contour), expected)
+
+
+# This test verifies the arrays, offsets and indexes of the store.
+def test_store_arrays(struct_dataset):
+    store = ContourStore(struct_dataset)
+    assert len(store) == 2
+    assert store.index == {"square": 0, "wrong": 1}
+    assert store.number_index == {10: 0, 11: 1}
+    assert store.points(0).shape == (3, 3)
+    assert list(store.offsets(0)) == [0, 2, 3]
+    assert [len(contour) for contour in store.contours(0)] == [2, 1]
+    assert not store.truncated(0)
+    assert store.truncated(1)
+    assert store.points(1).shape == (1, 3)
+
+
+# This test verifies that the modified points are written back to the
+# dataset only when the structure file is accessed.
+def test_store_flush(struct_dataset):
+    dicom_info = DicomInfo(struct_dataset)
+    store = dicom_info.contours
+    store.replace(0, store.points(0) + 1.0)
+    assert store.dirty == {0}
+    original = struct_dataset.ROIContourSequence[0].ContourSequence[1]
+    assert list(original.ContourData) == [0.0, 1.0, 1.0]
+    contour = dicom_info.dicom_struct.ROIContourSequence[0].ContourSequence[1]
+    assert list(contour.ContourData) == [1.0, 2.0, 2.0]
+    assert contour.NumberOfContourPoints == 1
+    assert not store.dirty
+
+
+# This test verifies that the read-only methods do not write the
+# modified points back to the dataset.
+def test_store_not_flushed(struct_dataset):
+    moved = DicomInfo(struct_dataset).move_sequence(
+        "square", [("x", 1.0)], [0.0, 0.0, 0.0]
+    )
+    store = moved.contours
+    assert store.dirty == {0}
+    moved.struct_to_dataframe(["square"])
+    moved.slab("square", 0.0, 1.0)
+    moved.move_sequence("square", [("y", 1.0)], [0.0, 0.0, 0.0])
+    assert store.dirty == {0}
+
+
+# This test verifies that the offsets must match the number of points.
+def test_store_replace_raises(struct_dataset):
+    store = ContourStore(struct_dataset)
+    with pytest.raises(ValueError):
+        store.replace(0, np.zeros((2, 3)))
+
+
+# This test verifies the index of the slices by z, with the contours
+# out of order, and that it is rebuilt when the ROI is replaced.
+@pytest.mark.parametrize(
+    "low, high, expected",
+    [
+        (-10.0, 10.0, [0, 1, 2, 3]),
+        (1.0, 2.0, [0, 2, 3]),
+        (0.0, 0.5, [1]),
+        (2.5, 10.0, []),
+        (2.0, 1.0, []),
+    ],
+)
+def test_store_slab(struct_builder, low, high, expected):
+    contours = [
+        [[0.0, 0.0, z], [1.0, 0.0, z], [1.0, 1.0, z]] for z in (2.0, 0.0, 1.0)
+    ]
+    contours.append([[5.0, 5.0, 2.0]])
+    store = ContourStore(struct_builder({"roi": contours}))
+    z, positions = store.slice_index(0)
+    assert list(z) == [0.0, 1.0, 2.0, 2.0]
+    assert list(positions) == [1, 2, 0, 3]
+    assert list(store.slab(0, low, high)) == expected
+    store.replace(0, store.points(0) + [0.0, 0.0, 10.0])
+    assert list(store.slab(0, low + 10.0, high + 10.0)) == expected
+
+
+# This test verifies the rows of the points of some contours.
+def test_contour_rows():
+    offsets = np.array([0, 3, 3, 5, 9])
+    assert list(contour_rows(offsets, [3, 0])) == [5, 6, 7, 8, 0, 1, 2]
+    assert list(contour_rows(offsets, [1, 2])) == [3, 4]
+    assert len(contour_rows(offsets, np.array([], dtype=int))) == 0
+
+
+# This test verifies the contours of a slab of a structure.
+def test_slab(struct_builder):
+    contours = [[[0.0, 0.0, z], [1.0, 0.0, z]] for z in (0.0, 3.0, 6.0)]
+    dicom_info = DicomInfo(struct_builder({"roi": contours}))
+    slab = dicom_info.slab("roi", 2.0, 6.0)
+    assert [contour[0, 2] for contour in slab] == [3.0, 6.0]
+    assert not slab[0].flags.writeable
+    assert dicom_info.slab("roi", 7.0, 9.0) == []
+    with pytest.raises(ValueError):
+        dicom_info.slab("none", 0.0, 1.0)
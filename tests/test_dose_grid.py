@@ -0,0 +1,152 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.dose import DoseGrid
+
+import numpy as np
+
+import pydicom
+
+import pytest
+
+
+# Test that the grid is memory-mapped when the pixels are on disk and
+# viewed otherwise, with the same dose.
+@pytest.mark.parametrize(
+    "defer_size, memmap", [(64, True), ("64 KB", False), (None, False)]
+)
+def test_dose_grid(dicom_files, defer_size, memmap):
+    dicom_info = DicomInfo.from_files(
+        dicom_files["RTDOSE"], defer_size=defer_size
+    )
+    grid = dicom_info.dose_grid
+    assert isinstance(grid.raw, np.memmap) == memmap
+    assert not grid.raw.flags.writeable
+    assert grid.shape == (4, 3, 5)
+    assert grid.units == "GY"
+    np.testing.assert_array_equal(grid.x, [-10, -9, -8, -7, -6])
+    np.testing.assert_array_equal(grid.y, [-20, -18, -16])
+    np.testing.assert_array_equal(grid.z, [-30, -27, -24, -21])
+    expected = np.arange(60).reshape(4, 3, 5) / 2
+    np.testing.assert_array_equal(grid[...], expected)
+    assert grid[2, 1, 3] == 19.0
+    assert dicom_info.dose_grid is grid
+    pixels = dicom_info.dicom_dose._dict[pydicom.tag.Tag("PixelData")]
+    assert (pixels.value is None) == memmap
+
+
+# Test the sub-volumes within some limits in mm.
+@pytest.mark.parametrize(
+    "limits, shape, first",
+    [
+        ({}, (4, 3, 5), 0.0),
+        ({"x": (-8.5, -6), "y": (-18, -30)}, (4, 2, 3), 1.0),
+        ({"z": (-27, -22)}, (2, 3, 5), 7.5),
+        ({"x": (0, 10)}, (4, 3, 0), None),
+    ],
+)
+def test_sub_volume(dose_dataset, limits, shape, first):
+    dose, x, y, z = DoseGrid(dose_dataset).sub_volume(**limits)
+    assert dose.shape == shape
+    assert (len(z), len(y), len(x)) == shape
+    if first is not None:
+        assert dose[0, 0, 0] == first
+
+
+# Test the absolute frame offsets and the flipped grids.
+def test_axes(dose_dataset):
+    dose_dataset.GridFrameOffsetVector = [-30.0, -27.0, -24.0, -21.0]
+    dose_dataset.ImageOrientationPatient = [-1, 0, 0, 0, -1, 0]
+    grid = DoseGrid(dose_dataset)
+    np.testing.assert_array_equal(grid.x, [-10, -11, -12, -13, -14])
+    np.testing.assert_array_equal(grid.y, [-20, -22, -24])
+    np.testing.assert_array_equal(grid.z, [-30, -27, -24, -21])
+
+
+# Test the errors of the dose grid.
+@pytest.mark.parametrize(
+    "keyword, value, expectation",
+    [
+        ("DoseUnits", "RELATIVE", does_not_raise()),
+        (
+            "ImageOrientationPatient",
+            [1, 0, 0, 0, 0, -1],
+            pytest.raises(ValueError),
+        ),
+        ("GridFrameOffsetVector", [0.0, 3.0], pytest.raises(ValueError)),
+        ("BitsAllocated", 8, pytest.raises(ValueError)),
+    ],
+)
+def test_raises(dose_dataset, keyword, value, expectation):
+    setattr(dose_dataset, keyword, value)
+    with expectation:
+        DoseGrid(dose_dataset)
+
+
+# Test that the dose file is required.
+def test_dose_not_loaded(dicom_info_empty):
+    with pytest.raises(ValueError):
+        dicom_info_empty.dose_grid
+
+
+# Test the trilinear interpolation, exact for the dose of the fixture,
+# which is linear in x, y and z.
+@pytest.mark.parametrize("flipped", [False, True])
+def test_sample(dose_dataset, flipped):
+    if flipped:
+        dose_dataset.ImageOrientationPatient = [-1, 0, 0, 0, -1, 0]
+        dose_dataset.ImagePositionPatient = [-6.0, -16.0, -30.0]
+        dose_dataset.PixelData = (
+            np.arange(60, dtype="<u4").reshape(4, 3, 5)[:, ::-1, ::-1]
+        ).tobytes()
+    grid = DoseGrid(dose_dataset)
+    points = np.array(
+        [
+            [-10.0, -20.0, -30.0],
+            [-6.0, -16.0, -21.0],
+            [-8.5, -17.5, -25.0],
+            [-5.0, -18.0, -25.0],
+            [np.nan, -18.0, -25.0],
+        ]
+    )
+    x, y, z = points[:3].T
+    expected = 0.5 * ((x + 10) + 2.5 * (y + 20) + 5 * (z + 30))
+    doses = grid.sample(points)
+    np.testing.assert_allclose(doses[:3], expected)
+    assert np.isnan(doses[3:]).all()
+    assert grid.sample(np.empty((0, 3))).shape == (0,)
+
+
+# Test the dose at the reference points, labelled with the DoseUnits and
+# skipped for the grids not supported, and at the vertices.
+def test_dose_at(dose_dataset, patients, struct_builder):
+    plan = patients("patient_17_p.gz", "test_summarize_to_dataframe")
+    dose_dataset.ImagePositionPatient = [-2.0, -2.0, -3.0]
+    dicom_info = DicomInfo(plan, dose_dataset)
+    frame = dicom_info.summarize_to_dataframe()
+    assert list(frame["RTDOSE at reference point [Gy]"]) == [
+        11.0,
+        11.5,
+        12.25,
+        13.5,
+        15.25,
+    ]
+    dose_dataset.DoseUnits = "RELATIVE"
+    frame = DicomInfo(plan, dose_dataset).summarize_to_dataframe()
+    assert "RTDOSE at reference point [relative]" in frame.columns
+    dose_dataset.ImageOrientationPatient = [1, 0, 0, 0, 0, -1]
+    frame = DicomInfo(plan, dose_dataset).summarize_to_dataframe()
+    assert list(frame.columns) == [
+        "Target",
+        "Prescribed dose [Gy]",
+        "Reference point dose [Gy]",
+        "Reference coordinates [mm]",
+        "Distance to iso [mm]",
+    ]
+    dose_dataset.DoseUnits = "GY"
+    dose_dataset.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    struct = struct_builder({"point": [[[0.0, 0.0, 0.0], [1.0, 1.0, 1.0]]]})
+    dicom_info = DicomInfo(struct, dose_dataset)
+    assert list(dicom_info.dose_at("point")) == [11.0, 15.25]
+    with pytest.raises(ValueError):
+        dicom_info.dose_at("none")
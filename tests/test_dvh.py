@@ -0,0 +1,96 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler import dvh
+from dicomhandler.dicom_info import DicomInfo
+
+import numpy as np
+
+import pytest
+
+
+def rectangle(x, y, z):
+    return [[x[0], y[0], z], [x[1], y[0], z], [x[1], y[1], z], [x[0], y[1], z]]
+
+
+# This fixture returns an object with a dose grid, a box of 4 voxels
+# with doses 3.0, 3.5, 10.5 and 11.0 and a structure outside the grid.
+@pytest.fixture()
+def dicom_info(struct_builder, dose_dataset):
+    box = [rectangle((-9.5, -7.5), (-19.5, -17.5), z) for z in (-30, -27)]
+    outside = [rectangle((50.0, 60.0), (50.0, 60.0), z) for z in (0, 3)]
+    struct = struct_builder({"box": box, "outside": outside})
+    return DicomInfo(struct, dose_dataset)
+
+
+# This test verifies the metrics of the structures.
+@pytest.mark.parametrize("workers", [1, 4])
+def test_dvh_metrics(dicom_info, workers):
+    frame = dicom_info.dvh_metrics(
+        dose_levels=[2, 50, 95], volume_levels=[10, 20], workers=workers
+    )
+    assert list(frame.columns) == [
+        "roi",
+        "volume",
+        "Dmin",
+        "Dmean",
+        "Dmax",
+        "D2",
+        "D50",
+        "D95",
+        "V10",
+        "V20",
+    ]
+    box = frame.iloc[0]
+    assert box["roi"] == "box"
+    assert box["volume"] == pytest.approx(0.024)
+    assert list(box[["Dmin", "Dmean", "Dmax"]]) == [3.0, 7.0, 11.0]
+    assert list(box[["D2", "D50", "D95"]]) == [11.0, 10.5, 3.0]
+    assert list(box[["V10", "V20"]]) == [50.0, 0.0]
+    assert frame.iloc[1]["volume"] == 0
+    assert frame.iloc[1][2:].isna().all()
+
+
+# This test verifies the cumulative and differential histograms.
+@pytest.mark.parametrize(
+    "cumulative, relative, expected",
+    [
+        (True, True, [100.0] * 4 + [50.0] * 7 + [25.0]),
+        (False, True, [0.0] * 3 + [50.0] + [0.0] * 6 + [25.0, 25.0]),
+        (False, False, [0.0] * 3 + [0.012] + [0.0] * 6 + [0.006, 0.006]),
+    ],
+)
+def test_dvh(dicom_info, cumulative, relative, expected):
+    frame = dicom_info.dvh(
+        bin_width=1.0, cumulative=cumulative, relative=relative
+    )
+    assert list(frame.index) == list(np.arange(12.0))
+    np.testing.assert_allclose(frame["box"], expected)
+    if relative:
+        assert frame["outside"].isna().all()
+    else:
+        assert (frame["outside"] == 0).all()
+
+
+# This test verifies the metrics with voxels of different volumes.
+def test_metrics_weighted():
+    doses = np.array([1.0, 2.0, 3.0, 4.0])
+    volumes = np.array([0.1, 0.1, 0.1, 0.7])
+    result = dvh.metrics(doses, volumes, [50, 80, 95], [2.5])
+    assert result["Dmean"] == pytest.approx(3.4)
+    assert [result["D50"], result["D80"], result["D95"]] == [4.0, 3.0, 1.0]
+    assert result["V2.5"] == pytest.approx(80.0)
+
+
+@pytest.mark.parametrize(
+    "names, bin_width, expected",
+    [
+        (["box"], 0.1, does_not_raise()),
+        (["none"], 0.1, pytest.raises(ValueError)),
+        (None, 0.0, pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(dicom_info, names, bin_width, expected):
+    with expected:
+        dicom_info.dvh(names, bin_width=bin_width)
@@ -0,0 +1,138 @@
+import io
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler import scan as scan_module
+from dicomhandler.dicom_info import DicomInfo
+
+import pydicom
+
+import pytest
+
+
+def header(patient_id, modality, uid=None, **references):
+    dataset = pydicom.dataset.Dataset()
+    dataset.PatientName = "Mike Wazowski"
+    dataset.PatientID = patient_id
+    dataset.PatientBirthDate = "20000101"
+    dataset.Modality = modality
+    if uid is not None:
+        dataset.SOPInstanceUID = uid
+    for keyword, (referenced, summation) in references.items():
+        item = pydicom.dataset.Dataset()
+        item.ReferencedSOPInstanceUID = referenced
+        setattr(dataset, keyword, [item])
+        if summation is not None:
+            dataset.DoseSummationType = summation
+    return dataset
+
+
+# This fixture writes an archive with two patients, a CT image, a file
+# that is not DICOM and a file with other extension.
+@pytest.fixture()
+def archive(tmp_path, dicom_writer):
+    first = tmp_path / "first"
+    second = tmp_path / "second" / "nested"
+    first.mkdir()
+    second.mkdir(parents=True)
+    dicom_writer(header("0", "RTSTRUCT", "1.1"), first / "rs.dcm")
+    dicom_writer(
+        header(
+            "0",
+            "RTPLAN",
+            "1.2",
+            ReferencedStructureSetSequence=("1.1", None),
+        ),
+        first / "rp.dcm",
+    )
+    dicom_writer(
+        header("0", "RTDOSE", "1.3", ReferencedRTPlanSequence=("1.2", "BEAM")),
+        first / "rd_beam.dcm",
+    )
+    dicom_writer(
+        header("0", "RTDOSE", "1.4", ReferencedRTPlanSequence=("1.2", "PLAN")),
+        first / "rd_plan.dcm",
+    )
+    dicom_writer(header("0", "CT", "1.5"), first / "ct.dcm")
+    dicom_writer(header("1", "RTSTRUCT"), second / "rs.dcm")
+    dicom_writer(header("1", "RTPLAN"), second / "rp.dcm")
+    (second / "broken.dcm").write_text("not a DICOM file")
+    (second / "notes.txt").write_text("not a DICOM file")
+    return tmp_path
+
+
+# This test verifies that the files are grouped by patient and by the
+# references between them, and that the bad files are reported.
+def test_groups(archive):
+    scan = DicomInfo.from_directory(archive, workers=2)
+    names = [sorted(path.name for path in group) for group in scan.groups]
+    assert names == [
+        ["rd_plan.dcm", "rp.dcm", "rs.dcm"],
+        ["rd_beam.dcm"],
+        ["rp.dcm", "rs.dcm"],
+    ]
+    assert len(scan.headers) == 6
+    assert list(scan.bad_files["path"]) == [
+        archive / "second" / "nested" / "broken.dcm"
+    ]
+    dicom_infos = list(scan)
+    assert len(dicom_infos) == len(scan) == 3
+    assert dicom_infos[0].dicom_dose.DoseSummationType == "PLAN"
+    assert dicom_infos[0].dicom_struct.SOPInstanceUID == "1.1"
+    assert dicom_infos[1].dicom_plan is None
+    assert dicom_infos[2].PatientID == "1"
+
+
+@pytest.mark.parametrize(
+    "recursive, expected",
+    [(True, 3), (False, 0)],
+)
+# These tests verify the search in the subdirectories.
+def test_recursive(archive, recursive, expected):
+    scan = DicomInfo.from_directory(archive, recursive=recursive)
+    assert len(scan) == expected
+
+
+@pytest.mark.parametrize(
+    "directory, expected",
+    [("first", does_not_raise()), ("missing", pytest.raises(ValueError))],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(archive, directory, expected):
+    with expected:
+        DicomInfo.from_directory(archive / directory)
+
+
+# This test verifies that the contours of a structure set, in a sequence
+# of undefined length, are not read by the scan.
+def test_header_skips_contours(tmp_path, monkeypatch, dicom_writer):
+    struct = header("0", "RTSTRUCT", "1.1")
+    roi_contour = pydicom.dataset.Dataset()
+    roi_contour.ContourSequence = []
+    for z in range(20):
+        contour = pydicom.dataset.Dataset()
+        contour.ContourData = [
+            float(value)
+            for x in range(50)
+            for y in range(20)
+            for value in (x, y, z)
+        ]
+        roi_contour.ContourSequence.append(contour)
+    struct.ROIContourSequence = [roi_contour]
+    struct.ROIContourSequence.is_undefined_length = True
+    path = dicom_writer(struct, tmp_path / "rs.dcm")
+    read = []
+
+    class Reader(io.FileIO):
+        def read(self, size=-1):
+            data = super().read(size)
+            read.append(len(data))
+            return data
+
+    monkeypatch.setattr(
+        scan_module, "open", lambda path, mode: Reader(path), raising=False
+    )
+    dataset = scan_module.read_header(path)
+    assert dataset["Modality"] == "RTSTRUCT"
+    assert dataset["SOPInstanceUID"] == "1.1"
+    assert 0 < sum(read) < path.stat().st_size / 100
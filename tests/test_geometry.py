@@ -0,0 +1,107 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.geometry import COLUMNS, hole_signs, measure
+
+import numpy as np
+
+import pytest
+
+
+def square(x, y, z, clockwise=False):
+    points = [[x[0], y[0], z], [x[1], y[0], z], [x[1], y[1], z]]
+    points.append([x[0], y[1], z])
+    return points[::-1] if clockwise else points
+
+
+def structure(contours, thickness=None):
+    points = np.array([point for contour in contours for point in contour])
+    offsets = np.cumsum([0] + [len(contour) for contour in contours])
+    return points.reshape(-1, 3), offsets, thickness
+
+
+# This test verifies the measures of a box, a box with a hole, two
+# islands in a single slice, a line and a structure without points.
+def test_measure():
+    planes = range(0, 10, 2)
+    rows = measure(
+        [
+            structure([square((0, 10), (0, 10), z) for z in planes]),
+            structure(
+                [square((0, 10), (0, 10), z) for z in planes]
+                + [square((2, 4), (2, 4), z, True) for z in planes]
+            ),
+            structure(
+                [square((0, 10), (0, 10), 0), square((20, 30), (0, 10), 0)],
+                3.0,
+            ),
+            structure([[[0, 0, 0], [1, 1, 0]]]),
+            structure([]),
+        ]
+    )
+    assert rows.shape == (5, len(COLUMNS))
+    np.testing.assert_allclose(
+        rows[0], [1.0, 6.0, 5, 5, 4, 0, 10, 0, 10, 0, 8]
+    )
+    np.testing.assert_allclose(rows[1, :5], [0.96, 6.72, 61 / 12, 61 / 12, 4])
+    np.testing.assert_allclose(rows[2, :5], [0.6, 6.4, 15, 5, 0])
+    assert list(rows[3, :2]) == [0.0, 0.0]
+    assert np.isnan(rows[3, 2:5]).all()
+    assert np.isnan(rows[4]).all()
+
+
+# This test verifies that the holes are the contours inside an odd
+# number of contours of their plane, whatever their orientation.
+def test_hole_signs():
+    points, offsets, _ = structure(
+        [
+            square((0, 10), (0, 10), 0),
+            square((2, 8), (2, 8), 0),
+            square((4, 6), (4, 6), 0),
+            square((20, 30), (0, 10), 0),
+            square((2, 8), (2, 8), 2),
+        ]
+    )
+    planes = np.array([0, 0, 0, 0, 1])
+    signs = hole_signs(points, offsets, planes)
+    assert list(signs) == [1, -1, 1, 1, 1]
+
+
+# This fixture returns an object with a box, a structure without
+# contours and a structure with a single slice.
+@pytest.fixture()
+def dicom_info(struct_builder):
+    box = [square((0.0, 10.0), (0.0, 20.0), z) for z in (0, 3, 6)]
+    single = [square((0.0, 4.0), (0.0, 5.0), 9.0)]
+    return DicomInfo(struct_builder({"box": box, "none": [], "slice": single}))
+
+
+# This test verifies the geometry of the structures, cached and updated
+# after a movement.
+def test_geometry(dicom_info):
+    frame = dicom_info.geometry()
+    assert list(frame.columns) == ["roi"] + list(COLUMNS)
+    assert list(frame["roi"]) == ["box", "none", "slice"]
+    assert list(frame["volume"][[0, 2]]) == pytest.approx([1.8, 0.06])
+    assert list(frame.loc[0, ["x", "y", "z"]]) == [5.0, 10.0, 3.0]
+    assert frame.loc[0, "surface"] == pytest.approx(9.4)
+    assert frame.iloc[1, 1:].isna().all()
+    assert len(dicom_info._geometry) == 3
+    moved = dicom_info.move("box", 2.5, "x")
+    frame = moved.geometry(["box", "slice"])
+    assert list(frame.loc[0, ["x", "xmin", "xmax"]]) == [7.5, 2.5, 12.5]
+    assert len(dicom_info._geometry) == 4
+
+
+@pytest.mark.parametrize(
+    "names, expected",
+    [
+        (["box"], does_not_raise()),
+        (["BOX"], pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(dicom_info, names, expected):
+    with expected:
+        dicom_info.geometry(names)
@@ -2,6 +2,8 @@ from contextlib import nullcontext as does_not_raise
 
 from dicomhandler.dicom_info import DicomInfo
 
+import pydicom
+
 import pytest
 
 
@@ -185,3 +187,39 @@ def test_dicominfo_modality_supported_3in(
             request.getfixturevalue(patient_mock2),
             request.getfixturevalue(patient_mock3),
         )
+
+
+# This test verifies that the objects built from the paths of the files
+# keep the large elements on disk until a method needs them.
+def test_from_files(dicom_files):
+    dicom_info = DicomInfo.from_files(*dicom_files.values(), defer_size=64)
+    assert dicom_info.PatientID == "0"
+    struct = dicom_info._dicom_struct
+    contours = struct._dict[pydicom.tag.Tag("ROIContourSequence")]
+    assert isinstance(contours, pydicom.dataelem.RawDataElement)
+    assert contours.value is None
+    dose = dicom_info.dicom_dose
+    pixels = dose._dict[pydicom.tag.Tag("PixelData")]
+    assert pixels.value is None
+    expected = DicomInfo(
+        pydicom.dcmread(dicom_files["RTSTRUCT"]),
+        pydicom.dcmread(dicom_files["RTPLAN"]),
+    )
+    assert dicom_info.contours.names == expected.contours.names
+    assert dicom_info.summarize_to_dataframe(area=True).equals(
+        expected.summarize_to_dataframe(area=True)
+    )
+    assert dose._dict[pydicom.tag.Tag("PixelData")].value is None
+
+
+@pytest.mark.parametrize(
+    "modalities, expected",
+    [
+        (["RTSTRUCT", "RTPLAN"], does_not_raise()),
+        (["RTPLAN", "RTPLAN"], pytest.raises(ValueError)),
+    ],
+)
+# These tests verify that the files are validated as the datasets.
+def test_from_files_raises(dicom_files, modalities, expected):
+    with expected:
+        DicomInfo.from_files(*[dicom_files[name] for name in modalities])
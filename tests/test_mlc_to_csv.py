@@ -1,6 +1,7 @@
+import gzip
 import os
 from contextlib import nullcontext as does_not_raise
-from io import StringIO
+from io import BytesIO, StringIO
 from pathlib import Path
 
 import pandas as pd
@@ -131,3 +132,23 @@ def test_raises(
     with expected:
         di = di_1p_fixt(patient_p, "test_mlc_to_csv")
         di.mlc_to_csv(path_or_buff=path_file_out)
+
+
+@pytest.mark.parametrize("name", ["res.csv.gz", "res.txt.gz"])
+# These tests verify that the output is compressed with gzip, for paths
+# ending in .gz and for binary buffers.
+def test_gzip(di_1p_fixt, tmp_path, name):
+    di = di_1p_fixt("patient_0_p.gz", "test_mlc_to_csv")
+    buff_exp = StringIO()
+    di.mlc_to_csv(path_or_buff=buff_exp)
+    buff_exp.seek(0)
+    expected = pd.read_csv(buff_exp)
+    for path in [tmp_path / name, str(tmp_path / name)]:
+        di.mlc_to_csv(path_or_buff=path)
+        with gzip.open(path, "rt") as file:
+            assert_frame_equal(pd.read_csv(file), expected)
+    buff_res = BytesIO()
+    di.mlc_to_csv(path_or_buff=buff_res, compression="gzip")
+    assert not buff_res.closed
+    buff_res.seek(0)
+    assert_frame_equal(pd.read_csv(buff_res, compression="gzip"), expected)
@@ -0,0 +1,55 @@
+from contextlib import nullcontext as does_not_raise
+
+import numpy as np
+
+import pytest
+
+
+# This test verifies that the dataframe has the same information as
+# the csv file, one row per control point.
+def test_equality_mlc(di_1p_fixt):
+    di = di_1p_fixt("patient_0_p.gz", "test_mlc_to_csv")
+    result = di.mlc_to_dataframe()
+    assert list(result.columns[:5]) == [
+        "beam",
+        "checkpoint",
+        "gantry_angle",
+        "gantry_direction",
+        "table",
+    ]
+    assert list(result["beam"]) == [1, 1, 2, 2]
+    assert list(result["checkpoint"]) == [1, 2, 1, 2]
+    assert list(result["gantry_angle"]) == [0.0, 10.0, 0.0, 10.0]
+    assert list(result["gantry_direction"]) == ["CW", "CW", "CC", "CC"]
+    assert list(result["table"]) == [0.0, 0.0, 5.0, 5.0]
+    mlc = result[[f"mlc{leaf}" for leaf in range(1, 7)]].values
+    assert mlc.tolist() == [
+        [-9.0, -8.0, -7.0, 0.0, 0.0, 0.0],
+        [-3.0, -2.0, -1.0, -3.0, -2.0, -1.0],
+        [-3.0, -2.0, -1.0, 1.0, 2.0, 3.0],
+        [-3.0, -2.0, -1.0, 3.0, 2.0, 1.0],
+    ]
+
+
+# This test verifies the types of the columns.
+def test_dtypes(di_1p_fixt):
+    di = di_1p_fixt("patient_0_p.gz", "test_mlc_to_csv")
+    result = di.mlc_to_dataframe(dtype=np.float32)
+    assert result["beam"].dtype == "category"
+    assert result["gantry_direction"].dtype == "category"
+    assert (result.iloc[:, 5:].dtypes == np.float32).all()
+
+
+@pytest.mark.parametrize(
+    "patient, expected",
+    [
+        ("patient_0_p.gz", does_not_raise()),
+        ("patient_0_s.gz", pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(di_1p_fixt, patient, expected):
+    di = di_1p_fixt(patient, "test_mlc_to_csv")
+    with expected:
+        di.mlc_to_dataframe()
@@ -1,5 +1,9 @@
 from contextlib import nullcontext as does_not_raise
 
+from dicomhandler.dicom_info import DicomInfo
+
+import numpy as np
+
 from pydicom.multival import MultiValue
 
 import pytest
@@ -204,3 +208,90 @@ def test_move_punto(di_1p_fixt, struct, angle, key, expected):
         )
         assert len(x) == len(expected)
         assert all([abs(xi - yi) <= 0.00001 for xi, yi in zip(x, expected)])
+
+
+@pytest.mark.parametrize(
+    "struct, steps",
+    [
+        ("cubo", [("yaw", 10.0), ("x", 2.0)]),
+        ("cubo", [("roll", 5), ("pitch", -3.0), ("yaw", 1.5)]),
+        ("space", [("x", 1.0), ("y", -2.0), ("z", 3.0), ("roll", 90)]),
+    ],
+)
+# These tests compare a chain of movements with the same movements
+# applied one after the other.
+def test_move_sequence(di_1p_fixt, struct, steps):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    moved = dicom_info
+    for key, value in steps:
+        moved = moved.move(struct, value, key)
+    chained = dicom_info.move_sequence(struct, steps)
+    for roi_x, roi_y in zip(
+        moved.dicom_struct.ROIContourSequence,
+        chained.dicom_struct.ROIContourSequence,
+    ):
+        for x, y in zip(roi_x.ContourSequence, roi_y.ContourSequence):
+            assert all(
+                [
+                    abs(xi - yi) <= 0.00000001
+                    for xi, yi in zip(x.ContourData, y.ContourData)
+                ]
+            )
+
+
+@pytest.mark.parametrize(
+    "steps, expected",
+    [
+        ([("yaw", 10.0), ("x", "1")], pytest.raises(TypeError)),
+        ([("x", 1.0), ("xx", 1.0)], pytest.raises(ValueError)),
+        ([("roll", 360.0)], pytest.raises(ValueError)),
+        ([], does_not_raise()),
+    ],
+)
+# These tests verify if the chain of movements raises/doesn't raise
+# errors in the correct way.
+def test_raises_move_sequence(di_1p_fixt, steps, expected):
+    with expected:
+        dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+        dicom_info.move_sequence("cubo", steps)
+
+
+# This test verifies that the moved object shares every unmodified
+# dataset and ROI with the original, which remains unchanged.
+def test_move_copy_on_write(di_1p_fixt, patients):
+    dicom_info = di_1p_fixt("patient_1_s.gz", "test_move")
+    original = dicom_info.dicom_struct
+    moved = dicom_info.move("punto", 1.0, "x").dicom_struct
+    expected = patients("patient_1_s.gz", "test_move")
+    assert (
+        original.ROIContourSequence[2].ContourSequence[0].ContourData
+        == expected.ROIContourSequence[2].ContourSequence[0].ContourData
+    )
+    assert moved.ROIContourSequence[2] is not original.ROIContourSequence[2]
+    assert moved.ROIContourSequence[0] is original.ROIContourSequence[0]
+    assert (
+        moved["StructureSetROISequence"] is original["StructureSetROISequence"]
+    )
+
+
+# This test verifies that only the slices within the z range are
+# moved, with the same transform as the whole structure.
+@pytest.mark.parametrize(
+    "z_range, moved",
+    [((2.0, 4.0), [False, True, True]), (None, [True, True, True])],
+)
+def test_move_slab(struct_builder, z_range, moved):
+    contours = [
+        [[0.0, 0.0, z], [1.0, 0.0, z], [1.0, 1.0, z]] for z in (0.0, 3.0, 4.0)
+    ]
+    dicom_info = DicomInfo(struct_builder({"roi": contours}))
+    origin = [0.0, 0.0, 0.0]
+    whole = dicom_info.move("roi", 90.0, "yaw", origin)
+    result = dicom_info.move("roi", 90.0, "yaw", origin, z_range=z_range)
+    for contour, original, rotated, expected in zip(
+        result.contours.contours(0),
+        dicom_info.contours.contours(0),
+        whole.contours.contours(0),
+        moved,
+    ):
+        np.testing.assert_allclose(contour, rotated if expected else original)
@@ -0,0 +1,110 @@
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.plan import PlanArrays, find_device
+
+import numpy as np
+
+import pydicom
+
+import pytest
+
+
+# This test verifies that the devices are found by their type and that
+# the untyped sequences fall back to the position of the device.
+def test_find_device():
+    untyped = [pydicom.dataset.Dataset() for _ in range(3)]
+    assert find_device(untyped, ("MLCX",), 2) is untyped[2]
+    assert find_device(untyped[:1], ("MLCX",), 2) is None
+    typed = [pydicom.dataset.Dataset(), pydicom.dataset.Dataset()]
+    typed[0].RTBeamLimitingDeviceType = "ASYMX"
+    typed[1].RTBeamLimitingDeviceType = "MLCX"
+    assert find_device(typed, ("MLCX",), 0) is typed[1]
+    assert find_device(typed, ("ASYMY", "Y")) is None
+
+
+# This test verifies the decoded arrays, with the values that are not
+# repeated carried forward from the previous control point.
+def test_plan_arrays(plan_dataset):
+    arrays = PlanArrays(plan_dataset)
+    assert len(arrays) == 3
+    assert arrays.n_beams == 2
+    assert list(arrays.offsets) == [0, 2, 3]
+    assert list(arrays.beam) == [0, 0, 1]
+    assert list(arrays.control_point) == [0, 1, 0]
+    assert list(arrays.gantry_angle) == [180.0, 190.0, 0.0]
+    assert list(arrays.gantry_direction) == ["CW", "CW", "NONE"]
+    assert list(arrays.table) == [90.0, 90.0, 0.0]
+    assert np.array_equal(arrays.meterset, [0.0, 1.0, np.nan], equal_nan=True)
+    assert arrays.jaw_x.tolist() == [[-5.0, 6.0], [-5.0, 6.0], [-2.0, 2.0]]
+    assert arrays.jaw_y.tolist() == [[-8.0, 9.0], [-8.0, 9.0], [-3.0, 3.0]]
+    assert list(arrays.n_leaves) == [3, 2]
+    assert np.array_equal(
+        arrays.bank_a,
+        [[-1.0, -2.0, -3.0], [-4.0, -5.0, -6.0], [-1.0, -1.0, np.nan]],
+        equal_nan=True,
+    )
+    assert arrays.mlc(1).tolist() == [[-1.0, -1.0, 1.0, 1.0]]
+    assert list(arrays.leaf_widths(0)) == [5.0, 5.0, 10.0]
+    assert list(arrays.leaf_widths(1)) == [2.5, 2.5]
+    with pytest.raises(ValueError):
+        arrays.table[0] = 0.0
+
+
+# This test verifies that the arrays are decoded once and shared with
+# the copies of the object.
+def test_plan_arrays_cached(plan_dataset):
+    dicom_info = DicomInfo(plan_dataset)
+    arrays = dicom_info.plan_arrays
+    assert dicom_info.plan_arrays is arrays
+    assert dicom_info.anonymize().plan_arrays is arrays
+    dicom_info.dicom_plan = plan_dataset
+    assert dicom_info.plan_arrays is not arrays
+    with pytest.raises(ValueError):
+        DicomInfo().plan_arrays
+
+
+@pytest.mark.parametrize(
+    "jaws, expected",
+    [
+        (
+            False,
+            [
+                [10.0, 20.0, 60.0],
+                [40.0, 50.0, 120.0],
+                [5.0, 5.0, np.nan],
+            ],
+        ),
+        (
+            True,
+            [
+                [6.0, 20.0, 54.0],
+                [24.0, 50.0, 99.0],
+                [5.0, 1.0, np.nan],
+            ],
+        ),
+    ],
+)
+# These tests verify the area exposed by each leaf pair, with and
+# without clipping the openings and the leaves with the jaws.
+def test_exposed_area(plan_dataset, jaws, expected):
+    arrays = PlanArrays(plan_dataset)
+    exposed = arrays.exposed_area(jaws)
+    assert np.array_equal(exposed, expected, equal_nan=True)
+    assert arrays.exposed_area(jaws) is exposed
+    assert not exposed.flags.writeable
+    assert list(arrays.aperture_area(jaws)) == list(
+        np.nansum(expected, axis=1)
+    )
+
+
+# This test verifies that the jaws are swapped for a MLC whose leaves
+# move along y.
+def test_exposed_area_mlcy(plan_dataset):
+    static = plan_dataset.BeamSequence[1]
+    static.BeamLimitingDeviceSequence[2].RTBeamLimitingDeviceType = "MLCY"
+    devices = static.ControlPointSequence[0].BeamLimitingDevicePositionSequence
+    devices[2].RTBeamLimitingDeviceType = "MLCY"
+    arrays = PlanArrays(plan_dataset)
+    assert list(arrays.mlc_type) == ["MLCX", "MLCY"]
+    # Leaves [0, 2.5] and [2.5, 5] clipped by the jaws in x at 2 mm, and
+    # openings of 2 mm within the jaws in y.
+    assert list(arrays.exposed_area()[2, :2]) == [4.0, 0.0]
@@ -0,0 +1,139 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler.raster import (
+    Grid,
+    MaskCache,
+    extract_contours,
+    intersection,
+    rasterize,
+    structure_mask,
+)
+
+import numpy as np
+
+import pytest
+
+
+# This fixture returns a square of 10 mm with a square hole of 4 mm and
+# a triangle, in two slices.
+@pytest.fixture()
+def polygons():
+    square = [[0.0, 0.0], [10.0, 0.0], [10.0, 10.0], [0.0, 10.0]]
+    hole = [[3.0, 3.0], [7.0, 3.0], [7.0, 7.0], [3.0, 7.0]]
+    triangle = [[15.0, 0.0], [20.0, 0.0], [15.0, 5.0]]
+    points, offsets = [], [0]
+    for z in [0.0, 2.0]:
+        for polygon in [square, hole, triangle]:
+            points += [[x, y, z] for x, y in polygon]
+            offsets.append(len(points))
+    return np.array(points), np.array(offsets)
+
+
+# This test verifies the area filled in each slice, with the hole.
+def test_rasterize(polygons):
+    x, y = np.arange(-2.0, 23.0, 0.5), np.arange(-2.0, 13.0, 0.5)
+    mask = rasterize(*polygons, x, y, np.array([0.0, 1.0, 2.0]))
+    areas = mask.sum(axis=(1, 2)) * 0.25
+    assert areas[1] == 0
+    assert areas[0] == areas[2]
+    assert areas[0] == pytest.approx(100.0 - 16.0 + 12.5, abs=3.0)
+    assert not mask[0, 10, 14]
+
+
+# This test verifies that the contours extracted from a mask are filled
+# again in the same voxels.
+def test_extract_contours(polygons):
+    x, y = np.arange(-2.0, 23.0, 0.5), np.arange(-2.0, 13.0, 0.5)
+    z = np.array([0.0, 1.0, 2.0])
+    mask = rasterize(*polygons, x, y, z)
+    points, offsets = extract_contours(mask, x, y, z)
+    assert len(offsets) - 1 == 6
+    assert list(np.unique(points[:, 2])) == [0.0, 2.0]
+    assert np.array_equal(rasterize(points, offsets, x, y, z), mask)
+
+
+# This test verifies that the planes of the grid between the slices of
+# the structure take the contours of the nearest slice.
+@pytest.mark.parametrize("step", [0.5, 1.0, 3.0])
+def test_structure_mask(polygons, step):
+    x, y = np.arange(-2.0, 23.0, 0.5), np.arange(-2.0, 13.0, 0.5)
+    grid = Grid(x, y, np.arange(-6.0, 9.0, step))
+    mask = structure_mask(*polygons, grid)
+    full = mask.full()
+    assert full.shape == grid.shape
+    assert mask.values.sum() == full.sum() == mask.count
+    covered = (grid.z >= -1.0) & (grid.z <= 3.0)
+    assert np.array_equal(full.any(axis=(1, 2)), covered)
+    single = rasterize(*polygons, x, y, np.array([0.0]))[0]
+    assert all(np.array_equal(plane, single) for plane in full[covered])
+    flipped = Grid(x[::-1], y, grid.z[::-1])
+    assert np.array_equal(
+        structure_mask(*polygons, flipped).full(), full[::-1, :, ::-1]
+    )
+
+
+# This test verifies the masks of structures outside the grid.
+def test_structure_mask_empty(polygons):
+    grid = Grid.regular([30.0, 30.0, 0.0], [40.0, 40.0, 2.0], 1.0)
+    mask = structure_mask(*polygons, grid)
+    assert mask.count == 0
+    assert not mask.full().any()
+
+
+# This test verifies the voxels in common of packed masks with boxes
+# that are not aligned to the bytes.
+@pytest.mark.parametrize("shift", [0.0, 1.5, 4.0, 9.5, 30.0])
+def test_intersection(polygons, shift):
+    grid = Grid.regular([-7.0, -2.0, -1.0], [45.0, 12.0, 3.0], 0.5)
+    mask = structure_mask(*polygons, grid)
+    moved = structure_mask(polygons[0] + [shift, 0.0, 0.0], polygons[1], grid)
+    bits, box = mask.packed()
+    assert bits.shape[2] == box[2].stop - box[2].start
+    start = mask.box[2].start % 8
+    unpacked = np.unpackbits(bits, axis=2)
+    stop = start + mask.values.shape[2]
+    assert np.array_equal(unpacked[:, :, start:stop], mask.values)
+    expected = np.count_nonzero(mask.full() & moved.full())
+    assert intersection(mask, moved) == intersection(moved, mask) == expected
+    empty = structure_mask(polygons[0] + 100.0, polygons[1], grid)
+    assert intersection(mask, empty) == 0
+    other = structure_mask(*polygons, Grid(grid.x, grid.y, [0.0]))
+    with pytest.raises(ValueError):
+        intersection(mask, other)
+
+
+# This test verifies that the masks are rasterized once and evicted
+# when the cache is full.
+def test_mask_cache(polygons):
+    x, y = np.arange(-2.0, 23.0, 0.5), np.arange(-2.0, 13.0, 0.5)
+    grid = Grid(x, y, [0.0, 2.0])
+    cache = MaskCache()
+    mask = cache.get(*polygons, grid)
+    assert cache.get(*polygons, Grid(x, y, [0.0, 2.0])) is mask
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+    moved = polygons[0] + 1.0
+    assert cache.get(moved, polygons[1], grid) is not mask
+    assert cache.nbytes == 2 * mask.values.nbytes
+    cache.max_bytes = mask.values.nbytes
+    cache.get(*polygons, Grid(x, y, [0.0, 1.0, 2.0]))
+    assert len(cache) == 1
+    cache.clear()
+    assert (len(cache), cache.nbytes) == (0, 0)
+
+
+# This test verifies the validation of the axes of the grids.
+@pytest.mark.parametrize(
+    "x, z, expected",
+    [
+        ([0.0, 1.0, 2.0], [0.0, 1.0, 3.0], does_not_raise()),
+        ([2.0, 1.0, 0.0], [3.0, 1.0, 0.0], does_not_raise()),
+        ([0.0, 1.0, 3.0], [0.0, 1.0], pytest.raises(ValueError)),
+        ([0.0, 1.0, 2.0], [0.0, 1.0, 0.5], pytest.raises(ValueError)),
+        ([], [0.0], pytest.raises(ValueError)),
+    ],
+)
+def test_grid(x, z, expected):
+    with expected:
+        grid = Grid(x, [0.0], z)
+        assert grid.shape == (len(z), 1, len(x))
+        assert grid == Grid(x, [0.0], z)
@@ -1,7 +1,10 @@
 import os
 from contextlib import nullcontext as does_not_raise
 
-from dicomhandler.report import report
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.report import overlap, report, report_all, surface_distance
+
+import numpy as np
 
 import pandas as pd
 from pandas.testing import assert_frame_equal
@@ -212,3 +215,183 @@ def test_margins_df(di_1p_fixt, patient, exp_csv, name, margin):
     df_out = report(original, expanded, name)
     exp_df = pd.read_csv(os.getcwd() + "/tests/data/test_report/" + exp_csv)
     assert_frame_equal(df_out, exp_df, atol=0.001)
+
+
+@pytest.mark.parametrize(
+    "patient, moved, names, expected",
+    [
+        ("patient_9_s.gz", "cube", None, ["point", "cube", "isocenter"]),
+        ("patient_12_s.gz", "point", None, ["point", "isocenter"]),
+        ("patient_13_s.gz", "isocenter", None, ["isocenter"]),
+        ("patient_9_s.gz", "cube", ["cube"], ["cube"]),
+    ],
+)
+# These tests verify that the batch report has the rows of the report of
+# each structure with the same name and number of points.
+def test_report_all(di_1p_fixt, patient, moved, names, expected):
+    original = di_1p_fixt("patient_8_s.gz", "test_report")
+    moved = di_1p_fixt(patient, "test_report").move(moved, 1.5, "x")
+    df_out = report_all(original, moved, names)
+    assert list(df_out["roi"].unique()) == expected
+    for name, group in df_out.groupby("roi", observed=True, sort=False):
+        exp_df = report(original, moved, name)
+        assert_frame_equal(
+            group.drop(columns="roi").reset_index(drop=True), exp_df
+        )
+
+
+@pytest.mark.parametrize(
+    "patient, names, expected",
+    [
+        ("patient_9_s.gz", [], does_not_raise()),
+        ("patient_9_s.gz", ["POINT"], pytest.raises(ValueError)),
+        ("patient_12_s.gz", ["cube"], pytest.raises(ValueError)),
+        ("patient_13_s.gz", ["point"], pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the batch report raises/doesn't raise errors
+# in the correct way.
+def test_report_all_raises(di_1p_fixt, patient, names, expected):
+    original = di_1p_fixt("patient_8_s.gz", "test_report")
+    other = di_1p_fixt(patient, "test_report")
+    with expected:
+        df_out = report_all(original, other, names)
+        assert df_out.empty
+
+
+@pytest.mark.parametrize(
+    "patient, name, margin",
+    [
+        ("patient_8_s.gz", "cube", 1.0),
+        ("patient_8_s.gz", "cube", -0.5),
+        ("patient_12_s.gz", "cube", 0.0),
+        ("patient_9_s.gz", "point", 0.0),
+    ],
+)
+# These tests verify the surface distances, which do not need the same
+# number of points, against all the distances between the points.
+def test_surface_distance(di_1p_fixt, patient, name, margin):
+    original = di_1p_fixt("patient_8_s.gz", "test_report")
+    other = di_1p_fixt(patient, "test_report")
+    if margin:
+        other = original.add_margin(name, margin)
+    points1 = original.contours.points(original.contours.index[name])
+    points2 = other.contours.points(other.contours.index[name])
+    distances = np.linalg.norm(points1[:, None] - points2[None], axis=2)
+    distance12, distance21 = distances.min(axis=1), distances.min(axis=0)
+    df_out = surface_distance(original, other, name)
+    assert list(df_out["Value [mm]"]) == [
+        round(distance12.max(), 3),
+        round(distance21.max(), 3),
+        round(max(distance12.max(), distance21.max()), 3),
+        round(
+            max(np.percentile(distance12, 95), np.percentile(distance21, 95)),
+            3,
+        ),
+        round(np.concatenate((distance12, distance21)).mean(), 3),
+    ]
+
+
+@pytest.mark.parametrize(
+    "patient, struct1, struct2, expected",
+    [
+        ("patient_8_s.gz", "cube", "point", does_not_raise()),
+        ("patient_8_s.gz", "cube", "POINT", pytest.raises(ValueError)),
+        ("patient_13_s.gz", "point", None, pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the surface distances raise/don't raise errors
+# in the correct way.
+def test_surface_distance_raises(
+    di_1p_fixt, patient, struct1, struct2, expected
+):
+    original = di_1p_fixt("patient_8_s.gz", "test_report")
+    with expected:
+        surface_distance(
+            original, di_1p_fixt(patient, "test_report"), struct1, struct2
+        )
+
+
+def box(x, y, z):
+    return [
+        [[x[0], y[0], level], [x[1], y[0], level], [x[1], y[1], level]]
+        + [[x[0], y[1], level]]
+        for level in np.arange(z[0], z[1] + 1.0, 2.0)
+    ]
+
+
+# This fixture returns an object with two boxes that overlap by half and
+# a box far from them.
+@pytest.fixture()
+def boxes(struct_builder):
+    struct = struct_builder(
+        {
+            "a": box((0.0, 10.0), (0.0, 10.0), (0.0, 8.0)),
+            "b": box((5.0, 15.0), (0.0, 10.0), (0.0, 8.0)),
+            "far": box((50.0, 60.0), (50.0, 60.0), (0.0, 8.0)),
+        }
+    )
+    return DicomInfo(struct)
+
+
+# These tests verify the overlap of the structures of the same object
+# and of a moved object.
+@pytest.mark.parametrize("spacing", [1.0, 0.5, [0.5, 0.5, 2.0]])
+def test_overlap(boxes, spacing):
+    moved = boxes.move("a", 5.0, "x")
+    df_out = overlap(boxes, moved, spacing=spacing)
+    assert list(df_out["roi1"]) == ["a", "b", "far"]
+    assert list(df_out["Dice"][1:]) == [1.0, 1.0]
+    assert df_out["Dice"][0] == pytest.approx(0.5, abs=0.05)
+    assert df_out["volume1"][0] == pytest.approx(1.0, rel=0.25)
+    pairs = [("a", "b"), ("a", "far"), "b"]
+    df_out = overlap(boxes, boxes, pairs, spacing=spacing)
+    assert list(df_out["roi2"]) == ["b", "far", "b"]
+    assert df_out["Dice"][0] == pytest.approx(0.5, abs=0.05)
+    jaccard = df_out["Jaccard"]
+    np.testing.assert_allclose(df_out["Dice"], 2 * jaccard / (1 + jaccard))
+    assert list(df_out["intersection"][1:]) == [0.0, df_out["volume1"][2]]
+    assert list(df_out["volume ratio"]) == [1.0, 1.0, 1.0]
+
+
+@pytest.mark.parametrize(
+    "pairs, expected",
+    [
+        ([], does_not_raise()),
+        (["A"], pytest.raises(ValueError)),
+        ([("a", "none")], pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the overlap raises/doesn't raise errors
+# in the correct way.
+def test_overlap_raises(boxes, pairs, expected):
+    with expected:
+        assert overlap(boxes, boxes, pairs).empty
+
+
+# These tests verify that all the reports take the last ROI of a
+# repeated name, as the masks of the overlap.
+def test_repeated_name(struct_builder):
+    struct = struct_builder(
+        {
+            "a": box((0.0, 10.0), (0.0, 10.0), (0.0, 8.0)),
+            "b": box((5.0, 15.0), (0.0, 10.0), (0.0, 8.0)),
+            "c": box((50.0, 60.0), (50.0, 60.0), (0.0, 8.0)),
+        }
+    )
+    struct.StructureSetROISequence[1].ROIName = "a"
+    repeated = DicomInfo(struct)
+    single = DicomInfo(
+        struct_builder(
+            {
+                "a": box((5.0, 15.0), (0.0, 10.0), (0.0, 8.0)),
+                "c": box((50.0, 60.0), (50.0, 60.0), (0.0, 8.0)),
+            }
+        )
+    )
+    df_out = surface_distance(repeated, single, "a")
+    assert list(df_out["Value [mm]"]) == [0.0] * len(df_out)
+    df_out = report_all(repeated, single, ["a"])
+    assert list(df_out["Value [mm]"][5:]) == [0.0] * 6
+    df_out = overlap(repeated, single, ["a"])
+    assert list(df_out["Dice"]) == [1.0]
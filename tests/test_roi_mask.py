@@ -0,0 +1,75 @@
+from contextlib import nullcontext as does_not_raise
+
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.raster import Grid
+
+import numpy as np
+
+import pytest
+
+
+def rectangle(x, y, z):
+    return [[x[0], y[0], z], [x[1], y[0], z], [x[1], y[1], z], [x[0], y[1], z]]
+
+
+# This fixture returns an object with a dose grid and two structures
+# inside it: a box of 2 x 2 mm in two slices and a structure with a
+# single slice.
+@pytest.fixture()
+def dicom_info(struct_builder, dose_dataset):
+    box = [rectangle((-9.5, -7.5), (-19.5, -17.5), z) for z in (-30, -27)]
+    single = [rectangle((-20.0, -6.5), (-20.0, -6.5), -24.0)]
+    struct = struct_builder({"box": box, "slice": single})
+    return DicomInfo(struct, dose_dataset)
+
+
+# This test verifies the masks on the dose grid.
+def test_roi_mask(dicom_info):
+    mask = dicom_info.roi_mask("box")
+    assert mask.shape == dicom_info.dose_grid.shape
+    expected = np.zeros((4, 3, 5), dtype=bool)
+    expected[:2, 1:2, 1:3] = True
+    assert np.array_equal(mask.full(), expected)
+    assert mask.values.shape == (2, 1, 2)
+    dose = dicom_info.dose_grid[mask.box][mask.values]
+    assert list(dose) == [3.0, 3.5, 10.5, 11.0]
+    single = dicom_info.roi_mask("slice")
+    planes = single.full().any(axis=(1, 2))
+    assert planes.tolist() == [False, False, True, False]
+
+
+# This test verifies that the masks are cached, also for the copies of
+# the object that do not modify the structure.
+def test_roi_mask_cached(dicom_info):
+    mask = dicom_info.roi_mask("box")
+    assert dicom_info.roi_mask("box") is mask
+    moved = dicom_info.move("slice", 1.0, "x")
+    assert moved.roi_mask("box") is mask
+    moved = dicom_info.move("box", 1.0, "x")
+    assert moved.roi_mask("box") is not mask
+    assert moved.roi_mask("box").box[2] == slice(2, 4)
+
+
+# This test verifies the masks on other grids.
+def test_roi_mask_grid(dicom_info):
+    grid = Grid.regular([-10.0, -20.0, -30.0], [-6.0, -16.0, -24.0], 0.5)
+    mask = dicom_info.roi_mask("box", grid)
+    assert mask.shape == grid.shape
+    assert mask.count == 4 * 4 * 10
+
+
+@pytest.mark.parametrize(
+    "struct, dose, expected",
+    [
+        ("box", True, does_not_raise()),
+        ("none", True, pytest.raises(ValueError)),
+        ("box", False, pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(dicom_info, struct, dose, expected):
+    if not dose:
+        dicom_info.dicom_dose = None
+    with expected:
+        dicom_info.roi_mask(struct)
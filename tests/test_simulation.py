@@ -0,0 +1,114 @@
+from dicomhandler import simulation, transforms
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.raster import Grid
+
+import numpy as np
+
+import pytest
+
+
+def box(low, high, step=1.0):
+    (x0, y0, z0), (x1, y1, z1) = low, high
+    return [
+        [[x0, y0, z], [x1, y0, z], [x1, y1, z], [x0, y1, z]]
+        for z in np.arange(z0, z1 + step / 2, step)
+    ]
+
+
+# This fixture returns an object with a box of 10 mm inside a box of
+# 20 mm and an empty structure.
+@pytest.fixture()
+def dicom_info(struct_builder):
+    struct = struct_builder(
+        {
+            "gtv": box((0.0, 0.0, 0.0), (10.0, 10.0, 10.0)),
+            "empty": [],
+            "ptv": box((-5.0, -5.0, -5.0), (15.0, 15.0, 15.0)),
+        }
+    )
+    return DicomInfo(struct)
+
+
+# This test verifies that the batch of movements matches the chain of
+# movements of each sample.
+def test_compose_batch():
+    generator = np.random.default_rng(0)
+    values = generator.normal(size=(5, 6)) * [10, 10, 10, 3, 3, 3]
+    origin = [1.0, 2.0, 3.0]
+    matrices = transforms.compose_batch(values, origin)
+    points = generator.normal(size=(7, 3))
+    moved = transforms.apply_batch(matrices, points)
+    assert moved.shape == (5, 3, 7)
+    for matrix, row, result in zip(matrices, values, moved):
+        steps = list(zip(simulation.ERRORS, row))
+        np.testing.assert_allclose(matrix, transforms.compose(steps, origin))
+        np.testing.assert_allclose(result.T, transforms.apply(matrix, points))
+
+
+# This test verifies the coverage of the box for known shifts, also in
+# several chunks.
+@pytest.mark.parametrize("chunk", [2**22, 1000])
+def test_coverage(dicom_info, monkeypatch, chunk):
+    monkeypatch.setattr(simulation, "CHUNK_POINTS", chunk)
+    bounds = dicom_info.geometry(["gtv", "ptv"]).set_index("roi")
+    bounds = bounds[["xmin", "ymin", "zmin", "xmax", "ymax", "zmax"]]
+    grids = []
+    for name in ("gtv", "ptv"):
+        limits = bounds.loc[name].to_numpy()
+        grid = Grid.regular(limits[:3], limits[3:], 1.0)
+        grids.append((dicom_info.roi_mask(name, grid), grid))
+    points = simulation.voxel_centres(*grids[0])
+    assert len(points) == grids[0][0].count
+    shifts = np.zeros((4, 6))
+    shifts[:, 3] = [0.0, 5.0, 10.0, 30.0]
+    shifts[1, 4] = -5.0
+    matrices = transforms.compose_batch(shifts)
+    result = simulation.coverage(matrices, points, *grids[1])
+    np.testing.assert_allclose(result, [1.0, 1.0, 0.5, 0.0], atol=0.1)
+    assert result[2] < 1.0
+    empty = simulation.coverage(matrices, points[:0], *grids[1])
+    assert np.isnan(empty).all()
+
+
+# This test verifies the simulation of the setup errors.
+def test_setup_errors(dicom_info):
+    origin = [5.0, 5.0, 5.0]
+    errors, summary = dicom_info.setup_errors(
+        "gtv",
+        "ptv",
+        samples=50,
+        translation=[1.0, 0.5, 0.0],
+        origin=origin,
+        seed=0,
+    )
+    assert list(errors.columns) == list(simulation.ERRORS) + ["coverage"]
+    assert len(errors) == 50
+    assert (errors[["roll", "pitch", "yaw", "z"]] == 0).all(axis=None)
+    assert summary["count"] == 50
+    assert summary["min"] == 100.0
+    errors, summary = dicom_info.setup_errors(
+        "gtv", "ptv", samples=20, translation=20.0, rotation=5.0, seed=1
+    )
+    assert summary["min"] < summary["max"] <= 100.0
+    again, _ = dicom_info.setup_errors(
+        "gtv", "ptv", samples=20, translation=20.0, rotation=5.0, seed=1
+    )
+    assert errors.equals(again)
+
+
+@pytest.mark.parametrize(
+    "struct, samples, shift, angle",
+    [
+        ("none", 10, 1.0, 0.0),
+        ("empty", 10, 1.0, 0.0),
+        ("gtv", 0, 1.0, 0.0),
+        ("gtv", 1.5, 1.0, 0.0),
+        ("gtv", 10, -1.0, 0.0),
+        ("gtv", 10, 1.0, [1.0, 2.0]),
+    ],
+)
+# These tests verify if the simulation raises errors in the correct
+# way.
+def test_setup_errors_raises(dicom_info, struct, samples, shift, angle):
+    with pytest.raises(ValueError):
+        dicom_info.setup_errors(struct, "ptv", samples, shift, angle)
@@ -0,0 +1,124 @@
+from dicomhandler.dicom_info import DicomInfo
+from dicomhandler.spatial import Octree, PointIndex, levels, min_distance
+
+import numpy as np
+
+import pytest
+
+
+def brute_force(points, queries):
+    differences = queries[:, None, :] - points[None, :, :]
+    return np.sqrt(np.min(np.sum(differences**2, axis=2), axis=1))
+
+
+def sphere(generator, size, radius, center=(0.0, 0.0, 0.0)):
+    points = generator.normal(size=(size, 3))
+    points /= np.linalg.norm(points, axis=1)[:, None]
+    return points * radius + center
+
+
+# This test verifies the nearest distances against all the distances,
+# for close surfaces, far surfaces (coarser grids) and flat clouds.
+@pytest.mark.parametrize(
+    "radius, center, size",
+    [
+        (31.0, (0.0, 0.0, 0.0), None),
+        (10.0, (0.0, 0.0, 0.0), None),
+        (30.0, (150.0, 20.0, 0.0), None),
+        (30.0, (150.0, 20.0, 0.0), 100.0),
+        (30.0, (0.5, 0.0, 0.0), 0.2),
+    ],
+)
+def test_query(radius, center, size):
+    generator = np.random.default_rng(0)
+    points = sphere(generator, 2000, 30.0)
+    queries = sphere(generator, 700, radius, center)
+    index = PointIndex(points, size)
+    np.testing.assert_allclose(
+        index.query(queries), brute_force(points, queries)
+    )
+    flat = points * [1.0, 1.0, 0.0]
+    np.testing.assert_allclose(
+        PointIndex(flat, size).query(queries), brute_force(flat, queries)
+    )
+
+
+# This test verifies the degenerate clouds.
+def test_query_degenerate():
+    index = PointIndex([[1.0, 2.0, 3.0]])
+    assert len(index) == 1
+    assert list(index.query([[1.0, 2.0, 7.0], [4.0, 6.0, 3.0]])) == [4, 5]
+    assert index.query(np.empty((0, 3))).shape == (0,)
+    with pytest.raises(ValueError):
+        PointIndex(np.empty((0, 3)))
+
+
+# This test verifies the order of the offsets around a cell.
+def test_levels():
+    groups = levels(2)
+    assert groups[0][0] == 0
+    assert groups[0][1].tolist() == [[0, 0, 0]]
+    assert [gap for gap, _ in groups[1:]] == [0, 1, 2, 3]
+    assert sum(len(offsets) for _, offsets in groups) == 125
+
+
+# This test verifies the smallest distance between two clouds against
+# all the distances, for nested, far, touching and repeated points.
+@pytest.mark.parametrize(
+    "radius, center, size",
+    [
+        (10.0, (0.0, 0.0, 0.0), 3000),
+        (30.0, (150.0, 20.0, 0.0), 3000),
+        (30.0, (59.0, 0.0, 0.0), 500),
+        (1.0, (0.0, 0.0, 0.0), 1),
+    ],
+)
+def test_min_distance(radius, center, size):
+    generator = np.random.default_rng(1)
+    points = sphere(generator, 4000, 30.0)
+    others = sphere(generator, size, radius, center)
+    expected = brute_force(points, others).min()
+    tree = Octree(points)
+    assert min_distance(tree, Octree(others)) == pytest.approx(expected)
+    assert min_distance(Octree(others), tree) == pytest.approx(expected)
+    assert min_distance(tree, Octree(others), expected - 0.1) == np.inf
+    repeated = np.repeat(points[:10], 3000, axis=0)
+    expected = brute_force(points[:10], others).min()
+    assert min_distance(Octree(repeated), Octree(others)) == pytest.approx(
+        expected
+    )
+    with pytest.raises(ValueError):
+        Octree(np.empty((0, 3)))
+
+
+# This test verifies the matrix of distances between structures.
+def test_proximity(struct_builder):
+    def square(x, z, side=10.0):
+        return [
+            [x, 0.0, z],
+            [x + side, 0.0, z],
+            [x + side, side, z],
+            [x, side, z],
+        ]
+
+    struct = struct_builder(
+        {
+            "target": [square(0.0, z) for z in (0.0, 2.0)],
+            "empty": [],
+            "near": [square(13.0, z) for z in (0.0, 2.0)],
+            "far": [square(0.0, z) for z in (50.0, 52.0)],
+        }
+    )
+    dicom_info = DicomInfo(struct)
+    frame = dicom_info.proximity(["target", "empty"], ["near", "far"])
+    assert list(frame.index) == ["target", "empty"]
+    assert list(frame.columns) == ["near", "far"]
+    assert list(frame.loc["target"]) == [3.0, 48.0]
+    assert frame.loc["empty"].isna().all()
+    frame = dicom_info.proximity(max_distance=10.0)
+    assert frame.shape == (4, 4)
+    assert frame.loc["target", "target"] == 0.0
+    assert frame.loc["near", "target"] == 3.0
+    assert np.isnan(frame.loc["target", "far"])
+    with pytest.raises(ValueError):
+        dicom_info.proximity(["none"])
@@ -1,6 +1,7 @@
+import gzip
 import os
 from contextlib import nullcontext as does_not_raise
-from io import StringIO
+from io import BytesIO, StringIO
 from pathlib import Path
 
 import pandas as pd
@@ -188,3 +189,77 @@ def test_raises(
     with expected:
         di = di_1p_fixt(patient_s, "test_struct_to_csv")
         di.struct_to_csv(path_or_buff=path_file_res, names=list_struct)
+
+
+@pytest.mark.parametrize(
+    "list_struct, name_buff",
+    [
+        ([], "struct_buff_1.gz"),
+        (["space2", "space4"], "struct_buff_2.gz"),
+    ],
+)
+# These tests verify that the compressed output has the same content
+# as the expected buffer, both for paths ending in .gz and for binary
+# buffers.
+def test_gzip(di_1p_fixt, list_struct, name_buff, load_buff):
+    di = di_1p_fixt("patient_0_s.gz", "test_struct_to_csv")
+    folder = Path(os.getcwd() + "/tests/data/test_struct_to_csv/")
+    buff_exp = load_buff(folder / name_buff)
+    buff_exp.seek(0)
+    expected = pd.read_csv(buff_exp)
+    path_file_res = folder / "res_gzip.csv.gz"
+    di.struct_to_csv(path_or_buff=path_file_res, names=list_struct)
+    with gzip.open(path_file_res, "rt") as file:
+        assert_frame_equal(pd.read_csv(file), expected)
+    os.remove(path_file_res)
+    buff_res = BytesIO()
+    di.struct_to_csv(
+        path_or_buff=buff_res, names=list_struct, compression="gzip"
+    )
+    assert not buff_res.closed
+    buff_res.seek(0)
+    assert_frame_equal(pd.read_csv(buff_res, compression="gzip"), expected)
+
+
+# This test verifies the long layout, with one row per point.
+def test_long_layout(di_1p_fixt):
+    di = di_1p_fixt("patient_0_s.gz", "test_struct_to_csv")
+    buff_res = StringIO()
+    di.struct_to_csv(
+        path_or_buff=buff_res, names=["space2", "space6"], layout="long"
+    )
+    buff_res.seek(0)
+    result = pd.read_csv(buff_res)
+    assert list(result.columns) == [
+        "roi",
+        "slice",
+        "point",
+        "x [mm]",
+        "y [mm]",
+        "z [mm]",
+    ]
+    assert list(result["roi"]) == ["space2"] * 3 + ["space6"] * 2
+    assert list(result["slice"]) == [0, 0, 0, 0, 0]
+    assert list(result["point"]) == [0, 1, 2, 0, 1]
+    points = di.contours.points(di.contours.index["space6"])
+    assert result[["x [mm]", "y [mm]", "z [mm]"]].values[3:].tolist() == (
+        points.tolist()
+    )
+
+
+@pytest.mark.parametrize(
+    "layout, compression, expected",
+    [
+        ("wide", None, does_not_raise()),
+        ("long", "infer", does_not_raise()),
+        ("tidy", None, pytest.raises(ValueError)),
+        ("wide", "zip", pytest.raises(ValueError)),
+    ],
+)
+# These tests verify that the layout and the compression are validated.
+def test_raises_layout(di_1p_fixt, layout, compression, expected):
+    di = di_1p_fixt("patient_0_s.gz", "test_struct_to_csv")
+    with expected:
+        di.struct_to_csv(
+            path_or_buff=StringIO(), layout=layout, compression=compression
+        )
@@ -0,0 +1,62 @@
+from contextlib import nullcontext as does_not_raise
+from io import StringIO
+
+import numpy as np
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "list_struct",
+    [[], ["space2", "space4"], ["space6"]],
+)
+# These tests verify that the dataframe has the same information as
+# the csv file with the long layout.
+def test_equality_long_csv(di_1p_fixt, list_struct):
+    di = di_1p_fixt("patient_0_s.gz", "test_struct_to_csv")
+    buff_res = StringIO()
+    di.struct_to_csv(path_or_buff=buff_res, names=list_struct, layout="long")
+    buff_res.seek(0)
+    expected = pd.read_csv(buff_res)
+    result = di.struct_to_dataframe(names=list_struct)
+    assert result["roi"].dtype == "category"
+    result["roi"] = result["roi"].astype(str)
+    assert_frame_equal(result, expected, check_dtype=False)
+
+
+# This test verifies the type of the coordinates.
+def test_float32(di_1p_fixt):
+    di = di_1p_fixt("patient_0_s.gz", "test_struct_to_csv")
+    result = di.struct_to_dataframe(dtype=np.float32)
+    assert (result[["x [mm]", "y [mm]", "z [mm]"]].dtypes == np.float32).all()
+    assert list(result["roi"].cat.categories) == [
+        "space1",
+        "space2",
+        "space3",
+        "space4",
+        "space5",
+        "space6",
+    ]
+
+
+@pytest.mark.parametrize(
+    "patient, list_struct, expected",
+    [
+        ("patient_0_s.gz", ["space1"], does_not_raise()),
+        (
+            "patient_0_s.gz",
+            ["name_struct_not_exist"],
+            pytest.raises(ValueError),
+        ),
+        ("patient_0_p.gz", [], pytest.raises(ValueError)),
+    ],
+)
+# These tests verify if the method raises/doesn't raise errors
+# in the correct way.
+def test_raises(di_1p_fixt, patient, list_struct, expected):
+    di = di_1p_fixt(patient, "test_struct_to_csv")
+    with expected:
+        di.struct_to_dataframe(names=list_struct)
@@ -45,7 +45,7 @@ def test_equality_df_areas(patient, di_1p_fixt):
 
 @pytest.mark.parametrize(
     "patient",
-    [("patient_17_p.gz")],
+    ["patient_17_p.gz"],
 )
 # This test verifies if the method generates in the correct way
 # the plan dataframe.
@@ -72,3 +72,23 @@ def test_plan_present(patient_mock, request, expected):
         DicomInfo(
             request.getfixturevalue(patient_mock)
         ).summarize_to_dataframe(area=True)
+
+
+# This test verifies the areas of a plan whose beams have multileaf
+# collimators with different number and width of leaves, with and
+# without the jaws.
+@pytest.mark.parametrize(
+    "jaws, expected",
+    [(False, [90.0, 210.0, 10.0]), (True, [80.0, 173.0, 6.0])],
+)
+def test_areas_mixed_mlc(plan_dataset, jaws, expected):
+    df_res = DicomInfo(plan_dataset).summarize_to_dataframe(
+        area=True, jaws=jaws
+    )
+    assert list(df_res["beam"]) == [1, 1, 2]
+    assert list(df_res["checkpoint"]) == [1, 2, 1]
+    assert list(df_res["area"]) == expected
+    assert list(df_res["gantry_direction"]) == ["CW", "CW", "NONE"]
+    assert list(df_res["table"]) == [90.0, 90.0, 0.0]
+    default = DicomInfo(plan_dataset).summarize_to_dataframe(area=True)
+    assert list(default["area"]) == [90.0, 210.0, 10.0]